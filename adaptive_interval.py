@@ -0,0 +1,58 @@
+import collections
+import datetime
+
+
+class AdaptiveInterval:
+    """根据近期波动决定金币比例的轮询间隔。
+
+    - 距上次通知的累计变动加上近期单次最大变动接近告警阈值时，切换到 ``fast``；
+    - 最近 ``window`` 次变动都小于 ``flat_delta`` 时视为平稳，退到 ``slow``；
+    - 夜间（``quiet_hours``，本地时间的 [起, 止) 小时）至少使用 ``slow``，
+      但接近阈值时仍然切回 ``fast``，不会错过快速波动；
+    - 其余情况使用 ``base``。
+    """
+
+    def __init__(self, threshold=2.0, base=60, fast=15, slow=300, approach=0.6,
+                 window=5, flat_delta=0.05, quiet_hours=(1, 7)):
+        self.threshold = threshold
+        self.base = base
+        self.fast = fast
+        self.slow = slow
+        self.approach = approach
+        self.flat_delta = flat_delta
+        self.quiet_hours = quiet_hours
+        self.interval = base
+        self.reason = "默认"
+        self._deltas = collections.deque(maxlen=window)
+        self._last_value = None
+
+    def _is_quiet(self, now):
+        if not self.quiet_hours:
+            return False
+        start, end = self.quiet_hours
+        hour = datetime.datetime.fromtimestamp(now).hour
+        return start <= hour < end if start <= end else (hour >= start or hour < end)
+
+    def observe(self, value, reference, now, threshold=None):
+        """记录一次均价观测，返回 (新间隔秒数, 原因)。
+
+        reference 为上次通知时的均价（告警以它为基准），为 None 时只按波动判断；
+        threshold 为本次使用的告警阈值，默认为构造时的 threshold。
+        """
+        threshold = self.threshold if threshold is None else threshold
+        if self._last_value is not None:
+            self._deltas.append(abs(value - self._last_value))
+        self._last_value = value
+
+        drift = abs(value - reference) if reference is not None else 0.0
+        recent = max(self._deltas, default=0.0)
+        if drift + recent >= threshold * self.approach:
+            interval, reason = self.fast, f"接近告警阈值（累计变动 {drift:.2f}，近期单次最大 {recent:.2f}）"
+        elif self._is_quiet(now):
+            interval, reason = max(self.slow, self.base), "夜间"
+        elif len(self._deltas) == self._deltas.maxlen and recent < self.flat_delta:
+            interval, reason = self.slow, "行情平稳"
+        else:
+            interval, reason = self.base, "正常波动"
+        self.interval, self.reason = interval, reason
+        return interval, reason
@@ -0,0 +1,195 @@
+"""用户自定义的价格提醒。
+
+规则作用于某个序列（``gold.avg``、``egg.平舆`` 等，与 HistoryStore 一致），
+分为两类：
+
+- 绝对价位：``above``（上穿 level）/ ``below``（下穿 level）；
+- 相对涨跌：``rise`` / ``drop``，level 由参考值按百分比换算，触发后以触发时的
+  数值为新的参考值，继续监控下一次同等幅度的涨跌。
+
+提醒只在穿越价位时触发（边沿触发）：每个序列按方向维护一份有序的 level 索引，
+新值到来时用 bisect 找出 (上次值, 本次值] 区间内的规则，复杂度 O(log n + k)。
+"""
+import bisect
+import time
+
+DIRECTION_OF = {"above": "above", "rise": "above", "below": "below", "drop": "below"}
+
+
+class _SortedLevels:
+    """按 level 升序保存 (level, rule_id)。"""
+
+    __slots__ = ("levels", "ids")
+
+    def __init__(self):
+        self.levels = []
+        self.ids = []
+
+    def insert(self, level, rule_id):
+        i = bisect.bisect_right(self.levels, level)
+        self.levels.insert(i, level)
+        self.ids.insert(i, rule_id)
+
+    def remove(self, level, rule_id):
+        i = bisect.bisect_left(self.levels, level)
+        while i < len(self.levels) and self.levels[i] == level:
+            if self.ids[i] == rule_id:
+                del self.levels[i]
+                del self.ids[i]
+                return
+            i += 1
+
+    def between(self, lo, hi, lo_inclusive, hi_inclusive):
+        """level 落在 lo 与 hi 之间的规则 id。"""
+        start = bisect.bisect_left(self.levels, lo) if lo_inclusive else bisect.bisect_right(self.levels, lo)
+        end = bisect.bisect_right(self.levels, hi) if hi_inclusive else bisect.bisect_left(self.levels, hi)
+        return self.ids[start:end]
+
+
+class AlertBook:
+    """提醒规则表，持久化在 StateStore 的 ``alerts`` 中（含各规则的上次触发时间）。
+
+    每条规则为 {"id", "target", "series", "kind", "level", "pct", "created_at",
+    "last_fired", "last_fired_value"}；相对规则在尚无参考值时 level 为 None，
+    收到该序列的第一个数值后才进入索引。状态文件载入后调用 ``reload`` 建立索引。
+    """
+
+    def __init__(self, state, key="alerts", cooldown=600.0):
+        self.state = state
+        self.key = key
+        # 同一规则两次触发的最小间隔，避免价格在价位附近反复穿越时刷屏
+        self.cooldown = cooldown
+        self._index = {}
+        self._rules = {}
+        # series -> 尚无参考值的相对规则 id
+        self._unanchored = {}
+
+    def reload(self):
+        """按 StateStore 中的规则重建索引。"""
+        self._index.clear()
+        self._rules.clear()
+        self._unanchored.clear()
+        for rule in self._data["rules"]:
+            self._rules[rule["id"]] = rule
+            self._index_add(rule)
+
+    @property
+    def _data(self):
+        data = self.state.get(self.key)
+        if not isinstance(data, dict):
+            data = {"rules": [], "last_values": {}, "next_id": 1}
+            self.state.set(self.key, data)
+        return data
+
+    def _levels(self, series, direction):
+        key = (series, direction)
+        levels = self._index.get(key)
+        if levels is None:
+            levels = self._index[key] = _SortedLevels()
+        return levels
+
+    def _index_add(self, rule):
+        if rule["level"] is None:
+            self._unanchored.setdefault(rule["series"], set()).add(rule["id"])
+        else:
+            self._levels(rule["series"], DIRECTION_OF[rule["kind"]]).insert(rule["level"], rule["id"])
+
+    def _index_remove(self, rule):
+        if rule["level"] is None:
+            self._unanchored.get(rule["series"], set()).discard(rule["id"])
+        else:
+            self._levels(rule["series"], DIRECTION_OF[rule["kind"]]).remove(rule["level"], rule["id"])
+
+    @staticmethod
+    def _relative_level(kind, reference, pct):
+        return reference * (1 + pct / 100) if kind == "rise" else reference * (1 - pct / 100)
+
+    def last_value(self, series):
+        return self._data["last_values"].get(series)
+
+    def add(self, target, series, kind, level=None, pct=None, reference=None):
+        """新增规则并返回；相对规则的参考值默认取该序列最近一次的数值。"""
+        if kind not in DIRECTION_OF:
+            raise ValueError(f"未知的提醒类型: {kind}")
+        data = self._data
+        if kind in ("rise", "drop"):
+            reference = reference if reference is not None else self.last_value(series)
+            level = self._relative_level(kind, reference, pct) if reference is not None else None
+        rule = {
+            "id": str(data["next_id"]),
+            "target": target,
+            "series": series,
+            "kind": kind,
+            "level": level,
+            "pct": pct,
+            "created_at": time.time(),
+            "last_fired": None,
+            "last_fired_value": None,
+        }
+        data["next_id"] += 1
+        data["rules"].append(rule)
+        self._rules[rule["id"]] = rule
+        self._index_add(rule)
+        self.state.mark_dirty()
+        return rule
+
+    def remove(self, rule_id, target=None):
+        """删除规则；指定 target 时只能删除该目标自己的规则。"""
+        rule = self._rules.get(rule_id)
+        if rule is None or (target is not None and rule["target"] != target):
+            return False
+        self._index_remove(rule)
+        del self._rules[rule_id]
+        data = self._data
+        data["rules"] = [r for r in data["rules"] if r["id"] != rule_id]
+        self.state.mark_dirty()
+        return True
+
+    def for_target(self, target):
+        return [r for r in self._data["rules"] if r["target"] == target]
+
+    def series_names(self, prefix=""):
+        return sorted({r["series"] for r in self._rules.values() if r["series"].startswith(prefix)})
+
+    def observe(self, series, value, now=None):
+        """记录序列的新数值，返回本次触发的规则列表（已更新触发状态）。"""
+        now = now if now is not None else time.time()
+        data = self._data
+        prev = data["last_values"].get(series)
+        if value == prev:
+            return []
+        data["last_values"][series] = value
+        self.state.mark_dirty()
+
+        # 尚无参考值的相对规则以本次数值为参考
+        for rule_id in self._unanchored.pop(series, ()):
+            rule = self._rules[rule_id]
+            rule["level"] = self._relative_level(rule["kind"], value, rule["pct"])
+            self._index_add(rule)
+        if prev is None:
+            return []
+
+        crossed = []
+        if value > prev:
+            levels = self._index.get((series, "above"))
+            if levels is not None:
+                crossed = levels.between(prev, value, False, True)
+        else:
+            levels = self._index.get((series, "below"))
+            if levels is not None:
+                crossed = levels.between(value, prev, True, False)
+
+        fired = []
+        for rule_id in crossed:
+            rule = self._rules[rule_id]
+            if rule["kind"] in ("rise", "drop"):
+                # 以本次数值为新的参考值，重新计算价位
+                self._index_remove(rule)
+                rule["level"] = self._relative_level(rule["kind"], value, rule["pct"])
+                self._index_add(rule)
+            if rule["last_fired"] is not None and now - rule["last_fired"] < self.cooldown:
+                continue
+            rule["last_fired"] = now
+            rule["last_fired_value"] = value
+            fired.append(rule)
+        return fired
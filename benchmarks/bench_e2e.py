@@ -0,0 +1,189 @@
+"""端到端指令延迟基准：在上游替身服务上以 N 个并发用户驱动 /金币比例、/油价、/蛋价，统计回复延迟与上游请求数。
+
+插件会被复制到临时目录后加载（状态文件与历史库不会写入插件目录），后台定时任务不启动，
+上游请求经 UPSTREAM_OVERRIDES 指向 mock_server.MockUpstream。需要在 AstrBot 环境中运行。
+
+用法（在插件目录下运行）：
+    python benchmarks/bench_e2e.py --users 20 --rounds 10 --latency 0.05 --error-rate 0.02
+    python benchmarks/bench_e2e.py --save baseline.json          # 保存本次结果
+    python benchmarks/bench_e2e.py --baseline baseline.json      # 与保存的结果对比
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import types
+from pathlib import Path
+
+PLUGIN_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import mock_server  # noqa: E402
+
+# 名称 -> (处理函数名, 消息内容)
+COMMANDS = {
+    "金币比例": ("dnf_gold_ratio", "金币比例"),
+    "油价": ("oil_price", "油价 河南"),
+    "蛋价": ("egg_price", "蛋价 平舆"),
+}
+
+
+class FakeEvent:
+    """最小化的 AstrMessageEvent：指令处理只用到消息文本、会话信息与 plain_result。"""
+
+    def __init__(self, message_str, group_id, sender_id):
+        self.message_str = message_str
+        self._group_id = group_id
+        self._sender_id = sender_id
+        self.unified_msg_origin = f"aiocqhttp:GroupMessage:{group_id}"
+
+    def get_group_id(self):
+        return self._group_id
+
+    def get_sender_id(self):
+        return self._sender_id
+
+    def get_sender_name(self):
+        return f"user{self._sender_id}"
+
+    def get_platform_name(self):
+        return "aiocqhttp"
+
+    def plain_result(self, text):
+        return text
+
+
+def load_plugin(workdir):
+    """把插件复制到临时目录并导入其 main 模块。"""
+    target = Path(workdir) / PLUGIN_DIR.name
+    shutil.copytree(PLUGIN_DIR, target, ignore=shutil.ignore_patterns(
+        "benchmarks", "__pycache__", "*.db*", "plugin_state.json", "*.prom", ".git"))
+    sys.path.insert(0, str(workdir))
+    return importlib.import_module(f"{PLUGIN_DIR.name}.main")
+
+
+def percentiles(values):
+    if len(values) < 2:
+        v = values[0] if values else 0.0
+        return v, v, v
+    q = statistics.quantiles(values, n=100, method="inclusive")
+    return q[49], q[94], q[98]
+
+
+async def run_user(plugin, user, commands, rounds, think, latencies, replies, rnd):
+    event_group = str(100000 + user % 8)
+    for _ in range(rounds):
+        order = list(commands)
+        rnd.shuffle(order)
+        for name in order:
+            handler_name, message = COMMANDS[name]
+            event = FakeEvent(message, event_group, str(200000 + user))
+            start = time.perf_counter()
+            async for result in getattr(plugin, handler_name)(event):
+                replies[name].append(result)
+            latencies[name].append(time.perf_counter() - start)
+            if think:
+                await asyncio.sleep(rnd.uniform(0, think))
+
+
+async def run(args):
+    commands = [c for c in args.commands.split(",") if c]
+    for name in commands:
+        if name not in COMMANDS:
+            raise SystemExit(f"未知指令: {name}（可选：{'、'.join(COMMANDS)}）")
+    mock = await mock_server.from_args(args).start(port=args.port)
+    workdir = tempfile.mkdtemp(prefix="dnf_bench_")
+    plugin = None
+    try:
+        main_module = load_plugin(workdir)
+        # 不启动后台定时任务，上游请求数只来自指令本身
+        main_module.DNF_Plugin._tasks_started = True
+        context = types.SimpleNamespace(platform_manager=types.SimpleNamespace(get_insts=lambda: []))
+        plugin = main_module.DNF_Plugin(context)
+        plugin.http.upstream_overrides.update(mock.overrides())
+        await plugin.initialize()
+
+        latencies = {name: [] for name in commands}
+        replies = {name: [] for name in commands}
+        rnd = random.Random(args.seed)
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            run_user(plugin, user, commands, args.rounds, args.think, latencies, replies, random.Random(rnd.random()))
+            for user in range(args.users)
+        ))
+        wall = time.perf_counter() - start
+    finally:
+        if plugin is not None:
+            await plugin.terminate()
+        await mock.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    result = {
+        "config": {
+            "users": args.users, "rounds": args.rounds, "latency": args.latency, "jitter": args.jitter,
+            "error_rate": args.error_rate, "gold_rows": args.gold_rows, "egg_rows": args.egg_rows,
+            "etag": not args.no_etag,
+        },
+        "wall_seconds": wall,
+        "commands": {},
+        "upstream": {
+            "calls": dict(mock.calls), "errors": dict(mock.errors), "not_modified": dict(mock.not_modified),
+        },
+    }
+    for name in commands:
+        p50, p95, p99 = percentiles(latencies[name])
+        result["commands"][name] = {
+            "count": len(latencies[name]), "p50": p50, "p95": p95, "p99": p99, "max": max(latencies[name]),
+            "failed": sum(1 for r in replies[name] if "失败" in str(r)),
+        }
+    return result
+
+
+def print_result(result, baseline=None):
+    cfg = result["config"]
+    print(f"用户数: {cfg['users']}  轮数: {cfg['rounds']}  上游延迟: {cfg['latency'] * 1000:.0f}ms"
+          f"（±{cfg['jitter'] * 1000:.0f}）  错误率: {cfg['error_rate']:.1%}  总耗时: {result['wall_seconds']:.2f}s")
+    print(f"{'指令':<8}{'次数':>6}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'最大(ms)':>10}{'失败':>6}")
+    for name, st in result["commands"].items():
+        line = (f"{name:<8}{st['count']:>6}{st['p50'] * 1000:>10.1f}{st['p95'] * 1000:>10.1f}"
+                f"{st['p99'] * 1000:>10.1f}{st['max'] * 1000:>10.1f}{st['failed']:>6}")
+        base = (baseline or {}).get("commands", {}).get(name)
+        if base:
+            deltas = [(st[k] - base[k]) / base[k] * 100 if base[k] else 0.0 for k in ("p50", "p95", "p99")]
+            line += "   对比基准 " + " / ".join(f"{d:+.0f}%" for d in deltas)
+        print(line)
+    up = result["upstream"]
+    print("上游请求：" + "，".join(
+        f"{source} {count} 次（错误 {up['errors'].get(source, 0)}，304 {up['not_modified'].get(source, 0)}）"
+        for source, count in sorted(up["calls"].items())))
+    if baseline:
+        base_calls = baseline.get("upstream", {}).get("calls", {})
+        print("基准上游请求：" + "，".join(f"{source} {count} 次" for source, count in sorted(base_calls.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10, help="并发用户数")
+    parser.add_argument("--rounds", type=int, default=5, help="每个用户发送每条指令的轮数")
+    parser.add_argument("--think", type=float, default=0.0, help="两条指令之间的最大随机间隔（秒）")
+    parser.add_argument("--commands", default=",".join(COMMANDS), help="逗号分隔的指令名称")
+    parser.add_argument("--port", type=int, default=18766)
+    parser.add_argument("--save", help="把结果保存为 JSON")
+    parser.add_argument("--baseline", help="与之前保存的 JSON 结果对比")
+    mock_server.add_arguments(parser)
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8")) if args.baseline else None
+    print_result(result, baseline)
+    if args.save:
+        Path(args.save).write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
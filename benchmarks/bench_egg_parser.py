@@ -0,0 +1,32 @@
+"""蛋价解析基准（pytest-benchmark），基于 fixtures/ 下按 quotn.cn 响应结构录制的样本。
+
+用法（在插件目录下运行）：
+    pytest benchmarks/bench_egg_parser.py --benchmark-only
+"""
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+
+PLUGIN_DIR = Path(__file__).resolve().parents[1]
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+sys.path.insert(0, str(PLUGIN_DIR.parent))
+egg_parser = importlib.import_module(f"{PLUGIN_DIR.name}.egg_parser")
+
+
+def load_fixture(name):
+    return (FIXTURES / name).read_bytes()
+
+
+@pytest.mark.parametrize("fixture, path", [
+    ("quotn_datalist.json", "dataList 快速路径"),
+    ("quotn_nested.json", "通用遍历"),
+    ("quotn_text.html", "文本正则兜底"),
+], ids=["datalist", "nested", "text"])
+def test_parse_egg_prices(benchmark, fixture, path):
+    body = load_fixture(fixture)
+    benchmark.extra_info["path"] = path
+    results = benchmark(egg_parser.parse_egg_prices, body)
+    assert len(results) == 120
+    assert all(isinstance(it["price"], float) for it in results)
@@ -0,0 +1,68 @@
+"""油价多地区抓取基准：在上游替身服务（mock_server.MockUpstream）上对比串行与有限并发抓取 N 个地区的耗时。
+
+用法（在插件目录下运行）：
+    python benchmarks/bench_oil_areas.py --areas 31 --latency 0.2 --concurrency 4
+    python benchmarks/bench_oil_areas.py --error-rate 0.05 --jitter 0.05   # 注入上游错误与延迟抖动
+"""
+import argparse
+import asyncio
+import importlib
+import sys
+import time
+from pathlib import Path
+
+PLUGIN_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PLUGIN_DIR.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import mock_server  # noqa: E402
+
+http_client = importlib.import_module(f"{PLUGIN_DIR.name}.http_client")
+oil_utils = importlib.import_module(f"{PLUGIN_DIR.name}.oil_utils")
+
+
+async def timed_fetch(fetch, areas, concurrency):
+    start = time.perf_counter()
+    results, errors = await oil_utils.fetch_oil_areas(fetch, areas, concurrency=concurrency)
+    return time.perf_counter() - start, results, errors
+
+
+async def run(args):
+    mock = await mock_server.from_args(args).start(port=args.port)
+    areas = [oil_utils.OIL_AREAS[i % len(oil_utils.OIL_AREAS)] + ("" if i < len(oil_utils.OIL_AREAS) else str(i))
+             for i in range(args.areas)]
+    # 每轮使用新的客户端，上一轮触发的熔断不会影响下一轮
+    rounds = {}
+    try:
+        for name, concurrency in (("串行", 1), ("并发", args.concurrency)):
+            http = http_client.AsyncHttpClient(limit_per_host=args.concurrency, upstream_overrides=mock.overrides())
+            await http.start()
+            mock.reset_counters()
+            try:
+                elapsed, results, errors = await timed_fetch(
+                    lambda area: oil_utils.fetch_oil_data(http, area), areas, concurrency)
+            finally:
+                await http.close()
+            rounds[name] = (elapsed, len(results), len(errors), mock.calls["iamwawa"], mock.errors["iamwawa"])
+    finally:
+        await mock.stop()
+
+    print(f"地区数: {args.areas}  单次延迟: {args.latency * 1000:.0f}ms（抖动 {args.jitter * 1000:.0f}ms）  "
+          f"错误率: {args.error_rate:.0%}  并发上限: {args.concurrency}")
+    for name, (elapsed, ok, failed, calls, injected) in rounds.items():
+        print(f"{name}:   {elapsed:.3f}s  成功 {ok} / 失败 {failed}（上游请求 {calls} 次，注入错误 {injected} 次）")
+    sequential, concurrent = rounds["串行"][0], rounds["并发"][0]
+    print(f"加速比: {sequential / concurrent:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--areas", type=int, default=31)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--port", type=int, default=18765)
+    mock_server.add_arguments(parser)
+    parser.set_defaults(latency=0.2)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""插件启动耗时基准：在全新的子进程中分别计时 导入 main、DNF_Plugin(context) 与 initialize()。
+
+插件会被复制到临时目录后加载（状态文件与历史库不会写入插件目录）。每轮启动一个新的
+Python 进程，sys.modules 为空；--cold 时不使用字节码缓存，计入编译源码的耗时（与首次
+安装后的加载一致）。--preload 中的模块在计时前导入，模拟宿主（AstrBot）已经加载过的
+依赖。initialize 中后台任务的首次运行都有启动延迟，计时结束即 terminate，不会请求上游。
+需要在 AstrBot 环境中运行。
+
+用法（在插件目录下运行）：
+    python benchmarks/bench_startup.py --runs 20
+    python benchmarks/bench_startup.py --cold                       # 不使用 __pycache__
+    python benchmarks/bench_startup.py --state plugin_state.json    # 带上已有的状态文件
+    python benchmarks/bench_startup.py --preload astrbot.api,aiohttp # 宿主已导入 aiohttp 时
+    python benchmarks/bench_startup.py --importtime 15              # 列出导入最慢的模块
+    python benchmarks/bench_startup.py --save baseline.json / --baseline baseline.json
+"""
+import argparse
+import json
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+PLUGIN_DIR = Path(__file__).resolve().parents[1]
+PHASES = ("import", "init", "initialize", "total")
+PHASE_LABELS = {"import": "导入", "init": "__init__", "initialize": "initialize", "total": "合计"}
+IMPORTTIME_MARK = "--- bench_startup: import main ---"
+
+# 子进程中执行：argv 为 (临时目录, 包名, 预加载模块)，结果以 JSON 输出到 stdout
+CHILD = """
+import asyncio, importlib, json, sys, time, types
+workdir, package, preload = sys.argv[1], sys.argv[2], sys.argv[3]
+sys.path.insert(0, workdir)
+for name in filter(None, preload.split(",")):
+    importlib.import_module(name)
+print(%r, file=sys.stderr, flush=True)
+t0 = time.perf_counter()
+main = importlib.import_module(package + ".main")
+t1 = time.perf_counter()
+context = types.SimpleNamespace(platform_manager=types.SimpleNamespace(get_insts=lambda: []))
+plugin = main.DNF_Plugin(context)
+t2 = time.perf_counter()
+
+async def initialize():
+    start = time.perf_counter()
+    await plugin.initialize()
+    elapsed = time.perf_counter() - start
+    await plugin.terminate()
+    return elapsed
+
+t3 = asyncio.run(initialize())
+print(json.dumps({"import": t1 - t0, "init": t2 - t1, "initialize": t3, "total": t2 - t0 + t3}))
+""" % IMPORTTIME_MARK
+
+
+def prepare(workdir, state=None):
+    """把插件复制到临时目录，可选带上已有的状态文件。"""
+    target = Path(workdir) / PLUGIN_DIR.name
+    shutil.copytree(PLUGIN_DIR, target, ignore=shutil.ignore_patterns(
+        "benchmarks", "__pycache__", "*.db*", "plugin_state.json", "*.prom", ".git"))
+    if state:
+        shutil.copyfile(state, target / "plugin_state.json")
+    return target
+
+
+def reset(target, state=None):
+    """每轮之间删除上一轮生成的数据库与状态文件，每轮都从同样的初始状态启动。"""
+    for pattern in ("*.db*", "*.prom", "plugin_state.json"):
+        for path in target.glob(pattern):
+            path.unlink()
+    if state:
+        shutil.copyfile(state, target / "plugin_state.json")
+
+
+def run_child(workdir, preload, cold=False, importtime=False):
+    cmd = [sys.executable]
+    if cold:
+        # 不读写插件的字节码缓存（复制时已排除 __pycache__），每轮都重新编译源码
+        cmd.append("-B")
+    if importtime:
+        cmd += ["-X", "importtime"]
+    cmd += ["-c", CHILD, str(workdir), PLUGIN_DIR.name, preload]
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise SystemExit(f"子进程失败：\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def slowest_imports(stderr, limit):
+    """解析 -X importtime 输出，返回计时开始后导入的模块中自身耗时最长的 [(模块, 自身, 累计)]，单位微秒。"""
+    _, _, timed = stderr.partition(IMPORTTIME_MARK)
+    rows = []
+    for line in timed.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        try:
+            rows.append((name.strip(), int(self_us), int(cumulative_us)))
+        except ValueError:
+            continue
+    return sorted(rows, key=lambda r: r[1], reverse=True)[:limit]
+
+
+def summarize(samples):
+    values = sorted(samples)
+    p95 = statistics.quantiles(values, n=20, method="inclusive")[18] if len(values) > 1 else values[0]
+    return {"median": statistics.median(values), "p95": p95, "min": values[0], "max": values[-1]}
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="dnf_startup_")
+    try:
+        target = prepare(workdir, args.state)
+        # 第一轮只用于预热磁盘缓存与生成字节码，不计入结果
+        samples = {phase: [] for phase in PHASES}
+        for i in range(args.runs + 1):
+            reset(target, args.state)
+            timings, _ = run_child(workdir, args.preload, args.cold)
+            if i:
+                for phase in PHASES:
+                    samples[phase].append(timings[phase])
+        imports = None
+        if args.importtime:
+            reset(target, args.state)
+            _, stderr = run_child(workdir, args.preload, args.cold, importtime=True)
+            imports = slowest_imports(stderr, args.importtime)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    result = {
+        "config": {"runs": args.runs, "preload": args.preload, "state": bool(args.state), "cold": args.cold},
+        "phases": {phase: summarize(samples[phase]) for phase in PHASES},
+    }
+    return result, imports
+
+
+def print_result(result, imports=None, baseline=None):
+    cfg = result["config"]
+    print(f"轮数: {cfg['runs']}  预加载: {cfg['preload'] or '无'}  状态文件: {'有' if cfg['state'] else '无'}"
+          f"  字节码缓存: {'不使用' if cfg['cold'] else '使用'}")
+    print(f"{'阶段':<12}{'中位(ms)':>10}{'p95(ms)':>10}{'最小(ms)':>10}{'最大(ms)':>10}")
+    for phase, st in result["phases"].items():
+        line = (f"{PHASE_LABELS[phase]:<12}{st['median'] * 1000:>10.1f}{st['p95'] * 1000:>10.1f}"
+                f"{st['min'] * 1000:>10.1f}{st['max'] * 1000:>10.1f}")
+        base = (baseline or {}).get("phases", {}).get(phase)
+        if base and base["median"]:
+            line += f"   对比基准 {(st['median'] - base['median']) / base['median'] * 100:+.0f}%"
+        print(line)
+    if imports:
+        print("导入最慢的模块（自身 / 累计，ms）：")
+        for name, self_us, cumulative_us in imports:
+            print(f"  {name:<40}{self_us / 1000:>8.1f}{cumulative_us / 1000:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="计时轮数（每轮一个新进程）")
+    parser.add_argument("--preload", default="astrbot.api",
+                        help="逗号分隔、计时前导入的模块（宿主已加载的依赖）")
+    parser.add_argument("--cold", action="store_true", help="不使用字节码缓存，计入编译耗时")
+    parser.add_argument("--state", help="复制到插件目录的 plugin_state.json，用于计入状态载入耗时")
+    parser.add_argument("--importtime", type=int, default=0, metavar="N",
+                        help="额外运行一轮 -X importtime，列出导入最慢的 N 个模块")
+    parser.add_argument("--save", help="把结果保存为 JSON")
+    parser.add_argument("--baseline", help="与之前保存的 JSON 结果对比")
+    args = parser.parse_args()
+    if args.runs < 1:
+        raise SystemExit("--runs 至少为 1")
+
+    result, imports = run(args)
+    baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8")) if args.baseline else None
+    print_result(result, imports, baseline)
+    if args.save:
+        Path(args.save).write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""上游替身服务：回放 fixtures/ 下录制的 DD373、iamwawa.cn、quotn.cn 响应，延迟、错误率与数据量均可配置。
+
+单独运行（在插件目录下），然后把插件的 UPSTREAM_OVERRIDES 指向它即可离线使用：
+    python benchmarks/mock_server.py --port 18080 --latency 0.05 --jitter 0.02 --error-rate 0.01
+
+    self.UPSTREAM_OVERRIDES = {"goods.dd373.com": "http://127.0.0.1:18080",
+                               "www.iamwawa.cn": "http://127.0.0.1:18080",
+                               "www.quotn.cn": "http://127.0.0.1:18080"}
+"""
+import argparse
+import asyncio
+import collections
+import copy
+import hashlib
+import json
+import random
+from pathlib import Path
+
+from aiohttp import web
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+# 上游主机 -> 统计用的数据源名称（与插件的 UPSTREAM_SOURCES 一致）
+UPSTREAM_HOSTS = {
+    "goods.dd373.com": "DD373",
+    "www.iamwawa.cn": "iamwawa",
+    "www.quotn.cn": "quotn",
+}
+
+
+def load_fixture(name):
+    return json.loads((FIXTURES / name).read_text(encoding="utf-8"))
+
+
+def _cycle(rows, n):
+    return [copy.deepcopy(rows[i % len(rows)]) for i in range(n)]
+
+
+class MockUpstream:
+    """三个上游接口的替身。
+
+    - latency / jitter：每次响应前等待 ``gauss(latency, jitter)`` 秒；
+    - error_rate：按该概率返回 503（插件会计为上游故障并触发熔断）；
+    - gold_rows / egg_rows：金币报价总条数（按 PageIndex / PageSize 分页）与蛋价条数，
+      不足时循环使用录制数据；
+    - etag：为 True 时响应带 ETag，并对 If-None-Match 命中的请求返回 304。
+
+    calls / errors / not_modified 按数据源计数，供基准统计上游请求数。
+    """
+
+    def __init__(self, latency=0.05, jitter=0.0, error_rate=0.0, gold_rows=20, egg_rows=120, etag=True, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.etag = etag
+        self._rnd = random.Random(seed)
+        self.calls = collections.Counter()
+        self.errors = collections.Counter()
+        self.not_modified = collections.Counter()
+        self.base_url = None
+        self._runner = None
+
+        gold = load_fixture("dd373_shoplist.json")
+        rows = _cycle(gold["StatusData"]["ResultData"], gold_rows)
+        for i, row in enumerate(rows):
+            row["shopno"] = f"{row['shopno']}-{i}"
+        self._gold = gold
+        self._gold_rows = rows
+        self._oil = load_fixture("iamwawa_oil.json")
+        egg = load_fixture("quotn_datalist.json")
+        self._egg = egg
+        self._egg_rows = _cycle(egg["body"]["dataList"], egg_rows)
+        # 渲染好的响应体按请求参数缓存，回放时不重复序列化
+        self._bodies = {}
+
+    def overrides(self):
+        """插件 UPSTREAM_OVERRIDES / AsyncHttpClient.upstream_overrides 使用的映射。"""
+        return {host: self.base_url for host in UPSTREAM_HOSTS}
+
+    def reset_counters(self):
+        self.calls.clear()
+        self.errors.clear()
+        self.not_modified.clear()
+
+    def _gold_body(self, page, size):
+        data = copy.copy(self._gold)
+        sd = dict(data["StatusData"])
+        sd.update(ResultData=self._gold_rows[(page - 1) * size: page * size], PageIndex=page, PageSize=size,
+                  TotalCount=len(self._gold_rows))
+        data["StatusData"] = sd
+        return data
+
+    def _oil_body(self, area):
+        data = copy.deepcopy(self._oil)
+        data["data"]["name"] = area
+        return data
+
+    def _egg_body(self, area, date):
+        rows = []
+        for row in self._egg_rows:
+            row = dict(row)
+            if area:
+                row["aName"] = area
+            if date:
+                row["pDate"] = f"{date[:4]}-{date[4:6]}-{date[6:]}" if len(date) == 8 else date
+            rows.append(row)
+        data = copy.copy(self._egg)
+        data["body"] = dict(self._egg["body"], dataList=rows, total=len(rows), pageSize=len(rows))
+        return data
+
+    def _body(self, key, render):
+        cached = self._bodies.get(key)
+        if cached is None:
+            body = json.dumps(render(), ensure_ascii=False).encode("utf-8")
+            etag = '"%s"' % hashlib.blake2b(body, digest_size=8).hexdigest()
+            cached = self._bodies[key] = (body, etag)
+        return cached
+
+    async def _respond(self, source, request, key, render):
+        self.calls[source] += 1
+        delay = self._rnd.gauss(self.latency, self.jitter) if self.jitter else self.latency
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.error_rate and self._rnd.random() < self.error_rate:
+            self.errors[source] += 1
+            return web.Response(status=503, text="mock upstream error")
+        body, etag = self._body(key, render)
+        headers = {}
+        if self.etag:
+            headers["ETag"] = etag
+            if request.headers.get("If-None-Match") == etag:
+                self.not_modified[source] += 1
+                return web.Response(status=304, headers=headers)
+        return web.Response(body=body, headers=headers, content_type="application/json", charset="utf-8")
+
+    async def _gold_handler(self, request):
+        page = int(request.query.get("PageIndex", 1))
+        size = int(request.query.get("PageSize", 20))
+        return await self._respond("DD373", request, ("gold", page, size), lambda: self._gold_body(page, size))
+
+    async def _oil_handler(self, request):
+        area = request.query.get("area", "")
+        return await self._respond("iamwawa", request, ("oil", area), lambda: self._oil_body(area))
+
+    async def _egg_handler(self, request):
+        area = request.query.get("areaName", "")
+        date = request.query.get("pDate", "")
+        return await self._respond("quotn", request, ("egg", area, date), lambda: self._egg_body(area, date))
+
+    async def start(self, host="127.0.0.1", port=18080):
+        app = web.Application()
+        app.router.add_get("/Api/Goods/UserCenter/ApiGetShopList", self._gold_handler)
+        app.router.add_get("/oilprice/api", self._oil_handler)
+        app.router.add_get("/e/search", self._egg_handler)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        self.base_url = f"http://{host}:{port}"
+        return self
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+def add_arguments(parser):
+    parser.add_argument("--latency", type=float, default=0.05, help="每次响应的平均延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="延迟的标准差（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 503 的概率")
+    parser.add_argument("--gold-rows", type=int, default=20, help="金币报价总条数（每页 20 条）")
+    parser.add_argument("--egg-rows", type=int, default=120, help="蛋价条数")
+    parser.add_argument("--no-etag", action="store_true", help="不返回 ETag，插件只能按响应体摘要判断是否变化")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def from_args(args):
+    return MockUpstream(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                        gold_rows=args.gold_rows, egg_rows=args.egg_rows, etag=not args.no_etag, seed=args.seed)
+
+
+async def serve(args):
+    mock = await from_args(args).start(args.host, args.port)
+    print(f"上游替身服务已启动：{mock.base_url}")
+    print(json.dumps(mock.overrides(), ensure_ascii=False, indent=2))
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await mock.stop()
+        print(f"请求数：{dict(mock.calls)}  错误：{dict(mock.errors)}  304：{dict(mock.not_modified)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18080)
+    add_arguments(parser)
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
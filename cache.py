@@ -0,0 +1,97 @@
+import asyncio
+import time
+
+
+class AsyncTTLCache:
+    """带过期时间的进程内缓存。
+
+    同一个 key 的并发未命中只会触发一次加载（single-flight），其余调用方
+    等待同一个加载任务的结果；加载失败时异常传递给所有等待者且不写入缓存。
+    ``ttl`` 可以是秒数，也可以是根据加载结果计算秒数的函数，用于过期时间
+    取决于数据本身的场景（如油价的下次调价时间）。过期条目在被覆盖前保留，
+    上游不可用时可经 ``get_stale`` / ``get_or_stale`` 作为旧数据返回。
+    """
+
+    def __init__(self, ttl=60.0):
+        self.ttl = ttl
+        self._entries = {}
+        self._inflight = {}
+        # get_or_load 的命中 / 未命中次数
+        self.hits = 0
+        self.misses = 0
+        # get_or_stale 因加载失败而返回旧数据的次数
+        self.stale_hits = 0
+
+    def _is_fresh(self, entry, now=None):
+        return entry[1] > (now if now is not None else time.time())
+
+    def get(self, key, default=None):
+        """返回未过期的缓存值，过期或不存在时返回 default。"""
+        entry = self._entries.get(key)
+        if entry is not None and self._is_fresh(entry):
+            return entry[0]
+        return default
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        self._entries[key] = (value, now + ttl, now)
+
+    def get_stale(self, key):
+        """返回 (值, 距写入的秒数)，不论是否过期；不存在时返回 None。"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        return entry[0], time.time() - entry[2]
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def _start_load(self, key, loader, ttl):
+        task = self._inflight.get(key)
+        if task is not None:
+            return task
+
+        async def run():
+            try:
+                value = await loader()
+                self.set(key, value, ttl(value) if callable(ttl) else ttl)
+                return value
+            finally:
+                self._inflight.pop(key, None)
+
+        task = asyncio.ensure_future(run())
+        self._inflight[key] = task
+        return task
+
+    async def get_or_load(self, key, loader, ttl=None):
+        """命中则直接返回；未命中时调用 ``loader()`` 加载并写入缓存。"""
+        entry = self._entries.get(key)
+        if entry is not None and self._is_fresh(entry):
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        # shield：单个调用方被取消时不影响共享的加载任务
+        return await asyncio.shield(self._start_load(key, loader, ttl))
+
+    async def get_or_stale(self, key, loader, ttl=None, errors=(Exception,)):
+        """同 ``get_or_load``，返回 (值, 旧数据的秒数或 None)。
+
+        加载抛出 errors 中的异常且存在过期条目时，返回过期条目及其距写入的秒数；
+        没有可用的旧数据时异常照常抛出。
+        """
+        try:
+            return await self.get_or_load(key, loader, ttl), None
+        except errors:
+            stale = self.get_stale(key)
+            if stale is None:
+                raise
+            self.stale_hits += 1
+            return stale
+
+    async def refresh(self, key, loader, ttl=None):
+        """忽略现有缓存强制重新加载；若已有加载在进行中则复用它。"""
+        return await asyncio.shield(self._start_load(key, loader, ttl))
@@ -0,0 +1,74 @@
+import time
+
+
+class CircuitBreaker:
+    """单个上游主机的熔断器。
+
+    - closed：正常放行，连续失败 ``failure_threshold`` 次后进入 open；
+    - open：直接拒绝请求，``reset_timeout`` 秒后进入 half_open；
+    - half_open：只放行一个探测请求，成功则恢复 closed，失败则重新 open，
+      且等待时间翻倍（不超过 ``max_reset_timeout``）。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=3, reset_timeout=30.0, max_reset_timeout=600.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.open_count = 0
+        self._current_timeout = reset_timeout
+        self._probing = False
+
+    def retry_after(self, now=None):
+        """open 状态下距离允许探测的秒数，其他状态为 0。"""
+        if self.state != self.OPEN:
+            return 0.0
+        now = now if now is not None else time.time()
+        return max(0.0, self.opened_at + self._current_timeout - now)
+
+    def allow_request(self, now=None):
+        """是否放行本次请求；放行 half_open 探测时会占用唯一的探测名额。"""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            if self.retry_after(now) > 0:
+                return False
+            self.state = self.HALF_OPEN
+            self._probing = False
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._current_timeout = self.reset_timeout
+        self._probing = False
+
+    def record_failure(self, now=None):
+        now = now if now is not None else time.time()
+        if self.state == self.HALF_OPEN:
+            self._current_timeout = min(self._current_timeout * 2, self.max_reset_timeout)
+            self._open(now)
+            return
+        self.failures += 1
+        if self.state == self.CLOSED and self.failures >= self.failure_threshold:
+            self._open(now)
+
+    def release_probe(self):
+        """探测请求既未成功也未失败（如被取消）时归还探测名额。"""
+        self._probing = False
+
+    def _open(self, now):
+        self.state = self.OPEN
+        self.opened_at = now
+        self.open_count += 1
+        self._probing = False
@@ -0,0 +1,114 @@
+"""指令参数解析。
+
+每条指令的语法只声明一次：若干条按顺序尝试的 Grammar，正则在导入时预编译，
+对指令关键字之后的参数做 fullmatch，命名分组按声明的类型转换。参数不符合任何
+语法或转换失败时抛出 UsageError，由处理函数直接回复给用户。
+"""
+import re
+
+# 时间范围（7d、24h、30天），数值不能为 0，语义与 history_store.parse_period 一致
+PERIOD = r"(?!0+\D)\d{1,3}\s*(?:[dDhH]|天|小时)"
+
+_LIST_SEP_RE = re.compile(r"[,，、/]")
+
+
+class UsageError(Exception):
+    """指令参数有误；str() 即为回复给用户的文本（附带用法时一并给出）。"""
+
+    def __init__(self, message, usage=None):
+        super().__init__(message)
+        self.message = message
+        self.usage = usage
+
+    def __str__(self):
+        text = f"❌ {self.message}"
+        if self.usage:
+            text += f"\n\n📋 用法：\n{self.usage}"
+        return text
+
+
+def message_text(event):
+    """取出事件的消息文本（兼容不同版本的事件对象）。"""
+    if hasattr(event, 'message_str'):
+        return event.message_str or ""
+    if hasattr(event, 'get_message_str'):
+        return event.get_message_str() or ""
+    if hasattr(event, 'message_obj'):
+        return str(event.message_obj)
+    return str(event)
+
+
+def parse_list(text, conv):
+    """把 "河南,山东" / "7.5、8" 之类的列表参数拆开并逐项转换，空项忽略。"""
+    return [conv(part) for part in _LIST_SEP_RE.split(text) if part.strip()]
+
+
+def list_of(conv):
+    """列表参数的类型转换：list_of(float) 把 "7.5,8" 转为 [7.5, 8.0]。"""
+    return lambda text: parse_list(text, conv)
+
+
+class Route:
+    """解析结果：name 为匹配到的语法名称，args 为转换后的参数（未出现的可选分组为 None）。"""
+
+    __slots__ = ("name", "args")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __getitem__(self, key):
+        return self.args[key]
+
+
+class Grammar:
+    __slots__ = ("name", "regex", "types")
+
+    def __init__(self, name, pattern, types):
+        self.name = name
+        self.regex = re.compile(pattern)
+        self.types = types
+
+
+class CommandRouter:
+    """一条指令的全部语法。
+
+    router = CommandRouter("油价", usage="...")
+    router.add("rank", r"排行(?:\\s+(?P<grade>\\d+))?", grade=int)
+    route = router.parse("油价 排行 92")   # Route("rank", {"grade": 92})
+
+    类型转换函数抛出 UsageError 时原样传出（可给出具体原因），抛出 ValueError /
+    TypeError 时视为参数格式不正确并附带用法。
+    """
+
+    def __init__(self, command, usage=None):
+        self.command = command
+        self.usage = usage
+        self.grammars = []
+
+    def add(self, name, pattern, **types):
+        self.grammars.append(Grammar(name, pattern, types))
+        return self
+
+    def args_text(self, text):
+        """指令关键字之后的参数部分；消息中没有关键字时为空。"""
+        _, found, rest = text.partition(self.command)
+        return rest.strip() if found else ""
+
+    def parse(self, text):
+        """解析消息文本（含指令关键字），返回 Route；不符合任何语法时抛出 UsageError。"""
+        args = self.args_text(text)
+        for grammar in self.grammars:
+            m = grammar.regex.fullmatch(args)
+            if m is None:
+                continue
+            values = m.groupdict()
+            for key, conv in grammar.types.items():
+                if values.get(key) is None:
+                    continue
+                try:
+                    values[key] = conv(values[key])
+                except (ValueError, TypeError):
+                    raise UsageError("参数格式不正确", self.usage) from None
+            return Route(grammar.name, values)
+        raise UsageError("参数格式不正确", self.usage)
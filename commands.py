@@ -0,0 +1,113 @@
+"""各指令的参数语法与类型转换（不依赖 AstrBot，可单独测试）。"""
+import datetime
+import math
+import re
+
+from .command_router import PERIOD, CommandRouter, UsageError, list_of
+from .history_store import parse_period
+from .oil_table import resolve_area
+from .oil_utils import OIL_GRADE_NAMES, OIL_PRICE_KEYS
+from .subscriptions import FEED_ALIASES
+
+
+def _oil_area(name):
+    area = resolve_area(name)
+    if area is None:
+        raise UsageError(f"未知地区：{name}")
+    return area
+
+
+def _oil_grade(text):
+    grade = str(int(text))
+    if f"p{grade}" not in OIL_GRADE_NAMES:
+        raise UsageError(f"不支持的油号：{grade}（可选：{'、'.join(k[1:] for k in OIL_PRICE_KEYS)}）")
+    return grade
+
+
+def _positive(text):
+    """油耗、里程：有限的正数。"""
+    value = float(text)
+    if not (math.isfinite(value) and value > 0):
+        raise UsageError(f"油耗和里程须为正数：{text}")
+    return value
+
+
+def _positive_int(text):
+    return int(_positive(text))
+
+
+def _feed(name):
+    feed = FEED_ALIASES.get(name)
+    if feed is None:
+        raise UsageError(f"不支持的推送类型：{name}（可选：金币、油价、蛋价）")
+    return feed
+
+
+# 金币订阅阈值的下限：阈值过小时每次轻微波动都会推送，轮询间隔也会一直停在最快档
+MIN_GOLD_THRESHOLD = 0.5
+
+
+def _threshold(text):
+    value = float(text)
+    if not (math.isfinite(value) and value >= MIN_GOLD_THRESHOLD):
+        raise UsageError(f"阈值须不小于 {MIN_GOLD_THRESHOLD:g}万金币，例如：订阅 金币 1.5")
+    return value
+
+
+_CJK_RE = re.compile(r"[\u4e00-\u9fff]+")
+
+
+def _egg_area(text):
+    # 优先提取首个中文连续块，去掉后缀
+    m = _CJK_RE.search(text)
+    return m.group(0) if m else text.strip()
+
+
+def _egg_date(text):
+    # 日期须真实存在（如 20260230 视为格式错误），strptime 失败时抛出 ValueError
+    datetime.datetime.strptime(text, "%Y%m%d")
+    return text
+
+
+# 形如时间范围、但数值不合法（如 0d）的参数：不当作普通查询，回复用法
+_BAD_PERIOD = r"\d+\s*(?:[dDhH]|天|小时)"
+
+# 各指令的参数语法（按顺序尝试，对指令关键字之后的参数做完整匹配）
+GOLD_COMMAND = (CommandRouter("金币比例", usage="• 金币比例 - 查询当前金币比例\n• 金币比例 [时间范围，如 7d、24小时] - 本地历史走势")
+                .add("history", rf"(?P<period>{PERIOD})", period=parse_period)
+                .add("quote", rf"(?s)(?!{_BAD_PERIOD}$).*"))
+PROFILE_COMMAND = (CommandRouter("dnf性能")
+                   .add("action", r"(?P<action>开|关|清空)")
+                   .add("summary", r"(?s)(?P<action>).*"))
+SUBSCRIBE_COMMAND = (CommandRouter("订阅", usage="• 订阅 金币 [阈值]\n• 订阅 油价\n• 订阅 蛋价\n• 订阅 - 查看当前会话的订阅")
+                     .add("list", r"")
+                     .add("subscribe", r"(?P<feed>\S+)(?:\s+(?P<threshold>\S+))?", feed=_feed, threshold=_threshold))
+UNSUBSCRIBE_COMMAND = (CommandRouter("退订", usage="• 退订 金币 / 退订 油价 / 退订 蛋价")
+                       .add("unsubscribe", r"(?P<feed>\S+)", feed=_feed))
+ALERT_COMMAND = (CommandRouter("提醒", usage=(
+    "• 提醒 金币 > 55 - 1元高于55万金币时提醒\n• 提醒 金币 跌 3% - 较当前下跌3%时提醒\n"
+    "• 提醒 蛋价 平舆 < 4.5 / 提醒 蛋价 平舆 跌 5%\n• 提醒 删除 编号\n• 提醒 - 查看当前会话的提醒"))
+                 .add("list", r"")
+                 .add("delete", r"删除\s*#?(?P<rule_id>\d+)")
+                 .add("add", r"(?P<feed>金币|蛋价)\s*(?P<area>[\u4e00-\u9fff]*)\s*(?P<op>>|<|＞|＜|涨|跌)\s*"
+                             r"(?P<number>[0-9]+(?:\.[0-9]+)?)\s*(?P<percent>[%％]?)", number=float))
+OIL_COMMAND = (CommandRouter("油价", usage=(
+    "• 油价 地区名 - 查询地区油价\n"
+    "• 油价 地区名 油号 油耗 [里程] - 计算行驶成本（里程默认 100 公里）\n"
+    "• 油价 批量 地区1,地区2 油号1,油号2 油耗1,油耗2 [里程1,里程2] - 批量计算成本\n"
+    "• 油价 排行 [油号] - 全国油价排行\n"
+    "• 油价 对比 地区1 地区2 - 对比多个地区油价"))
+               .add("rank", r"排行(?:\s+(?P<grade>\d+))?", grade=_oil_grade)
+               .add("compare", r"对比(?P<areas>(?:\s+[^\s\d]+)*)", areas=lambda t: [_oil_area(n) for n in t.split()])
+               .add("batch", r"批量\s+(?P<areas>\S+)\s+(?P<grades>\S+)\s+(?P<consumptions>\S+)(?:\s+(?P<distances>\S+))?",
+                    areas=list_of(_oil_area), grades=list_of(_oil_grade), consumptions=list_of(_positive),
+                    distances=list_of(_positive))
+               .add("calc", r"(?P<area>\S+)\s+(?P<grade>\d+)\s+(?P<consumption>[\d.]+)(?:\s+(?P<distance>\d+))?",
+                    grade=_oil_grade, consumption=_positive, distance=_positive_int)
+               .add("area", r"(?P<area>[^\s\d]+)"))
+# 地区不含数字：写错的日期或时间范围（如 2026、0d）不会被当作地区的一部分而静默忽略；
+# 日期与时间范围只能二选一
+EGG_COMMAND = (CommandRouter("蛋价", usage="• 蛋价 [地区] [日期 YYYYMMDD] - 当天或指定日期的蛋价\n"
+                                          "• 蛋价 [地区] [时间范围，如 30d] - 本地历史走势")
+               .add("query", rf"(?P<area>[^\d]*?)\s*(?:(?P<date>\d{{8}})|(?P<period>{PERIOD}))?",
+                    area=_egg_area, date=_egg_date, period=parse_period))
@@ -1,98 +1,317 @@
-import requests
-import re
+import asyncio
+import math
+import time
+
+from .http_client import HttpError
+from .profiler import profile_phase
+
+
+class GoldRatioError(Exception):
+    """接口返回的数据中没有可用的商品报价。"""
+
+
+class GoldQuoteItem:
+    """单条商品报价：amount 单位为万金币，price 为总价（元），ratio 为 万金币/元。"""
+
+    __slots__ = ("title", "amount", "amount_text", "unit", "price", "ratio")
+
+    def __init__(self, title, amount, amount_text, unit, price, ratio):
+        self.title = title
+        self.amount = amount
+        self.amount_text = amount_text
+        self.unit = unit
+        self.price = price
+        self.ratio = ratio
+
+
+class GoldStats:
+    """全部报价的比例统计（单位均为 万金币/元）。
+
+    vwap 为成交量加权比例：总金币数 / 总价，大额报价的权重更高；
+    trimmed_mean 为去掉最高、最低各 ``trim`` 比例后的均值。
+    """
+
+    __slots__ = ("count", "mean", "median", "trimmed_mean", "vwap", "p10", "p25", "p75", "p90")
+
+    def __init__(self, count, mean, median, trimmed_mean, vwap, p10, p25, p75, p90):
+        self.count = count
+        self.mean = mean
+        self.median = median
+        self.trimmed_mean = trimmed_mean
+        self.vwap = vwap
+        self.p10 = p10
+        self.p25 = p25
+        self.p75 = p75
+        self.p90 = p90
+
+
+# 可用于监控的统计量及其显示名称
+GOLD_STAT_LABELS = {
+    "median": "中位数",
+    "trimmed_mean": "截尾均价",
+    "vwap": "加权均价",
+    "mean": "均价",
+}
+
+
+def compute_gold_stats(items, trim=0.1):
+    """计算全部报价的统计量，没有有效比例时返回 None。"""
+    ratios = []
+    total_amount = 0.0
+    total_price = 0.0
+    for it in items:
+        if it.ratio:
+            ratios.append(it.ratio)
+            total_amount += it.amount
+            total_price += it.price
+    if not ratios:
+        return None
+    import statistics
+
+    ratios.sort()
+    n = len(ratios)
+    k = int(n * trim)
+    core = ratios[k:n - k] or ratios
+    if n >= 2:
+        # 5% 一档的分位点：下标 1/4/14/17 对应 P10/P25/P75/P90
+        q = statistics.quantiles(ratios, n=20, method="inclusive")
+        p10, p25, p75, p90 = q[1], q[4], q[14], q[17]
+    else:
+        p10 = p25 = p75 = p90 = ratios[0]
+    return GoldStats(
+        count=n,
+        mean=math.fsum(ratios) / n,
+        median=statistics.median(ratios),
+        trimmed_mean=math.fsum(core) / len(core),
+        vwap=total_amount / total_price,
+        p10=p10, p25=p25, p75=p75, p90=p90,
+    )
+
+
+class GoldQuote:
+    """一次抓取得到的金币比例快照。
+
+    items 为全部分页的报价（保持上游顺序），stats 为其统计量；synced_at 为
+    上次完整抓取全部分页的时间，条件请求命中时沿用。
+    """
+
+    __slots__ = ("items", "stats", "fetched_at", "source", "pages", "synced_at")
+
+    def __init__(self, items, stats, fetched_at, source, pages=1, synced_at=None):
+        self.items = items
+        self.stats = stats
+        self.fetched_at = fetched_at
+        self.source = source
+        self.pages = pages
+        self.synced_at = synced_at if synced_at is not None else fetched_at
+
+    @property
+    def avg_ratio(self):
+        return self.stats.mean if self.stats is not None else None
+
+    def stat(self, name):
+        """按名称取统计量（见 GOLD_STAT_LABELS），无数据时为 None。"""
+        return getattr(self.stats, name) if self.stats is not None else None
+
+
+def format_gold_quote(quote, limit=5):
+    """将 GoldQuote 渲染为聊天文本（列出前 limit 条报价）：
+
+    例：
+    1  10000万金币=141.84元    1元=70.1234万金币
+    ...
+    ----------------------
+    均价：1元=xx.xxxx万金币
+    中位数：xx.xxxx  截尾均价：xx.xxxx  加权均价：xx.xxxx
+    分位：P10 xx.xx / P25 xx.xx / P75 xx.xx / P90 xx.xx
+    共 N 条报价（M 页）
+    数据来源：DD373
+    """
+    results = []
+    for idx, it in enumerate(quote.items[:limit], 1):
+        price_text = f"{it.price:.2f}" if it.price is not None else "-"
+        ratio_text = f"1元={it.ratio:.4f}万金币" if it.ratio else "1元= - 万金币"
+        # 每行显示：<idx> <amount+unit>=<price>元    <ratio>
+        # 取消 amount 与 '=' 之间的填充空格，使输出为 10000万金币=141.84元
+        results.append(f"{idx:<2} {it.amount_text}{it.unit}={price_text}元    {ratio_text}")
+    results.append("-" * 38)
+    results.append(f"均价：1元={(quote.avg_ratio or 0):.4f}万金币")
+    st = quote.stats
+    if st is not None and st.count > 1:
+        results.append(f"中位数：{st.median:.4f}  截尾均价：{st.trimmed_mean:.4f}  加权均价：{st.vwap:.4f}")
+        results.append(f"分位：P10 {st.p10:.2f} / P25 {st.p25:.2f} / P75 {st.p75:.2f} / P90 {st.p90:.2f}")
+        results.append(f"共 {st.count} 条报价（{quote.pages} 页）")
+    results.append(f"数据来源：{quote.source}")
+    return "\n".join(results)
 
 
 class DnfGoldRatioFetcher:
+    SOURCE = "DD373"
+    URL = "https://goods.dd373.com/Api/Goods/UserCenter/ApiGetShopList?gameid=7100fe84-ef8a-4f0a-8547-a8682a78e555&GameOtherId=56dd5e29-5119-4c0d-a94e-a532f550fa7d_2ab7245b-048f-4d5e-abd2-90d3700290ed&GameShopTypeId=739b5eb8-3d96-4b09-9a06-5a8983a6adf4"
+    HEADERS = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+        "Accept": "application/json, text/javascript, */*; q=0.01",
+    }
+
+    # 分页参数：每页条数、最多抓取的页数，以及第一页未变化时仍强制完整刷新的间隔（秒）
+    PAGE_SIZE = 20
+    MAX_PAGES = 5
+    PAGE_CONCURRENCY = 4
+    FULL_REFRESH = 300
+
     @staticmethod
-    def fetch_gold_ratio_text():
-        """
-        使用 DD373 的内部接口获取商品列表（前 5 条），并返回与原爬虫相同的文本格式，
-        使调用方无需修改：
-
-        例：
-        1  商店编号...        1元=70.1234万金币
-        ...
-        ----------------------
-        均价：1元=xx.xxxx万金币
-        数据来源：DD373
-        """
-        url = "https://goods.dd373.com/Api/Goods/UserCenter/ApiGetShopList?gameid=7100fe84-ef8a-4f0a-8547-a8682a78e555&GameOtherId=56dd5e29-5119-4c0d-a94e-a532f550fa7d_2ab7245b-048f-4d5e-abd2-90d3700290ed&GameShopTypeId=739b5eb8-3d96-4b09-9a06-5a8983a6adf4"
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            "Accept": "application/json, text/javascript, */*; q=0.01",
-        }
-        try:
-            resp = requests.get(url, headers=headers, timeout=10)
-            resp.raise_for_status()
-            data = resp.json()
-
-            # 校验返回结构
-            result_list = None
-            if isinstance(data, dict):
-                sd = data.get("StatusData")
-                if isinstance(sd, dict):
-                    rd = sd.get("ResultData")
-                    if isinstance(rd, list):
-                        result_list = rd
-
-            if not result_list:
-                return "未能从接口获取商品数据。"
-
-            # 取前 5 条
-            items = result_list[:5]
-            ratios = []
-            results = []
-            for idx, it in enumerate(items, 1):
-                # 使用 trade + amount（带单位）作为标题，不使用 shopno
-                trade = (it.get("trade") or "").strip()
-                amount_field = it.get("amount") or it.get("number") or ""
-                # 格式化 amount：若能解析为数字且为整数则不显示小数点
+    def _result_list(data):
+        if isinstance(data, dict):
+            sd = data.get("StatusData")
+            if isinstance(sd, dict):
+                rd = sd.get("ResultData")
+                if isinstance(rd, list):
+                    return rd
+        return None
+
+    @staticmethod
+    def page_count(data, max_pages):
+        """根据第一页返回的总页数 / 总条数决定要抓取的页数（不超过 max_pages）。"""
+        sd = data.get("StatusData") if isinstance(data, dict) else None
+        if isinstance(sd, dict):
+            for key in ("PageCount", "TotalPage", "PageTotal"):
                 try:
-                    af = float(amount_field)
-                    if af.is_integer():
-                        amount_str = str(int(af))
-                    else:
-                        # 去掉不必要的尾随 0
-                        amount_str = ("%f" % af).rstrip('0').rstrip('.')
-                except Exception:
-                    amount_str = str(amount_field)
-                unit = it.get("unit") or ""
-                # 如果 trade 为 '担保'，则不显示该词，只显示数量和单位
-                if trade == "担保":
-                    title_text = f"{amount_str}{unit}".strip()
-                elif trade:
-                    title_text = f"{trade} {amount_str}{unit}".strip()
-                else:
-                    title_text = f"{amount_str}{unit}".strip()
-
-                # price 是总价（元），singleprice 是 元/单位，两者等价可用来计算比率
-                price_raw = it.get("price")
+                    return max(1, min(int(sd[key]), max_pages))
+                except (KeyError, TypeError, ValueError):
+                    pass
+            for key in ("TotalCount", "RecordCount", "TotalRecord", "Total"):
                 try:
-                    price = float(price_raw)
-                except Exception:
-                    price = None
-
-                ratio_val = None
-                if price and price > 0:
-                    # ratio = amount(单位：万金币) / price(元) -> 万金币/元
-                    try:
-                        ratio_val = af / price
-                    except Exception:
-                        ratio_val = None
-                    if ratio_val:
-                        ratios.append(ratio_val)
-
-                price_text = f"{price:.2f}" if price is not None else "-"
-                ratio_text = f"1元={ratio_val:.4f}万金币" if ratio_val else "1元= - 万金币"
-                # 每行显示：<idx> <amount+unit>=<price>元    <ratio>
-                # 取消 amount 与 '=' 之间的填充空格，使输出为 10000万金币=141.84元
-                results.append(f"{idx:<2} {amount_str}{unit}={price_text}元    {ratio_text}")
-
-            avg_ratio = sum(ratios) / len(ratios) if ratios else 0
-            results.append("-" * 38)
-            results.append(f"均价：1元={avg_ratio:.4f}万金币")
-            results.append("数据来源：DD373")
-            return "\n".join(results)
-        except Exception as e:
-            return f"查询金币比例失败：{e}"
+                    total = int(sd[key])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                return max(1, min(math.ceil(total / DnfGoldRatioFetcher.PAGE_SIZE), max_pages))
+        # 未给出总数：第一页满页时按上限抓取，多出的空页不影响结果
+        first = DnfGoldRatioFetcher._result_list(data) or []
+        return max_pages if len(first) >= DnfGoldRatioFetcher.PAGE_SIZE else 1
+
+    @staticmethod
+    def _parse_item(it):
+        # 使用 trade + amount（带单位）作为标题，不使用 shopno
+        trade = (it.get("trade") or "").strip()
+        amount_field = it.get("amount") or it.get("number") or ""
+        # 格式化 amount：若能解析为数字且为整数则不显示小数点
+        try:
+            amount = float(amount_field)
+            if amount.is_integer():
+                amount_text = str(int(amount))
+            else:
+                # 去掉不必要的尾随 0
+                amount_text = ("%f" % amount).rstrip('0').rstrip('.')
+        except Exception:
+            amount = None
+            amount_text = str(amount_field)
+        unit = it.get("unit") or ""
+        # 如果 trade 为 '担保'，则不显示该词，只显示数量和单位
+        if trade and trade != "担保":
+            title = f"{trade} {amount_text}{unit}".strip()
+        else:
+            title = f"{amount_text}{unit}".strip()
+
+        # price 是总价（元），singleprice 是 元/单位，两者等价可用来计算比率
+        try:
+            price = float(it.get("price"))
+        except Exception:
+            price = None
+
+        ratio = None
+        if price and price > 0 and amount is not None:
+            # ratio = amount(单位：万金币) / price(元) -> 万金币/元
+            ratio = amount / price
+        return GoldQuoteItem(title, amount, amount_text, unit, price, ratio)
+
+    @staticmethod
+    def parse_quote(data, fetched_at=None, extra_pages=()):
+        """把 DD373 接口返回的 JSON 转换为 GoldQuote。
 
+        data 为第一页，extra_pages 为其余分页；翻页期间上游列表变动导致同一商品
+        出现在两页时按 shopno 去重。
+        """
+        result_list = DnfGoldRatioFetcher._result_list(data)
+        if not result_list:
+            raise GoldRatioError("未能从接口获取商品数据。")
+
+        items = []
+        seen = set()
+        for page in (data, *extra_pages):
+            for it in DnfGoldRatioFetcher._result_list(page) or ():
+                if not isinstance(it, dict):
+                    continue
+                shop_no = it.get("shopno") or it.get("ShopNo")
+                if shop_no:
+                    if shop_no in seen:
+                        continue
+                    seen.add(shop_no)
+                items.append(DnfGoldRatioFetcher._parse_item(it))
+
+        return GoldQuote(tuple(items), compute_gold_stats(items), fetched_at or time.time(),
+                         DnfGoldRatioFetcher.SOURCE, pages=1 + len(extra_pages))
+
+    @staticmethod
+    def _page_params(page):
+        return {"PageIndex": page, "PageSize": DnfGoldRatioFetcher.PAGE_SIZE}
+
+    @staticmethod
+    async def _fetch_pages(http, pages, concurrency):
+        """有限并发抓取第 2 页起的分页；单页失败时跳过该页。"""
+        sem = asyncio.Semaphore(concurrency)
+
+        async def one(page):
+            async with sem:
+                resp = await http.get(DnfGoldRatioFetcher.URL, params=DnfGoldRatioFetcher._page_params(page),
+                                      headers=DnfGoldRatioFetcher.HEADERS)
+                return resp.json()
+
+        outcomes = await asyncio.gather(*(one(page) for page in range(2, pages + 1)), return_exceptions=True)
+        results = []
+        for outcome in outcomes:
+            if isinstance(outcome, asyncio.CancelledError):
+                raise outcome
+            if isinstance(outcome, (HttpError, ValueError)):
+                continue
+            if isinstance(outcome, BaseException):
+                raise outcome
+            results.append(outcome)
+        return results
+
+    @staticmethod
+    async def fetch_quote(http, previous=None, max_pages=None):
+        """使用 DD373 的内部接口获取商品列表（全部分页），返回 GoldQuote。
+
+        请求经由插件共享的 ``AsyncHttpClient`` 发出；网络错误抛出 ``HttpError``，
+        数据为空时抛出 ``GoldRatioError``。第一页按条件请求发送：传入上一次的
+        previous 且第一页未变化时不再抓取其余分页，直接返回刷新了抓取时间的
+        previous；距上次完整抓取超过 FULL_REFRESH 秒时强制重新抓取全部分页。
+        有分页抓取失败时结果不算完整抓取（synced_at 记为 0），下次调用强制完整刷新。
+        """
+        cls = DnfGoldRatioFetcher
+        key = cls.SOURCE
+        max_pages = max_pages or cls.MAX_PAGES
+        now = time.time()
+        force = previous is None or now - previous.synced_at >= cls.FULL_REFRESH
+        with profile_phase("fetch"):
+            resp = await http.get_if_changed(cls.URL, key, params=cls._page_params(1), headers=cls.HEADERS,
+                                             force=force)
+            if resp is None:
+                return GoldQuote(previous.items, previous.stats, now, previous.source,
+                                 pages=previous.pages, synced_at=previous.synced_at)
+            try:
+                first = resp.json()
+            except ValueError as e:
+                http.forget(key)
+                raise HttpError(f"响应不是合法的 JSON: {cls.URL}") from e
+            pages = cls.page_count(first, max_pages)
+            extra_pages = await cls._fetch_pages(http, pages, cls.PAGE_CONCURRENCY)
+        try:
+            with profile_phase("parse"):
+                quote = cls.parse_quote(first, fetched_at=now, extra_pages=extra_pages)
+        except GoldRatioError:
+            http.forget(key)
+            raise
+        if len(extra_pages) < pages - 1:
+            quote.synced_at = 0.0
+        return quote
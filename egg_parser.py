@@ -0,0 +1,145 @@
+"""quotn.cn 蛋价搜索接口的响应解析。
+
+解析顺序：
+1. 快速路径：``body.dataList`` 或顶级 ``dataList`` 列表，逐条转换；
+2. 快速路径不适用时，遍历整个 JSON，收集含价格字段的对象；
+3. 仍无结果时，用正则从原始文本中提取 "名称 价格元"。
+
+响应体先用 json.loads 整体解码再遍历，不做流式解析：单次响应不大（录制的样本约 20 KB），
+而且正则兜底本来就需要完整文本。
+"""
+import datetime
+import json
+import re
+
+EGG_API_URL = "http://www.quotn.cn/e/search"
+
+_NUMBER_RE = re.compile(r"([0-9]+(?:\.[0-9]+)?)")
+_TEXT_PRICE_RE = re.compile(r"([\u4e00-\u9fff\w\-\s\/（）()]{2,60}?)\s*[：:\-\s]{0,3}\s*([0-9]+(?:\.[0-9]+)?)\s*(?:元|元/斤|元/公斤)")
+
+# 通用遍历时识别价格/标题/时间的字段名
+_PRICE_KEYS = ("price", "priceText", "金额")
+_TITLE_KEYS = ("title", "name", "标题")
+_TIME_KEYS = ("uTime", "utime", "u_time", "time", "date", "pubTime", "pubtime", "报价时间")
+# dataList 条目在缺少 tPrice 时依次尝试的价格字段
+_LIST_PRICE_KEYS = ("price", "priceText", "金额", "yPrice")
+
+
+def to_price(raw):
+    """把价格字段转换为 float，支持带单位的文本（如 "4.20元/斤"），无法识别时返回 None。"""
+    if raw is None or raw == "":
+        return None
+    try:
+        return float(raw)
+    except (TypeError, ValueError):
+        m = _NUMBER_RE.search(str(raw))
+        return float(m.group(1)) if m else None
+
+
+def _format_utime(raw):
+    try:
+        # 若为纯数字字符串或数字，尝试解析为时间戳（秒或毫秒）
+        if isinstance(raw, (int, float)) or (isinstance(raw, str) and raw.isdigit()):
+            n = int(raw)
+            # 若为毫秒级时间戳（> 1e12），则转换为秒
+            if n > 10**12:
+                n = n // 1000
+            return datetime.datetime.fromtimestamp(n).strftime('%Y-%m-%d %H:%M')
+        # 否则直接使用字符串形式（裁剪过长）
+        return str(raw)[:19]
+    except Exception:
+        return str(raw)
+
+
+def _find_data_list(j):
+    if not isinstance(j, dict):
+        return None
+    body = j.get('body')
+    if isinstance(body, dict) and isinstance(body.get('dataList'), list):
+        return body['dataList']
+    if isinstance(j.get('dataList'), list):
+        return j['dataList']
+    return None
+
+
+def _parse_data_list(data_list):
+    results = []
+    for item in data_list:
+        if not isinstance(item, dict):
+            continue
+        # 地址使用 cName + aName
+        c_name = item.get('cName') or ''
+        a_name = item.get('aName') or ''
+        title = f"{c_name}{a_name}" if (c_name or a_name) else (item.get('name') or '')
+        # 优先使用 tPrice，缺失时依次尝试其他价格字段
+        t_price = item.get('tPrice')
+        if t_price not in (None, ''):
+            price = to_price(t_price)
+        else:
+            price = None
+            for pk in _LIST_PRICE_KEYS:
+                raw = item.get(pk)
+                if raw not in (None, ''):
+                    price = to_price(raw)
+                    break
+        results.append({
+            "title": title.strip(),
+            "price": price,
+            # upTime 字段直接使用（不加标签）
+            "upTime": item.get('upTime') or None,
+            "cName": c_name,
+            "aName": a_name,
+            # yPrice 可作为昨日价格参考
+            "yPrice": to_price(item.get('yPrice')),
+        })
+    return results
+
+
+def _collect(root):
+    """深度优先遍历 JSON，收集含价格字段的对象；命中的对象不再向下展开。"""
+    results = []
+    stack = [root]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, dict):
+            price_key = next((k for k in _PRICE_KEYS if k in obj), None)
+            if price_key is None:
+                stack.extend(reversed(list(obj.values())))
+                continue
+            title = next((obj[k] for k in _TITLE_KEYS if obj.get(k)), "")
+            utime_raw = next((obj[k] for k in _TIME_KEYS if obj.get(k)), None)
+            results.append({
+                "title": str(title).strip(),
+                "price": to_price(obj.get(price_key)),
+                "utime": _format_utime(utime_raw) if utime_raw is not None else None,
+            })
+        elif isinstance(obj, list):
+            stack.extend(reversed(obj))
+    return results
+
+
+def _parse_text(text):
+    return [{"title": title.strip(), "price": float(price_s)} for title, price_s in _TEXT_PRICE_RE.findall(text)]
+
+
+def parse_egg_prices(body, charset=None):
+    """解析接口原始响应（bytes 或 str），返回条目列表。
+
+    dataList 条目包含 title/price/upTime/cName/aName/yPrice；通用遍历的条目包含
+    title/price/utime；文本兜底的条目仅包含 title/price。
+    """
+    text = body.decode(charset or "utf-8", errors="replace") if isinstance(body, bytes) else str(body or "")
+    try:
+        j = json.loads(text)
+    except ValueError:
+        j = None
+
+    data_list = _find_data_list(j)
+    if data_list:
+        results = _parse_data_list(data_list)
+    else:
+        results = _collect(j)
+
+    if not results:
+        results = _parse_text(text)
+    return results
@@ -0,0 +1,312 @@
+import asyncio
+import datetime
+import json
+import re
+import threading
+import time
+
+HOUR = 3600
+DAY = 86400
+_PERIOD_RE = re.compile(r"^(\d{1,3})\s*(d|h|天|小时)$", re.IGNORECASE)
+_SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+
+def parse_period(text):
+    """解析 ``7d``、``24h``、``30天`` 这类时间范围，返回秒数；不匹配时返回 None。"""
+    m = _PERIOD_RE.match((text or "").strip())
+    if not m or int(m.group(1)) == 0:
+        return None
+    return int(m.group(1)) * (DAY if m.group(2).lower() in ("d", "天") else HOUR)
+
+
+def _day_bucket(ts):
+    # 日汇总按本地时间的自然日对齐
+    d = datetime.datetime.fromtimestamp(ts)
+    return d.replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+
+
+def sparkline(values, width=24):
+    """把数值序列渲染为紧凑的字符走势图，超过 width 个点时分段取均值。"""
+    values = [v for v in values if v is not None]
+    if not values:
+        return ""
+    if len(values) > width:
+        step = len(values) / width
+        values = [
+            sum(chunk) / len(chunk)
+            for chunk in (values[int(i * step):max(int((i + 1) * step), int(i * step) + 1)] for i in range(width))
+        ]
+    lo, hi = min(values), max(values)
+    if hi == lo:
+        return _SPARK_CHARS[len(_SPARK_CHARS) // 2] * len(values)
+    scale = (len(_SPARK_CHARS) - 1) / (hi - lo)
+    return "".join(_SPARK_CHARS[int(round((v - lo) * scale))] for v in values)
+
+
+class SeriesSummary:
+    """一段时间内某个序列的统计结果。points 为各汇总桶的均值，按时间升序。"""
+
+    __slots__ = ("series", "count", "min", "max", "mean", "first", "last", "start_ts", "end_ts", "points")
+
+    def __init__(self, series, count, min_, max_, mean, first, last, start_ts, end_ts, points):
+        self.series = series
+        self.count = count
+        self.min = min_
+        self.max = max_
+        self.mean = mean
+        self.first = first
+        self.last = last
+        self.start_ts = start_ts
+        self.end_ts = end_ts
+        self.points = points
+
+    @property
+    def change_pct(self):
+        if not self.first:
+            return None
+        return (self.last - self.first) / self.first * 100
+
+
+class HistoryStore:
+    """追加写入的本地时序存储（SQLite，WAL 模式）。
+
+    每条观测为 (series, ts, value, extra)，series 形如 ``gold.avg``、``oil.河南.p92``、
+    ``egg.平舆``。``record`` 只写入内存缓冲区，由后台任务按间隔或缓冲区大小
+    批量落盘；写入失败时保留缓冲等待重试，超过 max_buffer 条时丢弃最早的观测。落盘时同步维护按小时和按天的预汇总
+    （count/sum/min/max/首末值），走势查询只读汇总表。
+
+    snapshots 表按键保存不会再变化的数据（如已结束日期的蛋价列表），读写都在线程池中。
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS observations ("
+        " series TEXT NOT NULL, ts REAL NOT NULL, value REAL, extra TEXT)",
+        "CREATE INDEX IF NOT EXISTS idx_observations_series_ts ON observations (series, ts)",
+        "CREATE TABLE IF NOT EXISTS rollups ("
+        " series TEXT NOT NULL, bucket_size INTEGER NOT NULL, bucket REAL NOT NULL,"
+        " count INTEGER NOT NULL, sum REAL NOT NULL, min REAL NOT NULL, max REAL NOT NULL,"
+        " first_ts REAL NOT NULL, first REAL NOT NULL, last_ts REAL NOT NULL, last REAL NOT NULL,"
+        " PRIMARY KEY (series, bucket_size, bucket))",
+        "CREATE TABLE IF NOT EXISTS snapshots (key TEXT PRIMARY KEY, stored_at REAL NOT NULL, data TEXT NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS idx_snapshots_stored_at ON snapshots (stored_at)",
+    )
+    UPSERT_ROLLUP = (
+        "INSERT INTO rollups (series, bucket_size, bucket, count, sum, min, max, first_ts, first, last_ts, last)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+        " ON CONFLICT (series, bucket_size, bucket) DO UPDATE SET"
+        " count = count + excluded.count, sum = sum + excluded.sum,"
+        " min = MIN(min, excluded.min), max = MAX(max, excluded.max),"
+        " first = CASE WHEN excluded.first_ts < first_ts THEN excluded.first ELSE first END,"
+        " first_ts = MIN(first_ts, excluded.first_ts),"
+        " last = CASE WHEN excluded.last_ts >= last_ts THEN excluded.last ELSE last END,"
+        " last_ts = MAX(last_ts, excluded.last_ts)"
+    )
+
+    def __init__(self, path, flush_interval=10.0, batch_size=500, max_buffer=20000, logger=None):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_buffer = max_buffer
+        self.logger = logger
+        self._buffer = []
+        # 因缓冲区超限而丢弃的观测数
+        self.dropped = 0
+        self._conn = None
+        self._db_lock = threading.Lock()
+        self._flush_task = None
+        self._wakeup = None
+
+    def _connect(self):
+        if self._conn is None:
+            # 数据库在 start 时（线程池中）才打开，sqlite3 随之按需导入
+            import sqlite3
+
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for stmt in self.SCHEMA:
+                conn.execute(stmt)
+            conn.commit()
+            self._conn = conn
+            # 旧版本数据库只有原始观测，首次打开时补建汇总
+            if conn.execute("SELECT 1 FROM rollups LIMIT 1").fetchone() is None:
+                self._rebuild_rollups()
+        return self._conn
+
+    @staticmethod
+    def _aggregate(rows):
+        """把原始观测聚合为 {(series, bucket_size, bucket): [count, sum, min, max, first_ts, first, last_ts, last]}。"""
+        agg = {}
+        for series, ts, value, _ in rows:
+            for size, bucket in ((HOUR, ts - ts % HOUR), (DAY, _day_bucket(ts))):
+                key = (series, size, bucket)
+                a = agg.get(key)
+                if a is None:
+                    agg[key] = [1, value, value, value, ts, value, ts, value]
+                    continue
+                a[0] += 1
+                a[1] += value
+                a[2] = min(a[2], value)
+                a[3] = max(a[3], value)
+                if ts < a[4]:
+                    a[4], a[5] = ts, value
+                if ts >= a[6]:
+                    a[6], a[7] = ts, value
+        return agg
+
+    def _upsert_rollups(self, conn, rows):
+        conn.executemany(self.UPSERT_ROLLUP, [key + tuple(a) for key, a in self._aggregate(rows).items()])
+
+    def _rebuild_rollups(self):
+        conn = self._conn
+        rows = conn.execute("SELECT series, ts, value, extra FROM observations WHERE value IS NOT NULL").fetchall()
+        if rows:
+            with conn:
+                conn.execute("DELETE FROM rollups")
+                self._upsert_rollups(conn, rows)
+
+    def record(self, series, value, ts=None, extra=None):
+        """记录一条观测（仅进入缓冲区）。"""
+        if value is None:
+            return
+        self._buffer.append((
+            series,
+            ts if ts is not None else time.time(),
+            float(value),
+            json.dumps(extra, ensure_ascii=False) if extra is not None else None,
+        ))
+        if len(self._buffer) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    def _write(self, rows):
+        with self._db_lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany("INSERT INTO observations (series, ts, value, extra) VALUES (?, ?, ?, ?)", rows)
+                self._upsert_rollups(conn, rows)
+
+    def flush_sync(self):
+        """把缓冲区同步写入数据库，返回写入条数。"""
+        rows, self._buffer = self._buffer, []
+        if rows:
+            self._write(rows)
+        return len(rows)
+
+    async def flush(self):
+        """在线程池中批量写入缓冲区（缓冲区在事件循环线程中取出），返回写入条数。"""
+        if not self._buffer:
+            return 0
+        rows, self._buffer = self._buffer, []
+        try:
+            await asyncio.to_thread(self._write, rows)
+        except Exception:
+            # 写入失败时放回缓冲区，等待下次重试；磁盘长期不可写时只保留最近 max_buffer 条
+            self._buffer = rows + self._buffer
+            overflow = len(self._buffer) - self.max_buffer
+            if overflow > 0:
+                del self._buffer[:overflow]
+                self.dropped += overflow
+            raise
+        return len(rows)
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                # 磁盘暂时不可写等错误不应终止落盘任务
+                if self.logger is not None:
+                    self.logger.error(f"历史数据写入失败（待写入 {len(self._buffer)} 条，已丢弃 {self.dropped} 条）: {e}")
+
+    async def start(self):
+        if self._flush_task is None:
+            self._wakeup = asyncio.Event()
+            await asyncio.to_thread(self._locked_connect)
+            self._flush_task = asyncio.ensure_future(self._flush_loop())
+
+    def _locked_connect(self):
+        with self._db_lock:
+            self._connect()
+
+    async def close(self):
+        """停止后台落盘任务，写入剩余缓冲并关闭连接。"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await asyncio.to_thread(self._close_sync)
+
+    def _close_sync(self):
+        self.flush_sync()
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _get_snapshot_sync(self, key):
+        with self._db_lock:
+            row = self._connect().execute("SELECT data FROM snapshots WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _put_snapshots_sync(self, items, max_entries):
+        now = time.time()
+        # 按传入顺序递增写入时间，淘汰时先淘汰最早写入的
+        rows = [(key, now + i * 1e-6, json.dumps(data, ensure_ascii=False)) for i, (key, data) in enumerate(items)]
+        with self._db_lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO snapshots (key, stored_at, data) VALUES (?, ?, ?)", rows)
+                if max_entries is not None:
+                    conn.execute(
+                        "DELETE FROM snapshots WHERE key NOT IN"
+                        " (SELECT key FROM snapshots ORDER BY stored_at DESC LIMIT ?)", (max_entries,))
+
+    async def get_snapshot(self, key):
+        """读取 key 对应的快照，不存在时返回 None。"""
+        return await asyncio.to_thread(self._get_snapshot_sync, key)
+
+    async def put_snapshots(self, items, max_entries=None):
+        """写入 [(key, data), ...]（覆盖同名快照）；超过 max_entries 条时淘汰最早写入的。"""
+        items = list(items)
+        if items:
+            await asyncio.to_thread(self._put_snapshots_sync, items, max_entries)
+
+    def _summarize_sync(self, series, since, until):
+        bucket_size = HOUR if until - since <= 2 * DAY else DAY
+        with self._db_lock:
+            rows = self._connect().execute(
+                "SELECT bucket, count, sum, min, max, first_ts, first, last_ts, last FROM rollups"
+                " WHERE series = ? AND bucket_size = ? AND bucket >= ? AND bucket < ? ORDER BY bucket",
+                (series, bucket_size, since - bucket_size, until),
+            ).fetchall()
+        # 起始桶可能只有部分落在范围内，按桶内最后一次观测判断是否保留
+        rows = [r for r in rows if r[7] >= since]
+        if not rows:
+            return None
+        count = sum(r[1] for r in rows)
+        return SeriesSummary(
+            series,
+            count,
+            min(r[3] for r in rows),
+            max(r[4] for r in rows),
+            sum(r[2] for r in rows) / count,
+            rows[0][6],
+            rows[-1][8],
+            rows[0][5],
+            rows[-1][7],
+            [r[2] / r[1] for r in rows],
+        )
+
+    async def summarize(self, series, period, now=None):
+        """基于预汇总计算最近 period 秒内的统计；没有数据时返回 None。"""
+        await self.flush()
+        until = now if now is not None else time.time()
+        return await asyncio.to_thread(self._summarize_sync, series, until - period, until + 1)
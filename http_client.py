@@ -0,0 +1,216 @@
+import asyncio
+import collections
+import hashlib
+import json
+import time
+from urllib.parse import urlsplit, urlunsplit
+
+from .circuit_breaker import CircuitBreaker
+
+
+class HttpError(Exception):
+    """上游请求失败（网络错误、超时或非 2xx 状态码）。"""
+
+
+class CircuitOpenError(HttpError):
+    """上游主机已被熔断，请求未发出即失败。"""
+
+    def __init__(self, host, retry_after):
+        super().__init__(f"{host} 暂时不可用（已熔断，约 {retry_after:.0f} 秒后重试）")
+        self.host = host
+        self.retry_after = retry_after
+
+
+class HttpResponse:
+    """已读取完毕的响应，连接在返回前即已归还连接池。"""
+
+    __slots__ = ("url", "status", "headers", "body", "charset")
+
+    def __init__(self, url, status, headers, body, charset=None):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.charset = charset
+
+    @property
+    def text(self):
+        return self.body.decode(self.charset or "utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class AsyncHttpClient:
+    """插件共享的异步 HTTP 客户端。
+
+    所有上游请求都经由同一个 ``aiohttp.ClientSession``：连接池保持长连接，
+    并限制总连接数与单个主机的并发数，避免阻塞事件循环或压垮上游。
+    """
+
+    DEFAULT_HEADERS = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    }
+
+    # get_if_changed 最多保留的校验信息条数（按最近使用淘汰）
+    MAX_VALIDATORS = 256
+
+    def __init__(self, timeout=10, connect_timeout=5, limit=32, limit_per_host=4, keepalive_timeout=60,
+                 on_request=None, breaker_threshold=3, breaker_reset=30.0, breaker_max_reset=600.0,
+                 upstream_overrides=None):
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self._session = None
+        self._lock = asyncio.Lock()
+        # 每次请求结束后回调 on_request(url, status, elapsed, error)，用于统计耗时与错误；
+        # status 在网络错误时为 None，error 为 None / "timeout" / "network" / "http"
+        self.on_request = on_request
+        # 每个上游主机一个熔断器：连续失败后直接拒绝请求，不再等待超时
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        self.breaker_max_reset = breaker_max_reset
+        self.breakers = {}
+        # key -> (ETag, Last-Modified, 响应体摘要)
+        self._validators = collections.OrderedDict()
+        # key -> 因内容未变而跳过解析的次数（304 与摘要相同均计入）
+        self.skipped_parses = collections.Counter()
+        # 上游主机 -> 替代地址（如 {"goods.dd373.com": "http://127.0.0.1:18080"}），用于离线测试与基准；
+        # 熔断、统计与校验信息仍按原主机记录
+        self.upstream_overrides = dict(upstream_overrides or {})
+
+    async def start(self):
+        """创建会话与连接池；重复调用无副作用。"""
+        # aiohttp 导入较慢，推迟到首次创建会话时再导入，加快插件加载
+        import aiohttp
+
+        async with self._lock:
+            if self._session is None or self._session.closed:
+                connector = aiohttp.TCPConnector(
+                    limit=self.limit,
+                    limit_per_host=self.limit_per_host,
+                    keepalive_timeout=self.keepalive_timeout,
+                    ttl_dns_cache=300,
+                )
+                self._session = aiohttp.ClientSession(
+                    connector=connector,
+                    timeout=aiohttp.ClientTimeout(total=self.timeout, sock_connect=self.connect_timeout),
+                    headers=self.DEFAULT_HEADERS,
+                )
+        return self._session
+
+    async def close(self):
+        async with self._lock:
+            if self._session is not None and not self._session.closed:
+                await self._session.close()
+            self._session = None
+
+    def breaker(self, host):
+        breaker = self.breakers.get(host)
+        if breaker is None:
+            breaker = self.breakers[host] = CircuitBreaker(
+                self.breaker_threshold, self.breaker_reset, self.breaker_max_reset)
+        return breaker
+
+    def route(self, url):
+        """按 upstream_overrides 改写请求地址（只替换协议与主机，保留路径和查询参数）。"""
+        parts = urlsplit(url)
+        base = self.upstream_overrides.get(parts.hostname or "")
+        if not base:
+            return url
+        b = urlsplit(base)
+        return urlunsplit((b.scheme, b.netloc, parts.path, parts.query, parts.fragment))
+
+    async def get(self, url, params=None, headers=None, timeout=None):
+        """发送 GET 请求并读取完整响应体，失败时抛出 ``HttpError``。
+
+        目标主机处于熔断状态时立即抛出 ``CircuitOpenError``。超时、网络错误、
+        5xx 与 429 计为主机故障，其他 4xx 说明主机仍可用。
+        """
+        import aiohttp
+
+        session = self._session
+        if session is None or session.closed:
+            # 后台任务可能早于 initialize 运行，此时按需创建会话
+            session = await self.start()
+        host = urlsplit(url).hostname or ""
+        breaker = self.breaker(host)
+        if not breaker.allow_request():
+            raise CircuitOpenError(host, breaker.retry_after())
+        req_timeout = aiohttp.ClientTimeout(total=timeout, sock_connect=self.connect_timeout) if timeout else None
+        started = time.perf_counter()
+        status = None
+        error = None
+        # 响应体完整读取后才置为 True；只收到响应头就被取消不能说明主机已恢复
+        completed = False
+        try:
+            async with session.get(self.route(url), params=params, headers=headers, timeout=req_timeout) as resp:
+                status = resp.status
+                body = await resp.read()
+                completed = True
+                if resp.status >= 400:
+                    error = "http"
+                    raise HttpError(f"HTTP {resp.status}: {url}")
+                return HttpResponse(str(resp.url), resp.status, resp.headers, body, resp.charset)
+        except HttpError:
+            raise
+        except asyncio.TimeoutError as e:
+            error = "timeout"
+            raise HttpError(f"请求超时: {url}") from e
+        except aiohttp.ClientError as e:
+            error = "network"
+            raise HttpError(f"请求失败: {e}") from e
+        finally:
+            if error in ("timeout", "network") or (error == "http" and (status >= 500 or status == 429)):
+                breaker.record_failure()
+            elif completed:
+                breaker.record_success()
+            else:
+                # 请求被取消（含已收到响应头、尚未读完响应体），未得出结论
+                breaker.release_probe()
+            if self.on_request is not None:
+                self.on_request(url, status, time.perf_counter() - started, error)
+
+    async def get_if_changed(self, url, key, params=None, headers=None, timeout=None, force=False):
+        """条件请求：内容与上次相同时返回 None，调用方应直接沿用上次的解析结果。
+
+        上游支持时携带 If-None-Match / If-Modified-Since，收到 304 即视为未变化；
+        不支持时比较响应体摘要。key 用于区分不同的逻辑资源（参数中的时间戳等
+        随机值不应进入 key）。force=True 时总是返回响应，仅更新校验信息。
+        内容解析失败时调用方应调用 ``forget(key)``，避免相同内容在下次被跳过。
+        """
+        cached = self._validators.get(key)
+        req_headers = dict(headers or {})
+        if cached is not None and not force:
+            etag, last_modified, _ = cached
+            if etag:
+                req_headers["If-None-Match"] = etag
+            if last_modified:
+                req_headers["If-Modified-Since"] = last_modified
+        resp = await self.get(url, params=params, headers=req_headers, timeout=timeout)
+        if resp.status == 304 and cached is not None:
+            self._validators.move_to_end(key)
+            self.skipped_parses[key] += 1
+            return None
+        digest = hashlib.blake2b(resp.body, digest_size=16).digest()
+        self._validators[key] = (resp.headers.get("ETag"), resp.headers.get("Last-Modified"), digest)
+        self._validators.move_to_end(key)
+        while len(self._validators) > self.MAX_VALIDATORS:
+            self._validators.popitem(last=False)
+        if cached is not None and cached[2] == digest and not force:
+            self.skipped_parses[key] += 1
+            return None
+        return resp
+
+    def forget(self, key):
+        """丢弃 key 的校验信息，下次 get_if_changed 必定返回响应。"""
+        self._validators.pop(key, None)
+
+    async def get_json(self, url, params=None, headers=None, timeout=None):
+        resp = await self.get(url, params=params, headers=headers, timeout=timeout)
+        try:
+            return resp.json()
+        except ValueError as e:
+            raise HttpError(f"响应不是合法的 JSON: {url}") from e
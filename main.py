@@ -1,14 +1,34 @@
 from astrbot.api.event import filter, AstrMessageEvent, MessageEventResult
 from astrbot.api.star import Context, Star, register
 from astrbot.api import logger
-from .dnf_utils import DnfGoldRatioFetcher
+from .dnf_utils import GOLD_STAT_LABELS, DnfGoldRatioFetcher, GoldRatioError, format_gold_quote
+from .http_client import AsyncHttpClient, CircuitOpenError, HttpError
+from .cache import AsyncTTLCache
+from .egg_parser import EGG_API_URL, parse_egg_prices
+from .state_store import StateStore
+from .scheduler import Scheduler
+from .adaptive_interval import AdaptiveInterval
+from .metrics import MetricsRegistry, MetricsServer
+from .profiler import HandlerProfiler, profile_mark, profile_phase, profiled
+from .send_queue import SendQueue
+from .platform_resolver import PlatformResolver
+from .alerts import AlertBook
+from .subscriptions import FEEDS, SubscriptionRegistry, make_target
+from .history_store import DAY, HistoryStore, sparkline
+from .oil_utils import OIL_AREAS, OIL_GRADE_NAMES, OIL_PRICE_KEYS, OilPriceError, fetch_oil_areas, fetch_oil_data, oil_cache_ttl
+from .oil_table import OilPriceTable
+from .trip_cost import format_trip_table, plan_trips
+from .command_router import UsageError, message_text
+from .commands import (ALERT_COMMAND, EGG_COMMAND, GOLD_COMMAND, MIN_GOLD_THRESHOLD, OIL_COMMAND, PROFILE_COMMAND,
+                       SUBSCRIBE_COMMAND, UNSUBSCRIBE_COMMAND)
 import asyncio
-import re
+import collections
 import os
 import json
+import random
 import datetime
-import requests
 import time
+from urllib.parse import urlsplit
 from astrbot.api.event import MessageChain
 
 @register("yuxuandnf", "Sir 丶雨轩", "雨轩DNF 查询插件，支持金币比例查询和油价查询与计算器。", "v1.2")
@@ -17,110 +37,201 @@ class DNF_Plugin(Star):
     _tasks_started = False
     def __init__(self, context: Context):
         super().__init__(context)
-        self.last_avg_ratio = None
-        self.ratio_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'last_avg_ratio.json')
-        self.load_last_avg_ratio()
-        self.last_sent_avg_ratio = None
-        self.sent_ratio_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'last_sent_avg_ratio.json')
-        self.load_last_sent_avg_ratio()
-        # 仅在首次实例化时创建后台定时任务，避免重复创建导致重复发送
+        # 加载分阶段进行：__init__ 只创建对象，不读文件、不联网；状态文件在 initialize 中
+        # 于线程池读取，随后再打开连接池与数据库、启动后台任务，首批抓取按 STARTUP_DELAYS 错开
+        # 插件状态统一保存在 plugin_state.json：内存中修改，变化后防抖原子落盘
+        plugin_dir = os.path.dirname(os.path.abspath(__file__))
+        self.plugin_dir = plugin_dir
+        self.state = StateStore(os.path.join(plugin_dir, 'plugin_state.json'), flush_delay=5.0, logger=logger)
+        # 推送订阅：群或个人分别订阅金币 / 油价 / 蛋价，金币可设置各自的波动阈值
+        self.subscriptions = SubscriptionRegistry(self.state)
+        # 用户自定义的价格提醒（上穿 / 下穿价位、相对涨跌幅），每次取到新数值时按有序索引一次性判断
+        self.alerts = AlertBook(self.state, cooldown=600)
+        self.ALERT_MAX_PER_TARGET = 20
+        # 推送目标到发送端的解析结果按平台缓存：默认平台优先 aiocqhttp，其他适配器经消息链发送
+        self.platforms = PlatformResolver(context, MessageChain, preferred='aiocqhttp', logger=logger)
+        # 推送统一经由发送队列：监控任务只入队，同一目标每秒最多一条，失败按退避重试
+        self.send_queue = SendQueue(self.deliver_message, min_interval=1.0, workers=4, max_retries=3, logger=logger)
+        # 指标（Prometheus 文本格式）：METRICS_PORT 为端口号时在本机提供 /metrics，
+        # METRICS_FILE 为文件路径（如插件目录下的 metrics.prom）时每 METRICS_FILE_INTERVAL 秒写入一次文件；两者默认关闭
+        self.METRICS_PORT = None
+        self.METRICS_FILE = None
+        self.METRICS_FILE_INTERVAL = 30
+        self.UPSTREAM_SOURCES = {
+            'goods.dd373.com': 'DD373',
+            'www.iamwawa.cn': 'iamwawa',
+            'www.quotn.cn': 'quotn',
+        }
+        self.metrics = MetricsRegistry()
+        self.metrics_server = None
+        self.upstream_latency = self.metrics.histogram(
+            'upstream_request_duration_seconds', '上游请求耗时', labels=('source',))
+        self.upstream_errors = self.metrics.counter(
+            'upstream_errors_total', '上游请求失败次数', labels=('source', 'kind'))
+        self.messages_sent = self.metrics.counter(
+            'messages_sent_total', '推送消息发送次数', labels=('target', 'result'))
+        self.egg_day_cache_lookups = self.metrics.counter(
+            'egg_day_cache_lookups_total', '已结束日期蛋价缓存的查询次数', labels=('result',))
+        self.metrics.add_collector(self._collect_metrics)
+        # 指令处理耗时分析（默认关闭，管理员可用 /dnf性能 开 临时开启），每 10 次抽样一次内存分配
+        self.PROFILE_HANDLERS = False
+        self.profiler = HandlerProfiler(capacity=200, alloc_every=10, enabled=self.PROFILE_HANDLERS)
+        # 共享的异步 HTTP 客户端，所有上游请求都经由它发出（连接池在 initialize 中创建）；
+        # UPSTREAM_OVERRIDES 可把上游主机指向镜像或本地替身服务（见 benchmarks/mock_server.py）
+        self.UPSTREAM_OVERRIDES = {}
+        self.http = AsyncHttpClient(timeout=10, limit_per_host=4, on_request=self._on_upstream_request,
+                                    upstream_overrides=self.UPSTREAM_OVERRIDES)
+        # 金币比例缓存有效期为监控任务当前的轮询间隔再加 GOLD_RATIO_CACHE_MARGIN 秒，
+        # 轮询间隔自适应变化时指令仍始终命中缓存
+        self.GOLD_RATIO_CACHE_MARGIN = 30
+        self.gold_ratio_cache = AsyncTTLCache()
+        # 最近一次解析结果：上游内容未变化（304 或响应体摘要相同）时直接沿用，不再解析；
+        # 蛋价条目为 (items, 抓取时间)，上游不可用时也作为旧数据返回
+        self._last_gold_quote = None
+        self._last_egg_items = collections.OrderedDict()
+        self.EGG_LAST_ITEMS_MAX = 64
+        # 金币比例、油价、蛋价的历史观测（SQLite 时序存储，批量落盘）
+        self.history = HistoryStore(os.path.join(plugin_dir, 'history.db'), logger=logger)
+        # 后台任务统一由调度器管理（interval / cron，防重叠，错过补跑，terminate 时取消）
+        self.scheduler = Scheduler(state=self.state, logger=logger)
+        # 金币比例轮询间隔随波动自适应：接近 2.0 告警阈值时 15 秒，平稳或夜间退到 5 分钟
+        self.GOLD_ALERT_THRESHOLD = 2.0
+        # 监控、提醒与历史记录使用的统计量（median / trimmed_mean / vwap / mean，见 GOLD_STAT_LABELS），
+        # 默认用全部报价的中位数，个别报价定价异常不会引起误报
+        self.GOLD_MONITOR_STAT = 'median'
+        self.gold_poll = AdaptiveInterval(threshold=self.GOLD_ALERT_THRESHOLD, base=60, fast=15, slow=300)
+        # 启动后各任务首次运行的延迟（秒），错开首批上游请求，避免与机器人自身启动争抢；
+        # 实际延迟再加上 0 ~ STARTUP_JITTER 秒的随机抖动
+        self.STARTUP_DELAYS = {'gold_ratio': 5, 'oil_price_startup': 15, 'egg_price': 25, 'oil_table': 45}
+        self.STARTUP_JITTER = 5
+        # 检测金币比例波动，失败后 30 秒重试
+        self.scheduler.add_interval('gold_ratio', self.gold_ratio_job, self.gold_poll.interval, retry_delay=30,
+                                    start_delay=self.startup_delay('gold_ratio'))
+        # 启动时发送一次油价，之后每日早上8点检查油价变动并发送通知
+        self.scheduler.add_once('oil_price_startup', self.oil_price_startup_job,
+                                delay=self.startup_delay('oil_price_startup'))
+        # 启动任务会推送全部监控地区的当前油价并更新 last_oil_data，停机期间错过的 08:00 检查
+        # 不再补跑，避免同一次调价推送两遍
+        self.scheduler.add_cron('oil_price_check', self.oil_price_check_job, '0 8 * * *', catch_up=False)
+        # 每隔1小时检查平舆蛋价，且每天仅发送一次（发送到蛋价群）
+        self.scheduler.add_interval('egg_price', self.egg_price_job, 3600, start_delay=self.startup_delay('egg_price'))
+        # 每小时检查全国油价表是否到了调价时间，到期才整表刷新
+        self.scheduler.add_interval('oil_table', self.oil_table_job, 3600, start_delay=self.startup_delay('oil_table'))
+        if self.METRICS_FILE:
+            self.scheduler.add_interval('metrics_export', self.metrics_export_job, self.METRICS_FILE_INTERVAL,
+                                        start_delay=self.METRICS_FILE_INTERVAL)
+        # 仅在首次实例化时启动后台定时任务（状态载入后在 initialize 中启动），避免重复创建导致重复发送
+        self._owns_tasks = False
         if not DNF_Plugin._tasks_started:
             DNF_Plugin._tasks_started = True
-            asyncio.get_event_loop().create_task(self.scheduled_task())
-            # 每日早上8点检查油价变动并发送通知（启动时会先发送一次）
-            asyncio.get_event_loop().create_task(self.oil_price_daily_task())
-            # 每隔1小时检查平舆蛋价，且每天仅发送一次（发送给指定QQ好友）
-            asyncio.get_event_loop().create_task(self.egg_price_hourly_task())
-
-        # 持久化文件，用于保存上次获取的油价数据，避免重启失效
-        self.oil_data_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'last_oil_data.json')
-        self.last_oil_data = {}
-        self.load_last_oil_data()
-        # 蛋价推送持久化（记录最后发送日期，格式 YYYY-MM-DD）
-        self.egg_sent_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'last_egg_sent_date.json')
-        self.last_egg_sent_date = None
-        self.load_last_egg_sent_date()
-        # 可配置的监控地区列表，当前仅监控河南
+            self._owns_tasks = True
+
+        # 按地区缓存油价，有效期截止到接口给出的下次调价时间；状态载入后用持久化数据预热
+        self.oil_cache = AsyncTTLCache(ttl=3600)
+        # 已结束日期的蛋价不会再变化，按 (地区, 日期) 缓存在 history.db 的 snapshots 表中
+        # （不放入频繁落盘的 plugin_state.json），只有当天的数据需要请求上游
+        self.EGG_DAY_CACHE_MAX = 500
+        # 正在发送中的蛋价推送日期，避免发送重试期间下一次检查重复推送
+        self._egg_push_pending = None
+        # 可配置的监控地区列表，当前仅监控河南（全国可使用 oil_utils.OIL_AREAS）
         self.MONITOR_AREAS = ["河南"]
-        # 推送目标群组（默认与金币通知相同）
-        self.oil_notify_group_id = 101344113
-        # 蛋价推送目标群ID（改为群推送）
-        self.egg_notify_group_id = 527189909
+        # 批量抓取监控地区时的最大并发数（与 HTTP 客户端的单主机连接上限一致）
+        self.OIL_FETCH_CONCURRENCY = 4
+        # 全国油价表（各省各油品的列式表）：每个调价周期整表刷新一次，排行 / 对比直接查内存；
+        # 状态载入后用持久化的上一张表预热
+        self.oil_table_cache = AsyncTTLCache(ttl=3600)
+        # 批量行驶成本一次最多计算的组合数（地区 × 油号 × 油耗 × 里程）
+        self.TRIP_BATCH_MAX_ROWS = 60
 
-    def load_last_avg_ratio(self):
-        if os.path.exists(self.ratio_file):
-            try:
-                with open(self.ratio_file, 'r') as f:
-                    data = json.load(f)
-                    self.last_avg_ratio = data.get('last_avg_ratio')
-            except Exception as e:
-                logger.error(f"读取上次均价失败: {e}")
+    def startup_delay(self, job):
+        """任务首次运行的延迟：STARTUP_DELAYS 中的基准值加随机抖动。"""
+        return self.STARTUP_DELAYS.get(job, 0) + random.uniform(0, self.STARTUP_JITTER)
 
-    def save_last_avg_ratio(self):
-        try:
-            with open(self.ratio_file, 'w') as f:
-                json.dump({'last_avg_ratio': self.last_avg_ratio}, f)
-        except Exception as e:
-            logger.error(f"保存上次均价失败: {e}")
+    async def load_state(self):
+        """在线程池中读取插件状态，然后写入默认订阅、重建提醒索引并预热缓存。"""
+        plugin_dir = self.plugin_dir
+        # 首次运行时从旧版的单值 JSON 文件迁移
+        await self.state.load_async({
+            'last_sent_avg_ratio': (os.path.join(plugin_dir, 'last_sent_avg_ratio.json'), 'last_sent_avg_ratio'),
+            'last_oil_data': (os.path.join(plugin_dir, 'last_oil_data.json'), None),
+            'last_egg_sent_date': (os.path.join(plugin_dir, 'last_egg_sent_date.json'), 'last_egg_sent_date'),
+            'egg_day_cache': (os.path.join(plugin_dir, 'egg_day_cache.json'), None),
+        })
+        # 首次运行时把原先写死的推送群写入为默认订阅（沿用上次发送的金币均价）
+        self.subscriptions.seed([
+            ('gold', make_target('group', 101344113), None, self.state.get('last_sent_avg_ratio')),
+            ('oil', make_target('group', 101344113), None, None),
+            ('egg', make_target('group', 527189909), None, None),
+        ])
+        self.alerts.reload()
+        for area, oil in self.last_oil_data.items():
+            ttl = oil_cache_ttl(oil, fallback=0)
+            if ttl > 0:
+                self.oil_cache.set(area, oil, ttl)
+        saved_table = self.state.get('oil_table')
+        table = OilPriceTable.from_state(saved_table) if saved_table else None
+        if table is not None and table.ttl(fallback=0) > 0:
+            self.oil_table_cache.set('national', table, table.ttl())
 
-    def load_last_sent_avg_ratio(self):
-        if os.path.exists(self.sent_ratio_file):
-            try:
-                with open(self.sent_ratio_file, 'r') as f:
-                    data = json.load(f)
-                    val = data.get('last_sent_avg_ratio')
-                    if val is not None:
-                        self.last_sent_avg_ratio = float(val)
-            except Exception as e:
-                logger.error(f"读取上次发送均价失败: {e}")
+    # 以下属性均映射到 StateStore，赋值即标记状态变化（值不变时不会触发写盘）
+    @property
+    def last_egg_sent_date(self):
+        val = self.state.get('last_egg_sent_date')
+        return str(val) if val else None
 
-    def save_last_sent_avg_ratio(self):
-        try:
-            with open(self.sent_ratio_file, 'w') as f:
-                json.dump({'last_sent_avg_ratio': self.last_sent_avg_ratio}, f)
-        except Exception as e:
-            logger.error(f"保存上次发送均价失败: {e}")
+    @last_egg_sent_date.setter
+    def last_egg_sent_date(self, value):
+        self.state.set('last_egg_sent_date', value)
 
-    def parse_avg_ratio(self, ratio_text):
-        match = re.search(r'均价：1元=([\d.]+)万金币', ratio_text)
-        if match:
-            return float(match.group(1))
-        return None
+    @property
+    def last_oil_data(self):
+        """上次通知的各地区油价（原地修改后需调用 state.mark_dirty）"""
+        return self.state.setdefault('last_oil_data', {})
 
-    def load_last_oil_data(self):
-        if os.path.exists(self.oil_data_file):
-            try:
-                with open(self.oil_data_file, 'r') as f:
-                    data = json.load(f)
-                    if isinstance(data, dict):
-                        self.last_oil_data = data
-            except Exception as e:
-                logger.error(f"读取上次油价数据失败: {e}")
+    async def _load_gold_quote(self):
+        """从 DD373 拉取金币比例快照；未取到均价时抛出 GoldRatioError，避免把失败结果写入缓存。"""
+        quote = await DnfGoldRatioFetcher.fetch_quote(self.http, previous=self._last_gold_quote)
+        value = self.gold_value(quote)
+        if value is None:
+            # 第一页的条件请求记录已更新，不清除的话下次 304 会把这份无效结果当作未变化
+            self.http.forget(DnfGoldRatioFetcher.SOURCE)
+            raise GoldRatioError("未能获取到金币均价数据")
+        self._last_gold_quote = quote
+        st = quote.stats
+        self.history.record('gold.avg', value, ts=quote.fetched_at,
+                            extra={'n': st.count, 'stat': self.GOLD_MONITOR_STAT, 'mean': st.mean, 'vwap': st.vwap})
+        return quote
 
-    def save_last_oil_data(self):
-        try:
-            with open(self.oil_data_file, 'w') as f:
-                json.dump(self.last_oil_data, f, ensure_ascii=False)
-        except Exception as e:
-            logger.error(f"保存上次油价数据失败: {e}")
+    def gold_value(self, quote):
+        """快照中用于监控的金币比例（GOLD_MONITOR_STAT 指定的统计量）"""
+        return quote.stat(self.GOLD_MONITOR_STAT)
 
-    def load_last_egg_sent_date(self):
-        if os.path.exists(self.egg_sent_file):
-            try:
-                with open(self.egg_sent_file, 'r') as f:
-                    data = json.load(f)
-                    val = data.get('last_egg_sent_date')
-                    if val:
-                        self.last_egg_sent_date = str(val)
-            except Exception as e:
-                logger.error(f"读取上次蛋价发送日期失败: {e}")
+    def format_history_summary(self, title, unit, summary, period):
+        """渲染本地历史走势（最低/最高/均值、涨跌幅与字符走势图）"""
+        period_text = f"{period // DAY}天" if period % DAY == 0 else f"{period // 3600}小时"
+        if summary is None:
+            return f"暂无{title}近{period_text}的历史数据"
+        s = f"📈 {title} 近{period_text}走势\n"
+        s += f"最低：{summary.min:.2f}{unit}\n"
+        s += f"最高：{summary.max:.2f}{unit}\n"
+        s += f"均值：{summary.mean:.2f}{unit}\n"
+        if summary.change_pct is not None:
+            s += f"涨跌：{summary.change_pct:+.2f}%（{summary.first:.2f} → {summary.last:.2f}）\n"
+        s += f"走势：{sparkline(summary.points)}\n"
+        s += f"样本：{summary.count}条"
+        return s
 
-    def save_last_egg_sent_date(self):
-        try:
-            with open(self.egg_sent_file, 'w') as f:
-                json.dump({'last_egg_sent_date': self.last_egg_sent_date}, f, ensure_ascii=False)
-        except Exception as e:
-            logger.error(f"保存上次蛋价发送日期失败: {e}")
+    def format_stale_notice(self, age):
+        """上游不可用、返回旧数据时附加的提示（含数据年龄）"""
+        if age < 60:
+            age_text = f"{int(age)}秒"
+        elif age < 3600:
+            age_text = f"{int(age // 60)}分钟"
+        elif age < 86400:
+            age_text = f"{int(age // 3600)}小时"
+        else:
+            age_text = f"{int(age // 86400)}天"
+        return f"⚠️ 数据源暂时不可用，以上为{age_text}前的数据"
 
     def format_oil_info(self, oil_data):
         # 接受 API 返回的单个地区的 data 字典，格式化为文本
@@ -142,457 +253,852 @@ class DNF_Plugin(Star):
             logger.error(f"格式化油价信息失败: {e}")
             return ""
 
-    async def fetch_oil_data_for_area(self, area):
-        # 返回 API 的 data 字典或 None
-        try:
-            api_url = "https://www.iamwawa.cn/oilprice/api"
-            params = {"area": area}
-            response = requests.get(api_url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            if data.get("status") == 1 and "data" in data:
-                return data["data"]
-            else:
-                logger.warning(f"获取{area}地区油价失败：{data.get('message','未知错误')}")
-                return None
-        except Exception as e:
-            logger.error(f"获取{area}地区油价异常: {e}")
-            return None
+    async def _load_oil_data(self, area):
+        oil = await fetch_oil_data(self.http, area)
+        # 记录各油品价格历史（"-" 等非数字价格跳过）
+        for k in OIL_PRICE_KEYS:
+            try:
+                self.history.record(f"oil.{area}.{k}", float(oil.get(k)))
+            except (TypeError, ValueError):
+                pass
+        return oil
 
-    async def oil_price_daily_task(self):
-        """每天早上8点查询监控地区油价，启动时会立即发送一次，若与上次数据有变动则发送通知并保存最新数据"""
-        # 等待框架就绪（短暂等待），再执行首次发送
-        await asyncio.sleep(2)
-        try:
-            # 尝试获取 aiocqhttp 客户端
-            platform = None
-            for p in self.context.platform_manager.get_insts():
-                if p.meta().name == "aiocqhttp":
-                    platform = p
-                    break
-            client = platform.get_client() if platform else None
-
-            # 启动时发送一次全部监控地区油价（不做变动比较）
-            all_infos = []
-            for area in self.MONITOR_AREAS:
-                oil = await self.fetch_oil_data_for_area(area)
-                if oil:
-                    all_infos.append(self.format_oil_info(oil))
-                    # 更新缓存
-                    self.last_oil_data[area] = oil
-            if all_infos and client:
-                msg = "油价更新通知：\n\n" + "\n".join(all_infos)
+    async def get_oil_data(self, area):
+        """经由缓存获取地区油价 data 字典；同一地区的并发未命中只请求一次上游。"""
+        return await self.oil_cache.get_or_load(area, lambda: self._load_oil_data(area), ttl=oil_cache_ttl)
+
+    async def get_oil_data_or_stale(self, area):
+        """同 get_oil_data，返回 (data, 旧数据秒数或 None)；上游不可用时返回缓存中的旧数据。"""
+        return await self.oil_cache.get_or_stale(area, lambda: self._load_oil_data(area), ttl=oil_cache_ttl,
+                                                 errors=(HttpError,))
+
+    async def _load_oil_table(self):
+        """并发抓取全部地区油价并构建全国油价表；失败的地区沿用上一张表中的数据"""
+        results, errors = await fetch_oil_areas(self.get_oil_data, OIL_AREAS, concurrency=self.OIL_FETCH_CONCURRENCY)
+        carried = []
+        if errors:
+            previous = self.oil_table_cache.get_stale('national')
+            for area in errors:
+                row = previous[0].row_data(area) if previous is not None else None
+                if row is not None:
+                    results[area] = row
+                    carried.append(area)
+            logger.warning(f"全国油价表刷新时 {len(errors)} 个地区获取失败：{'、'.join(errors)}")
+        if not results:
+            raise OilPriceError("全国油价获取失败")
+        table = OilPriceTable.from_area_data(results, carried=carried)
+        self.state.set('oil_table', table.to_state())
+        logger.info(f"全国油价表已刷新：{len(table.areas)} 个地区")
+        return table
+
+    async def get_oil_table_or_stale(self):
+        """返回 (全国油价表, 旧数据秒数或 None)；表在有效期内时直接取内存"""
+        return await self.oil_table_cache.get_or_stale('national', self._load_oil_table,
+                                                       ttl=lambda t: t.ttl(), errors=(HttpError, OilPriceError))
+
+    async def oil_table_job(self):
+        """全国油价表到期（到了下次调价时间或上次有地区失败）时整表刷新"""
+        if self.oil_table_cache.get('national') is None:
+            await self.oil_table_cache.refresh('national', self._load_oil_table, ttl=lambda t: t.ttl())
+
+    async def plan_trip_costs(self, areas, grades, consumptions, distances):
+        """批量计算行驶成本，返回 (TripCostTable, 无报价的 (地区, 油号), 最旧数据秒数或 None)。
+
+        每个地区只经由油价缓存取一次（并发、上游不可用时使用旧数据），与组合数无关。
+        """
+        results, errors = await fetch_oil_areas(self.get_oil_data_or_stale, areas,
+                                                concurrency=self.OIL_FETCH_CONCURRENCY)
+        for area, e in errors.items():
+            logger.warning(f"获取{area}地区油价失败：{e}")
+        prices = {}
+        ages = []
+        for area, (oil, age) in results.items():
+            if age is not None:
+                ages.append(age)
+            for grade in grades:
                 try:
-                    await client.send_group_msg(group_id=self.oil_notify_group_id, message=msg)
-                except Exception as e:
-                    logger.error(f"发送启动时油价通知失败: {e}")
-            # 保存首次获取的数据
-            self.save_last_oil_data()
-
-            # 主循环：每天在 08:00 触发检查
-            while True:
-                now = datetime.datetime.now()
-                # 计算下一个 08:00 的时间点
-                target = now.replace(hour=8, minute=0, second=0, microsecond=0)
-                if now >= target:
-                    target = target + datetime.timedelta(days=1)
-                wait_seconds = (target - now).total_seconds()
-                await asyncio.sleep(wait_seconds)
-
-                # 到达 08:00，检查每个监控地区是否有变化
-                changed = False
-                changed_infos = []
-                for area in self.MONITOR_AREAS:
-                    oil = await self.fetch_oil_data_for_area(area)
-                    if not oil:
-                        continue
-                    prev = self.last_oil_data.get(area)
-                    # 比较关键字段
-                    keys = ['p92','p95','p98','p0','p10','p20','p35']
-                    diff_found = False
-                    if prev is None:
+                    prices[(area, grade)] = float(oil.get(f"p{grade}"))
+                except (TypeError, ValueError):
+                    pass
+        table, missing = plan_trips(prices, areas, grades, consumptions, distances)
+        return table, missing, max(ages) if ages else None
+
+    def format_oil_ranking(self, table, grade):
+        name = OIL_GRADE_NAMES[grade]
+        ranking = table.ranking(grade)
+        if not ranking:
+            return f"暂无各地区{name}的报价"
+        lines = [f"⛽ 全国{name}油价排行（低 → 高）"]
+        for i, (area, price) in enumerate(ranking, 1):
+            lines.append(f"{i}. {area} {price:.2f}元/升")
+        lowest, highest = ranking[0][1], ranking[-1][1]
+        mean = sum(p for _, p in ranking) / len(ranking)
+        lines.append(f"均价 {mean:.2f}元/升，最高与最低相差 {highest - lowest:.2f}元/升")
+        return "\n".join(lines)
+
+    def format_oil_compare(self, table, areas):
+        lines = [f"📊 油价对比：{' / '.join(areas)}"]
+        for grade in OIL_PRICE_KEYS:
+            prices = [table.price(area, grade) for area in areas]
+            if all(p is None for p in prices):
+                continue
+            cells = "  ".join(f"{area} {p:.2f}" if p is not None else f"{area} -" for area, p in zip(areas, prices))
+            line = f"⛽ {OIL_GRADE_NAMES[grade]}：{cells}"
+            if len(areas) == 2 and None not in prices:
+                line += f"（差 {prices[0] - prices[1]:+.2f}）"
+            lines.append(line)
+        lines.append(f"📅 更新时间：{' / '.join(table.dates[table.index[a]] for a in areas)}")
+        return "\n".join(lines)
+
+    async def fetch_oil_data_for_areas(self, areas):
+        """并发抓取多个地区油价，返回 {地区: data}；失败的地区记录日志后跳过。"""
+        results, errors = await fetch_oil_areas(self.get_oil_data, areas, concurrency=self.OIL_FETCH_CONCURRENCY)
+        for area, e in errors.items():
+            if isinstance(e, OilPriceError):
+                logger.warning(f"获取{area}地区油价失败：{e}")
+            else:
+                logger.error(f"获取{area}地区油价异常: {e}")
+        return results
+
+    async def oil_price_startup_job(self):
+        """启动时发送一次全部监控地区油价（不做变动比较），并保存获取到的数据"""
+        all_infos = []
+        fetched = await self.fetch_oil_data_for_areas(self.MONITOR_AREAS)
+        for area, oil in fetched.items():
+            all_infos.append(self.format_oil_info(oil))
+            # 更新缓存
+            self.last_oil_data[area] = oil
+        if all_infos:
+            self.publish('oil', "油价更新通知：\n\n" + "\n".join(all_infos))
+        # 保存首次获取的数据
+        self.state.mark_dirty()
+
+    async def oil_price_check_job(self):
+        """每天 08:00 检查监控地区油价，若与上次数据有变动则发送通知并保存最新数据"""
+        # 检查每个监控地区是否有变化
+        changed = False
+        changed_infos = []
+        fetched = await self.fetch_oil_data_for_areas(self.MONITOR_AREAS)
+        for area, oil in fetched.items():
+            prev = self.last_oil_data.get(area)
+            # 比较关键字段
+            diff_found = False
+            if prev is None:
+                diff_found = True
+            else:
+                for k in OIL_PRICE_KEYS:
+                    if str(prev.get(k)) != str(oil.get(k)):
                         diff_found = True
-                    else:
-                        for k in keys:
-                            if str(prev.get(k)) != str(oil.get(k)):
-                                diff_found = True
-                                break
-                    if diff_found:
-                        changed = True
-                        changed_infos.append(self.format_oil_info(oil))
-                        # 更新缓存
-                        self.last_oil_data[area] = oil
-
-                if changed and client and changed_infos:
-                    msg = "油价更新通知：\n\n" + "\n".join(changed_infos)
-                    try:
-                        await client.send_group_msg(group_id=self.oil_notify_group_id, message=msg)
-                    except Exception as e:
-                        logger.error(f"发送油价更新通知失败: {e}")
-                    # 保存变动后的数据
-                    self.save_last_oil_data()
+                        break
+            if diff_found:
+                changed = True
+                changed_infos.append(self.format_oil_info(oil))
+                # 更新缓存
+                self.last_oil_data[area] = oil
 
-        except Exception as e:
-            logger.error(f"油价每日任务异常: {e}")
+        if changed and changed_infos:
+            self.publish('oil', "油价更新通知：\n\n" + "\n".join(changed_infos))
+            # 保存变动后的数据
+            self.state.mark_dirty()
 
-    def fetch_egg_prices(self, area_name: str, date_str: str):
-        """同步查询指定地区和日期的蛋价列表，返回和之前 handler 相同格式的 items 列表。"""
-        base = "http://www.quotn.cn/e/search"
+    async def query_egg_prices(self, area_name: str, date_str: str):
+        """查询指定地区和日期的蛋价列表；请求失败时抛出 HttpError。"""
         params = {
             "k": area_name or "",
             "areaName": area_name or "",
             "pDate": date_str,
             "_": str(int(time.time() * 1000)),
         }
+        # 参数中的时间戳每次都不同，条件请求按 (地区, 日期) 区分资源
+        key = f"egg|{area_name}|{date_str}"
+        previous = self._last_egg_items.get(key)
+        with profile_phase('fetch'):
+            resp = await self.http.get_if_changed(EGG_API_URL, key, params=params, force=previous is None)
+        if resp is None:
+            self._last_egg_items[key] = (previous[0], time.time())
+            self._last_egg_items.move_to_end(key)
+            return previous[0]
+        with profile_phase('parse'):
+            items = parse_egg_prices(resp.body, resp.charset)
+        if items:
+            self._last_egg_items[key] = (items, time.time())
+            self._last_egg_items.move_to_end(key)
+            while len(self._last_egg_items) > self.EGG_LAST_ITEMS_MAX:
+                self._last_egg_items.popitem(last=False)
+        else:
+            self.http.forget(key)
+        self.record_egg_history(area_name, date_str, items)
+        return items
+
+    def record_egg_history(self, area_name, date_str, items):
+        """记录地区蛋价均价；当天数据记为当前时间，历史日期记为当天中午。"""
+        prices = [it['price'] for it in items if isinstance(it.get('price'), (int, float))]
+        if not prices:
+            return
+        ts = None
+        if date_str != datetime.date.today().strftime('%Y%m%d'):
+            try:
+                ts = datetime.datetime.strptime(date_str, '%Y%m%d').replace(hour=12).timestamp()
+            except ValueError:
+                return
+        series = f"egg.{area_name or '全部'}"
+        avg = sum(prices) / len(prices)
+        self.history.record(series, avg, ts=ts, extra={'date': date_str, 'n': len(prices)})
+        if ts is None:
+            # 只有当天的价格参与提醒判断
+            self.check_alerts(series, avg)
+
+    async def fetch_egg_prices(self, area_name: str, date_str: str):
+        """查询指定地区和日期的蛋价列表，请求失败时记录日志并返回空列表。"""
         try:
-            resp = requests.get(base, params=params, timeout=10)
-            resp.raise_for_status()
+            return await self.query_egg_prices(area_name, date_str)
         except Exception as e:
             logger.error(f"fetch_egg_prices 请求失败: {e}")
             return []
 
-        results = []
+    async def get_egg_prices(self, area_name: str, date_str: str):
+        """查询蛋价；已结束日期（早于今天）的非空结果持久化缓存，之后直接从本地返回。"""
+        closed = date_str < datetime.date.today().strftime('%Y%m%d')
+        key = f"egg|{area_name}|{date_str}"
+        if closed:
+            cached = await self.history.get_snapshot(key)
+            if cached is not None:
+                self.egg_day_cache_lookups.inc('hit')
+                return cached
+            self.egg_day_cache_lookups.inc('miss')
+        items = await self.query_egg_prices(area_name, date_str)
+        if closed and items:
+            # 超出上限时淘汰最早写入的条目
+            await self.history.put_snapshots([(key, items)], max_entries=self.EGG_DAY_CACHE_MAX)
+        return items
+
+    async def get_egg_prices_or_stale(self, area_name: str, date_str: str):
+        """同 get_egg_prices，返回 (条目, 旧数据秒数或 None)；上游不可用时返回最近一次的结果。"""
         try:
-            j = resp.json()
-        except Exception:
-            j = None
-
-        def collect(obj):
-            if isinstance(obj, dict):
-                for k in ("price", "priceText", "金额"):
-                    if k in obj:
-                        title = obj.get("title") or obj.get("name") or obj.get("标题") or ""
-                        raw = obj.get(k)
-                        try:
-                            price = float(str(raw))
-                        except Exception:
-                            m = re.search(r"([0-9]+(?:\.[0-9]+)?)", str(raw or ""))
-                            price = float(m.group(1)) if m else None
-                        utime_raw = None
-                        for tkey in ("uTime", "utime", "u_time", "time", "date", "pubTime", "pubtime", "报价时间"):
-                            if tkey in obj and obj.get(tkey):
-                                utime_raw = obj.get(tkey)
-                                break
-                        utime_fmt = None
-                        if utime_raw is not None:
-                            try:
-                                if isinstance(utime_raw, (int, float)) or (isinstance(utime_raw, str) and utime_raw.isdigit()):
-                                    n = int(utime_raw)
-                                    if n > 10**12:
-                                        n = n // 1000
-                                    utime_fmt = datetime.datetime.fromtimestamp(n).strftime('%Y-%m-%d %H:%M')
-                                else:
-                                    utime_fmt = str(utime_raw)[:19]
-                            except Exception:
-                                utime_fmt = str(utime_raw)
-                        results.append({"title": title.strip(), "price": price, "utime": utime_fmt})
-                        return True
-                for v in obj.values():
-                    collect(v)
-            elif isinstance(obj, list):
-                for it in obj:
-                    collect(it)
-
-        parsed_from_list = False
-        if isinstance(j, dict):
-            body = j.get('body') if isinstance(j.get('body'), dict) else None
-            data_list = None
-            if body and isinstance(body.get('dataList'), list):
-                data_list = body.get('dataList')
-            elif isinstance(j.get('dataList'), list):
-                data_list = j.get('dataList')
-
-            if isinstance(data_list, list) and data_list:
-                for item in data_list:
-                    if not isinstance(item, dict):
-                        continue
-                    cName = item.get('cName') or ''
-                    aName = item.get('aName') or ''
-                    title = f"{cName}{aName}" if (cName or aName) else (item.get('aName') or item.get('name') or '')
-                    price = None
-                    if 'tPrice' in item and item.get('tPrice') not in (None, ''):
-                        try:
-                            price = float(str(item.get('tPrice')))
-                        except Exception:
-                            m = re.search(r"([0-9]+(?:\.[0-9]+)?)", str(item.get('tPrice') or ""))
-                            price = float(m.group(1)) if m else None
-                    else:
-                        for pk in ("price", "priceText", "金额", "yPrice"):
-                            if pk in item and item.get(pk) not in (None, ""):
-                                try:
-                                    price = float(str(item.get(pk)))
-                                except Exception:
-                                    m = re.search(r"([0-9]+(?:\.[0-9]+)?)", str(item.get(pk) or ""))
-                                    price = float(m.group(1)) if m else None
-                                break
-                    up_time = item.get('upTime') or None
-                    yprice = None
-                    if 'yPrice' in item and item.get('yPrice') not in (None, ''):
-                        try:
-                            yprice = float(str(item.get('yPrice')))
-                        except Exception:
-                            m = re.search(r"([0-9]+(?:\.[0-9]+)?)", str(item.get('yPrice') or ""))
-                            yprice = float(m.group(1)) if m else None
-                    results.append({"title": title.strip(), "price": price, "upTime": up_time, "cName": cName, "aName": aName, "yPrice": yprice})
-                parsed_from_list = True
-        if not parsed_from_list:
-            collect(j)
+            return await self.get_egg_prices(area_name, date_str), None
+        except HttpError:
+            stale = self._last_egg_items.get(f"egg|{area_name}|{date_str}")
+            if stale is None:
+                raise
+            return stale[0], time.time() - stale[1]
 
-        if not results:
-            text = resp.text
-            pattern = re.compile(r"([\u4e00-\u9fff\w\-\s\/（）()]{2,60}?)\s*[：:\-\s]{0,3}\s*([0-9]+(?:\.[0-9]+)?)\s*(?:元|元/斤|元/公斤)")
-            found = pattern.findall(text)
-            for title, price_s in found:
-                try:
-                    price = float(price_s)
-                except Exception:
-                    price = None
-                results.append({"title": title.strip(), "price": price})
+    async def egg_price_job(self):
+        """每隔1小时检查平舆蛋价，且每天仅推送一次给蛋价订阅者（由调度器触发）。
 
-        return results
+        设有蛋价提醒的地区每小时都会查询一次当天价格，用于判断提醒。
+        """
+        date_str = datetime.date.today().strftime('%Y%m%d')
+        for series in self.alerts.series_names('egg.'):
+            area = series[len('egg.'):]
+            await self.fetch_egg_prices('' if area == '全部' else area, date_str)
 
-    async def egg_price_hourly_task(self):
-        """每隔1小时检查平舆蛋价，且每天仅发送一次到指定好友。"""
-        await asyncio.sleep(2)
-        try:
-            while True:
-                try:
-                    today = datetime.date.today().strftime('%Y-%m-%d')
-                    # 若今日已发送则跳过
-                    if self.last_egg_sent_date == today:
-                        await asyncio.sleep(3600)
-                        continue
+        today = datetime.date.today().strftime('%Y-%m-%d')
+        # 若今日已发送、正在发送或没有订阅者则跳过
+        if self.last_egg_sent_date == today or self._egg_push_pending == today:
+            return
+        if not self.subscriptions.subscribers('egg'):
+            return
 
-                    # 查询今日蛋价
-                    area = '平舆'
-                    date_str = datetime.date.today().strftime('%Y%m%d')
-                    items = self.fetch_egg_prices(area, date_str)
-                    if not items:
-                        await asyncio.sleep(3600)
-                        continue
+        # 查询今日蛋价
+        area = '平舆'
+        date_str = datetime.date.today().strftime('%Y%m%d')
+        items = await self.fetch_egg_prices(area, date_str)
+        if not items:
+            return
 
-                    # 构建推送内容，最多10条
-                    lines = []
-                    lines.append(f"返回查询结果（{today}前10条）：")
-                    cnt = 0
-                    seen = set()
-                    for it in items:
-                        c = it.get('cName') or ''
-                        a = it.get('aName') or ''
-                        if c and a:
-                            title = f"{c}-{a}" if c != a else c
-                        elif c or a:
-                            title = c or a
-                        else:
-                            title = it.get('title') or '-'
-                        price = it.get('price')
-                        up_time = it.get('upTime')
-                        y_price = it.get('yPrice')
-                        # 计算简短涨跌
+        # 构建推送内容，最多10条
+        lines = []
+        lines.append(f"返回查询结果（{today}前10条）：")
+        cnt = 0
+        seen = set()
+        for it in items:
+            c = it.get('cName') or ''
+            a = it.get('aName') or ''
+            if c and a:
+                title = f"{c}-{a}" if c != a else c
+            elif c or a:
+                title = c or a
+            else:
+                title = it.get('title') or '-'
+            price = it.get('price')
+            up_time = it.get('upTime')
+            y_price = it.get('yPrice')
+            # 计算简短涨跌
+            change_mark_short = '平'
+            try:
+                if isinstance(price, (int, float)) and isinstance(y_price, (int, float)) and y_price != 0:
+                    diff_pct = (price - y_price) / y_price * 100
+                    pct = round(abs(diff_pct))
+                    if diff_pct > 0:
+                        change_mark_short = f"涨{pct}%"
+                    elif diff_pct < 0:
+                        change_mark_short = f"跌{pct}%"
+                    else:
                         change_mark_short = '平'
-                        try:
-                            if isinstance(price, (int, float)) and isinstance(y_price, (int, float)) and y_price != 0:
-                                diff_pct = (price - y_price) / y_price * 100
-                                pct = round(abs(diff_pct))
-                                if diff_pct > 0:
-                                    change_mark_short = f"涨{pct}%"
-                                elif diff_pct < 0:
-                                    change_mark_short = f"跌{pct}%"
-                                else:
-                                    change_mark_short = '平'
-                        except Exception:
-                            change_mark_short = '平'
-
-                        key = (title, float(price) if isinstance(price, (int, float)) else price, up_time)
-                        if key in seen:
-                            continue
-                        seen.add(key)
-                        cnt += 1
-                        if cnt > 10:
-                            break
-                        price_text = f"{price:.2f}元" if isinstance(price, (int, float)) else (str(price) if price is not None else "-")
-                        if up_time:
-                            lines.append(f"{cnt} .{title} {up_time} {price_text}({change_mark_short})")
-                        else:
-                            lines.append(f"{cnt} .{title} {price_text}({change_mark_short})")
-
-                    msg = "\n".join(lines)
-
-                    # 获取 aiocqhttp 客户端并发送私信
-                    platform = None
-                    for p in self.context.platform_manager.get_insts():
-                        if p.meta().name == "aiocqhttp":
-                            platform = p
-                            break
-                    client = platform.get_client() if platform else None
-                    if client:
-                        try:
-                            await client.send_group_msg(group_id=self.egg_notify_group_id, message=msg)
-                            self.last_egg_sent_date = today
-                            self.save_last_egg_sent_date()
-                        except Exception as e:
-                            logger.error(f"发送蛋价群消息失败: {e}")
+            except Exception:
+                change_mark_short = '平'
 
-                except Exception as e:
-                    logger.error(f"egg_price_hourly_task 内部异常: {e}")
+            key = (title, float(price) if isinstance(price, (int, float)) else price, up_time)
+            if key in seen:
+                continue
+            seen.add(key)
+            cnt += 1
+            if cnt > 10:
+                break
+            price_text = f"{price:.2f}元" if isinstance(price, (int, float)) else (str(price) if price is not None else "-")
+            if up_time:
+                lines.append(f"{cnt} .{title} {up_time} {price_text}({change_mark_short})")
+            else:
+                lines.append(f"{cnt} .{title} {price_text}({change_mark_short})")
 
-                # 每隔1小时检查一次
-                await asyncio.sleep(3600)
-        except Exception as e:
-            logger.error(f"蛋价每小时任务异常: {e}")
+        # 至少一个订阅者实际收到后才记为今日已发送；全部发送失败或发出前重启时，下次检查会重新推送
+        self._egg_push_pending = today
+        on_done = self._egg_push_done(today, len(self.subscriptions.subscribers('egg')))
+        self.publish('egg', "\n".join(lines), on_done=on_done)
+
+    def _egg_push_done(self, day, targets):
+        """蛋价推送的发送结果回调：任一订阅者发送成功即记为当天已发送，全部目标都有结果后解除发送中标记"""
+        remaining = [targets]
+
+        def on_done(target, ok):
+            if ok:
+                self.last_egg_sent_date = day
+            remaining[0] -= 1
+            if remaining[0] == 0 and self._egg_push_pending == day:
+                self._egg_push_pending = None
+        return on_done
 
     async def initialize(self):
         """可选择实现异步的插件初始化方法，当实例化该插件类之后会自动调用该方法。"""
-    
-    async def scheduled_task(self):
-        logger.info("定时任务已启动，每分钟检测金币比例波动")
-        while True:
+        await self.load_state()
+        await self.http.start()
+        await self.history.start()
+        # 旧版本每次检测都会写入、但从未读取的上次均价
+        self.state.pop('last_avg_ratio')
+        # 旧版本把已结束日期的蛋价放在插件状态中，迁移到 history.db 后从状态中删除
+        legacy_egg_days = self.state.pop('egg_day_cache')
+        if legacy_egg_days:
+            await self.history.put_snapshots(
+                ((f"egg|{key}", items) for key, items in legacy_egg_days.items()), max_entries=self.EGG_DAY_CACHE_MAX)
+        self.send_queue.start()
+        if self._owns_tasks:
+            # 调度器读取持久化的上次运行时间，须在状态载入之后启动
+            self.scheduler.start()
+            logger.info("定时任务已启动，按波动自适应检测金币比例（15 秒 ~ 5 分钟）")
+        if self.METRICS_PORT:
+            self.metrics_server = MetricsServer(self.metrics, port=self.METRICS_PORT)
             try:
-                platform = None
-                for p in self.context.platform_manager.get_insts():
-                    if p.meta().name == "aiocqhttp":
-                        platform = p
-                        break
-                if platform:
-                    client = platform.get_client()
-                    ratio_text = DnfGoldRatioFetcher.fetch_gold_ratio_text()
-                    avg_ratio = self.parse_avg_ratio(ratio_text)
-                    if avg_ratio is not None:
-                        avg_ratio_fmt = f"{avg_ratio:.2f}"
-                        send_msg = False
-                        msg = None
-                        if self.last_sent_avg_ratio is not None:
-                            diff = avg_ratio - self.last_sent_avg_ratio
-                            diff_fmt = f"{diff:+.2f}"
-                            if abs(diff) >= 2:
-                                msg = f"金币比例波动：上次发送均价 {self.last_sent_avg_ratio:.2f}，本次均价 {avg_ratio_fmt}，变动 {diff_fmt}万金币"
-                                send_msg = True
-                            # 否则不发消息
-                        else:
-                            msg = f"首次监控，当前金币均价：{avg_ratio_fmt}万金币"
-                            send_msg = True
-                        if send_msg:
-                            await client.send_group_msg(
-                                group_id=101344113,
-                                message=msg
-                            )
-                            self.last_sent_avg_ratio = avg_ratio
-                            self.save_last_sent_avg_ratio()
-                        self.last_avg_ratio = avg_ratio
-                        self.save_last_avg_ratio()
-                    else:
-                        logger.info("未能获取到金币均价数据")
-                logger.info("定时检测完成")
-                await asyncio.sleep(60)
-            except Exception as e:
-                logger.error(f"定时任务执行失败: {e}")
-                await asyncio.sleep(30)
+                await self.metrics_server.start()
+                logger.info(f"指标服务已启动：http://127.0.0.1:{self.METRICS_PORT}/metrics")
+            except OSError as e:
+                logger.error(f"指标服务启动失败: {e}")
+                self.metrics_server = None
+
+    def series_label(self, series):
+        """提醒序列的显示名称与单位"""
+        if series == 'gold.avg':
+            return "金币比例", "万金币"
+        if series.startswith('egg.'):
+            return f"{series[len('egg.'):]}蛋价", "元"
+        return series, ""
+
+    def format_alert_rule(self, rule):
+        name, unit = self.series_label(rule['series'])
+        if rule['kind'] in ('above', 'below'):
+            cond = f"{'高于' if rule['kind'] == 'above' else '低于'} {rule['level']:g}{unit}"
+        else:
+            cond = f"{'上涨' if rule['kind'] == 'rise' else '下跌'} {rule['pct']:g}%"
+            if rule['level'] is not None:
+                cond += f"（至 {rule['level']:.2f}{unit}）"
+        return f"#{rule['id']} {name}{cond}"
+
+    def check_alerts(self, series, value):
+        """用新数值判断提醒，触发的提醒加入发送队列"""
+        name, unit = self.series_label(series)
+        for rule in self.alerts.observe(series, value):
+            if rule['kind'] in ('above', 'below'):
+                action = f"已{'上穿' if rule['kind'] == 'above' else '下穿'} {rule['level']:g}{unit}"
+            else:
+                action = f"较参考值{'上涨' if rule['kind'] == 'rise' else '下跌'}超过 {rule['pct']:g}%"
+            self.send_queue.enqueue(rule['target'], f"🔔 价格提醒 #{rule['id']}：{name}当前 {value:.2f}{unit}，{action}")
+
+    def publish(self, feed, message, on_done=None):
+        """把消息加入发送队列，推送给 feed 的全部订阅者（on_done 见 SendQueue.enqueue）"""
+        for sub in self.subscriptions.subscribers(feed):
+            self.send_queue.enqueue(sub['target'], message, on_done)
+
+    async def deliver_message(self, target, message):
+        """发送队列的实际发送函数：经缓存的平台发送端发送群消息或私聊，失败时抛出异常由队列重试"""
+        try:
+            await self.platforms.send(target, message)
+        except Exception:
+            self.messages_sent.inc(target, 'error')
+            raise
+        self.messages_sent.inc(target, 'ok')
+
+    def _on_upstream_request(self, url, status, elapsed, error):
+        host = urlsplit(url).hostname or ''
+        source = self.UPSTREAM_SOURCES.get(host, host)
+        self.upstream_latency.observe(elapsed, source)
+        if error:
+            self.upstream_errors.inc(source, error)
+
+    def _collect_metrics(self):
+        """导出时读取调度器、缓存与条件请求的现有统计"""
+        jobs = self.scheduler.stats()
+        now = time.time()
+        caches = {'gold_ratio': self.gold_ratio_cache, 'oil': self.oil_cache, 'oil_table': self.oil_table_cache}
+        return [
+            ('job_last_lag_seconds', 'gauge', '任务上次触发相对计划时间的延迟',
+             [({'job': j['name']}, j['last_lag']) for j in jobs]),
+            ('job_last_duration_seconds', 'gauge', '任务上次执行耗时',
+             [({'job': j['name']}, j['last_duration']) for j in jobs]),
+            ('job_last_run_timestamp_seconds', 'gauge', '任务上次开始运行的时间戳',
+             [({'job': j['name']}, j['last_run']) for j in jobs]),
+            ('job_seconds_since_last_run', 'gauge', '距任务上次运行的秒数',
+             [({'job': j['name']}, now - j['last_run'] if j['last_run'] else None) for j in jobs]),
+            ('job_next_run_timestamp_seconds', 'gauge', '任务下次计划运行的时间戳',
+             [({'job': j['name']}, j['next_run']) for j in jobs]),
+            ('job_runs_total', 'counter', '任务运行次数', [({'job': j['name']}, j['run_count']) for j in jobs]),
+            ('job_errors_total', 'counter', '任务失败次数', [({'job': j['name']}, j['error_count']) for j in jobs]),
+            ('job_skipped_total', 'counter', '因上次未结束而跳过的次数',
+             [({'job': j['name']}, j['skipped_count']) for j in jobs]),
+            ('cache_hits_total', 'counter', '缓存命中次数',
+             [({'cache': name}, c.hits) for name, c in caches.items()]),
+            ('cache_misses_total', 'counter', '缓存未命中次数',
+             [({'cache': name}, c.misses) for name, c in caches.items()]),
+            ('cache_stale_served_total', 'counter', '上游不可用时返回旧数据的次数',
+             [({'cache': name}, c.stale_hits) for name, c in caches.items()]),
+            ('upstream_circuit_open', 'gauge', '熔断器状态（0 关闭 / 1 打开 / 0.5 半开）',
+             [({'source': self.UPSTREAM_SOURCES.get(host, host)},
+               {'closed': 0, 'open': 1, 'half_open': 0.5}[b.state]) for host, b in self.http.breakers.items()]),
+            ('upstream_circuit_opened_total', 'counter', '熔断器打开次数',
+             [({'source': self.UPSTREAM_SOURCES.get(host, host)}, b.open_count)
+              for host, b in self.http.breakers.items()]),
+            ('send_queue_pending', 'gauge', '发送队列中待发送的消息数', [({}, self.send_queue.pending_count)]),
+            ('send_queue_retries_total', 'counter', '推送重试次数', [({}, self.send_queue.retry_count)]),
+            ('send_queue_dropped_total', 'counter', '重试耗尽后放弃的推送数', [({}, self.send_queue.dropped_count)]),
+            ('upstream_unchanged_total', 'counter', '上游内容未变化而跳过解析的次数',
+             [({'resource': key}, count) for key, count in self.http.skipped_parses.items()]),
+        ]
+
+    async def metrics_export_job(self):
+        """定期把指标写入 METRICS_FILE"""
+        await self.metrics.write_file_async(self.METRICS_FILE)
+
+    async def gold_ratio_job(self):
+        """检测金币比例波动并按各订阅者的阈值推送（由调度器按自适应间隔触发，失败后 30 秒重试）"""
+        # 由监控任务刷新缓存，指令查询直接复用；获取失败（HttpError / GoldRatioError）时异常交给调度器，
+        # 由调度器记录并在 retry_delay 秒后重试
+        try:
+            quote = await self.gold_ratio_cache.refresh('gold_ratio', self._load_gold_quote, ttl=self.gold_ratio_ttl)
+        except CircuitOpenError as e:
+            # 熔断期间不发出请求，等待半开探测
+            logger.info(f"跳过金币比例检测：{e}")
+            return
+        avg_ratio = self.gold_value(quote)
+        avg_ratio_fmt = f"{avg_ratio:.2f}"
+        label = GOLD_STAT_LABELS.get(self.GOLD_MONITOR_STAT, self.GOLD_MONITOR_STAT)
+        # 每个订阅者与自己上次收到的均价比较，只有超过自己的阈值才推送
+        for sub in self.subscriptions.subscribers('gold'):
+            last_sent = sub['last_sent']
+            if last_sent is not None and sub.get('stat') != self.GOLD_MONITOR_STAT:
+                # 上次推送的数值来自另一种统计量（如升级前的前 5 条均价），不可直接比较：
+                # 以本次数值为新的基准，不推送
+                self.subscriptions.update_last_sent(sub, avg_ratio, self.GOLD_MONITOR_STAT)
+                continue
+            if last_sent is not None:
+                diff = avg_ratio - last_sent
+                if abs(diff) < self.gold_threshold(sub):
+                    continue
+                msg = f"金币比例波动：上次发送{label} {last_sent:.2f}，本次{label} {avg_ratio_fmt}，变动 {diff:+.2f}万金币"
+            else:
+                msg = f"首次监控，当前金币{label}：{avg_ratio_fmt}万金币"
+            self.send_queue.enqueue(sub['target'], msg)
+            self.subscriptions.update_last_sent(sub, avg_ratio, self.GOLD_MONITOR_STAT)
+        self.check_alerts('gold.avg', avg_ratio)
+        if self.adjust_gold_poll_interval(avg_ratio):
+            # 间隔变长时按新间隔延长本次结果的有效期，否则下次轮询前缓存就会过期
+            self.gold_ratio_cache.set('gold_ratio', quote, self.gold_ratio_ttl())
+        logger.info("定时检测完成")
+
+    def gold_ratio_ttl(self, quote=None):
+        return self.gold_poll.interval + self.GOLD_RATIO_CACHE_MARGIN
+
+    def gold_threshold(self, sub):
+        # 旧版本未限制阈值下限，已保存的过小阈值按下限处理
+        if sub['threshold'] is None:
+            return self.GOLD_ALERT_THRESHOLD
+        return max(sub['threshold'], MIN_GOLD_THRESHOLD)
+
+    def adjust_gold_poll_interval(self, avg_ratio):
+        """根据本次均价更新轮询间隔（以离阈值最近的订阅者为准），间隔变化时记录日志并返回 True"""
+        reference, threshold, headroom = None, self.GOLD_ALERT_THRESHOLD, None
+        for sub in self.subscriptions.subscribers('gold'):
+            if sub['last_sent'] is None:
+                continue
+            sub_threshold = self.gold_threshold(sub)
+            sub_headroom = sub_threshold - abs(avg_ratio - sub['last_sent'])
+            if headroom is None or sub_headroom < headroom:
+                reference, threshold, headroom = sub['last_sent'], sub_threshold, sub_headroom
+        previous = self.gold_poll.interval
+        interval, reason = self.gold_poll.observe(avg_ratio, reference, time.time(), threshold=threshold)
+        if interval != previous:
+            logger.info(f"金币比例轮询间隔调整：{previous}秒 → {interval}秒（{reason}）")
+            self.scheduler.set_interval('gold_ratio', interval)
+            return True
+        return False
 
     @filter.command("金币比例")
+    @profiled("dnf_gold_ratio")
     async def dnf_gold_ratio(self, event):
-        """查询 DNF 金币比例""" 
-        user_name = event.get_sender_name()
-        ratio_text = DnfGoldRatioFetcher.fetch_gold_ratio_text()
+        """查询 DNF 金币比例；带时间范围（如 金币比例 7d）时返回本地历史走势""" 
+        profile_mark('extract')
+        message = message_text(event)
+        profile_mark('args')
+        try:
+            route = GOLD_COMMAND.parse(message)
+        except UsageError as e:
+            yield event.plain_result(str(e))
+            return
+        if route.name == 'history':
+            period = route['period']
+            try:
+                profile_mark('load')
+                summary = await self.history.summarize('gold.avg', period)
+            except Exception as e:
+                logger.error(f"读取金币比例历史数据失败: {e}")
+                yield event.plain_result("历史数据读取失败，请稍后重试")
+                return
+            profile_mark('render')
+            yield event.plain_result(self.format_history_summary("金币比例", "万金币", summary, period))
+            return
+        try:
+            profile_mark('load')
+            quote, age = await self.gold_ratio_cache.get_or_stale(
+                'gold_ratio', self._load_gold_quote, ttl=self.gold_ratio_ttl, errors=(HttpError, GoldRatioError))
+            profile_mark('render')
+            ratio_text = format_gold_quote(quote)
+            if age is not None:
+                ratio_text += "\n" + self.format_stale_notice(age)
+        except GoldRatioError as e:
+            ratio_text = str(e)
+        except Exception as e:
+            ratio_text = f"查询金币比例失败：{e}"
         yield event.plain_result(ratio_text)
 
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @filter.command("dnf任务")
+    async def dnf_tasks(self, event):
+        """查看后台任务状态（管理员）"""
+        yield event.plain_result(self.format_scheduler_stats())
+
+    def format_scheduler_stats(self):
+        def fmt_time(ts):
+            return datetime.datetime.fromtimestamp(ts).strftime('%m-%d %H:%M:%S') if ts else "-"
+
+        lines = ["🕒 后台任务状态"]
+        for st in self.scheduler.stats():
+            duration = f"{st['last_duration'] * 1000:.0f}ms" if st['last_duration'] is not None else "-"
+            lag = f"{st['last_lag']:.1f}s" if st['last_lag'] is not None else "-"
+            lines.append(f"\n• {st['name']}（{st['trigger']}）{'运行中' if st['running'] else ''}")
+            lines.append(f"  上次运行：{fmt_time(st['last_run'])}，耗时 {duration}，延迟 {lag}")
+            lines.append(f"  下次运行：{fmt_time(st['next_run'])}")
+            lines.append(f"  次数 {st['run_count']} / 失败 {st['error_count']} / 跳过 {st['skipped_count']} / 补跑 {st['missed_count']}")
+            if st['last_error']:
+                lines.append(f"  最近错误：{st['last_error']}")
+        q = self.send_queue.stats()
+        lines.append(f"\n📮 发送队列：待发送 {q['pending']} 条（{q['targets']} 个目标），"
+                     f"已发送 {q['sent']} / 重试 {q['retried']} / 放弃 {q['dropped']}")
+        pf = self.platforms.stats()
+        lines.append(f"  推送平台：已缓存 {pf['cached']} 个，解析 {pf['resolved']} 次 / 失效 {pf['invalidated']} 次")
+        skipped = self.http.skipped_parses
+        if skipped:
+            lines.append(f"\n♻️ 上游内容未变化、跳过解析：共 {sum(skipped.values())} 次")
+            for key, count in skipped.most_common(5):
+                lines.append(f"  {key}：{count} 次")
+        return "\n".join(lines)
+
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @filter.command("dnf性能")
+    async def dnf_profile(self, event):
+        """指令耗时分析（管理员）：dnf性能 [开|关|清空]"""
+        action = PROFILE_COMMAND.parse(message_text(event))['action']
+        if action == "开":
+            self.profiler.enabled = True
+            yield event.plain_result("已开启指令耗时分析")
+            return
+        if action == "关":
+            self.profiler.enabled = False
+            yield event.plain_result("已关闭指令耗时分析（已有记录保留）")
+            return
+        if action == "清空":
+            self.profiler.clear()
+            yield event.plain_result("已清空耗时分析记录")
+            return
+        yield event.plain_result(self.format_profile_summary())
+
+    def format_profile_summary(self):
+        state = "已开启" if self.profiler.enabled else "未开启"
+        lines = [f"⏱ 指令耗时分析（{state}，记录 {len(self.profiler.records)} 条）"]
+        summary = self.profiler.summary()
+        if not summary:
+            lines.append("暂无记录，可发送 dnf性能 开 开启")
+            return "\n".join(lines)
+        allocs = self.profiler.alloc_summary()
+        # 顺序阶段在前，load 的细分（fetch/parse）紧随其后
+        order = ('total', 'extract', 'args', 'load', 'fetch', 'parse', 'render')
+        for handler, phases in summary.items():
+            lines.append(f"\n• {handler}")
+            for name in sorted(phases, key=lambda n: order.index(n) if n in order else len(order)):
+                n, avg, p50, p95, mx = phases[name]
+                lines.append(f"  {name}：{n}次 平均 {avg * 1000:.1f}ms / p50 {p50 * 1000:.1f} / p95 {p95 * 1000:.1f} / 最大 {mx * 1000:.1f}")
+            alloc = allocs.get(handler)
+            if alloc:
+                text = "，".join(f"{name} {size / 1024:.1f}KB" for name, size in alloc.items())
+                lines.append(f"  内存（抽样均值）：{text}")
+        return "\n".join(lines)
+
+    def event_target(self, event):
+        """当前会话对应的推送目标：群聊为群，私聊为发送者；非 aiocqhttp 平台的目标带上平台 id"""
+        platform = None
+        if hasattr(event, 'get_platform_name') and event.get_platform_name() != 'aiocqhttp':
+            platform = event.get_platform_id() if hasattr(event, 'get_platform_id') else event.get_platform_name()
+        group_id = event.get_group_id() if hasattr(event, 'get_group_id') else None
+        if group_id:
+            return make_target('group', group_id, platform)
+        return make_target('private', event.get_sender_id(), platform)
+
+    def can_manage_target(self, event):
+        """群聊中修改订阅与提醒须为机器人管理员或群主 / 群管理员；私聊只影响自己，不做限制"""
+        group_id = event.get_group_id() if hasattr(event, 'get_group_id') else None
+        if not group_id:
+            return True
+        if hasattr(event, 'is_admin') and event.is_admin():
+            return True
+        # aiocqhttp 的原始事件中带有发送者的群角色（owner / admin / member）
+        raw = getattr(getattr(event, 'message_obj', None), 'raw_message', None)
+        sender = raw.get('sender') if isinstance(raw, dict) else None
+        return isinstance(sender, dict) and sender.get('role') in ('owner', 'admin')
+
+    def format_subscriptions(self, target):
+        subs = self.subscriptions.for_target(target)
+        if not subs:
+            return "当前会话没有订阅任何推送\n用法：订阅 金币 [阈值] / 订阅 油价 / 订阅 蛋价"
+        lines = ["📬 当前会话的订阅："]
+        for sub in subs:
+            line = f"• {FEEDS.get(sub['feed'], sub['feed'])}"
+            if sub['feed'] == 'gold':
+                line += f"（波动 ≥ {self.gold_threshold(sub):g}万金币时通知）"
+            lines.append(line)
+        return "\n".join(lines)
+
+    @filter.command("订阅")
+    async def subscribe(self, event):
+        """订阅推送：订阅 金币 [阈值] / 订阅 油价 / 订阅 蛋价；不带参数时查看当前会话的订阅"""
+        try:
+            route = SUBSCRIBE_COMMAND.parse(message_text(event))
+        except UsageError as e:
+            yield event.plain_result(str(e))
+            return
+        target = self.event_target(event)
+        if route.name == 'list':
+            yield event.plain_result(self.format_subscriptions(target))
+            return
+        if not self.can_manage_target(event):
+            yield event.plain_result("❌ 仅群主、群管理员或机器人管理员可以修改本群的订阅与提醒")
+            return
+        feed, threshold = route['feed'], route['threshold']
+        if threshold is not None and feed != 'gold':
+            yield event.plain_result(str(UsageError("阈值仅支持金币订阅，例如：订阅 金币 1.5")))
+            return
+        sub = self.subscriptions.subscribe(feed, target, threshold)
+        text = f"已订阅{FEEDS[feed]}推送"
+        if feed == 'gold':
+            text += f"，波动 ≥ {self.gold_threshold(sub):g}万金币时通知"
+        yield event.plain_result(text)
+
+    @filter.command("提醒")
+    async def price_alert(self, event):
+        """价格提醒：提醒 金币 > 55 / 提醒 金币 跌 3% / 提醒 蛋价 平舆 跌 5% / 提醒 删除 编号；不带参数时查看"""
+        try:
+            route = ALERT_COMMAND.parse(message_text(event))
+        except UsageError as e:
+            yield event.plain_result(str(e))
+            return
+        target = self.event_target(event)
+        if route.name == 'list':
+            rules = self.alerts.for_target(target)
+            if not rules:
+                yield event.plain_result(f"当前会话没有设置提醒\n\n📋 用法：\n{ALERT_COMMAND.usage}")
+                return
+            yield event.plain_result("🔔 当前会话的提醒：\n" + "\n".join(self.format_alert_rule(r) for r in rules))
+            return
+        if not self.can_manage_target(event):
+            yield event.plain_result("❌ 仅群主、群管理员或机器人管理员可以修改本群的订阅与提醒")
+            return
+        if route.name == 'delete':
+            rule_id = route['rule_id']
+            ok = self.alerts.remove(rule_id, target=target)
+            yield event.plain_result(f"已删除提醒 #{rule_id}" if ok else f"当前会话没有编号为 {rule_id} 的提醒")
+            return
+        feed, area, op, value, percent = route['feed'], route['area'], route['op'], route['number'], route['percent']
+        if (feed == '金币') == bool(area):
+            yield event.plain_result(str(UsageError("金币提醒不需要地区，蛋价提醒需要地区，例如：提醒 蛋价 平舆 跌 5%")))
+            return
+        if (op in ('涨', '跌')) != bool(percent):
+            yield event.plain_result(str(UsageError("涨跌提醒请使用百分比（如 跌 5%），价位提醒请使用 > 或 <（如 > 55）")))
+            return
+        if len(self.alerts.for_target(target)) >= self.ALERT_MAX_PER_TARGET:
+            yield event.plain_result(f"每个会话最多设置 {self.ALERT_MAX_PER_TARGET} 条提醒，请先删除不需要的提醒")
+            return
+        series = 'gold.avg' if feed == '金币' else f"egg.{area}"
+        if op in ('涨', '跌'):
+            rule = self.alerts.add(target, series, 'rise' if op == '涨' else 'drop', pct=value)
+        else:
+            rule = self.alerts.add(target, series, 'above' if op in ('>', '＞') else 'below', level=value)
+        text = f"已设置提醒 {self.format_alert_rule(rule)}"
+        if rule['level'] is None:
+            text += "\n将以下一次获取到的价格为参考值"
+        yield event.plain_result(text)
+
+    @filter.command("退订")
+    async def unsubscribe(self, event):
+        """取消订阅：退订 金币 / 退订 油价 / 退订 蛋价"""
+        try:
+            feed = UNSUBSCRIBE_COMMAND.parse(message_text(event))['feed']
+        except UsageError as e:
+            yield event.plain_result(str(e))
+            return
+        if not self.can_manage_target(event):
+            yield event.plain_result("❌ 仅群主、群管理员或机器人管理员可以修改本群的订阅与提醒")
+            return
+        if self.subscriptions.unsubscribe(feed, self.event_target(event)):
+            yield event.plain_result(f"已退订{FEEDS[feed]}推送")
+        else:
+            yield event.plain_result(f"当前会话未订阅{FEEDS[feed]}推送")
+
     # 已移除独立的 DNF 帮助指令（不再注册 'dnf帮助'）
 
     @filter.command("油价")
+    @profiled("oil_price")
     async def oil_price(self, event):
-        """查询油价信息或计算行驶成本"""
+        """查询油价信息、计算行驶成本、全国排行与地区对比"""
         try:
-            # 获取消息内容
-            message = ""
-            if hasattr(event, 'message_str'):
-                message = event.message_str
-                logger.info(f"通过event.message_str获取到消息: {message}")
-            elif hasattr(event, 'get_message_str'):
-                message = event.get_message_str()
-                logger.info(f"通过event.get_message_str()获取到消息: {message}")
-            elif hasattr(event, 'message_obj'):
-                message = str(event.message_obj)
-                logger.info(f"通过event.message_obj获取到消息: {message}")
-            else:
-                message = str(event)
-                logger.info(f"通过str(event)获取到消息: {message}")
-            
-            # 智能解析消息内容
-            # 格式1: 油价 河南 (查询地区油价)
-            # 格式2: 油价 河南 92 7.5 (计算行驶成本: 地区 油号 百公里油耗)
-            # 格式3: 油价 河南 95 8.0 100 (计算行驶成本: 地区 油号 百公里油耗 行驶里程)
-            
-            # 尝试匹配计算格式
-            calc_match = re.search(r'油价\s+([^\s]+)\s+(\d+)\s+([\d.]+)(?:\s+(\d+))?', message)
-            if calc_match:
-                # 油价计算模式
-                area = calc_match.group(1)  # 地区
-                oil_type = calc_match.group(2)  # 油号
-                consumption = float(calc_match.group(3))  # 百公里油耗
-                distance = int(calc_match.group(4)) if calc_match.group(4) else 100  # 行驶里程，默认100公里
-                
+            profile_mark('extract')
+            message = message_text(event)
+            profile_mark('args')
+            try:
+                route = OIL_COMMAND.parse(message)
+            except UsageError as e:
+                yield event.plain_result(str(e))
+                return
+
+            if route.name in ('rank', 'compare'):
+                if route.name == 'rank':
+                    grade = f"p{route['grade'] or '92'}"
+                else:
+                    areas = list(dict.fromkeys(route['areas']))
+                    if len(areas) < 2:
+                        yield event.plain_result(str(UsageError("请至少指定两个不同的地区，如：油价 对比 河南 山东")))
+                        return
+                profile_mark('load')
+                try:
+                    table, age = await self.get_oil_table_or_stale()
+                except OilPriceError as e:
+                    yield event.plain_result(f"查询失败：{e}")
+                    return
+                profile_mark('render')
+                if route.name == 'rank':
+                    result = self.format_oil_ranking(table, grade)
+                else:
+                    missing = [a for a in areas if a not in table.index]
+                    if missing:
+                        yield event.plain_result(f"暂无{'、'.join(missing)}的油价数据")
+                        return
+                    result = self.format_oil_compare(table, areas)
+                if age is not None:
+                    result += "\n" + self.format_stale_notice(age)
+                yield event.plain_result(result)
+                return
+
+            if route.name == 'batch':
+                areas = list(dict.fromkeys(route['areas']))
+                grades = list(dict.fromkeys(route['grades']))
+                consumptions = route['consumptions']
+                distances = route['distances'] or [100.0]
+                if not (areas and grades and consumptions and distances):
+                    yield event.plain_result(str(UsageError("参数不能为空", OIL_COMMAND.usage)))
+                    return
+                rows = len(areas) * len(grades) * len(consumptions) * len(distances)
+                if rows > self.TRIP_BATCH_MAX_ROWS:
+                    yield event.plain_result(str(UsageError(
+                        f"组合过多（{rows} 项），一次最多计算 {self.TRIP_BATCH_MAX_ROWS} 项")))
+                    return
+                profile_mark('load')
+                table, missing, age = await self.plan_trip_costs(areas, grades, consumptions, distances)
+                profile_mark('render')
+                result = format_trip_table(table, missing)
+                if age is not None:
+                    result += "\n" + self.format_stale_notice(age)
+                yield event.plain_result(result)
+                return
+
+            if route.name == 'calc':
+                # 油价计算模式：地区 油号 百公里油耗 [行驶里程，默认100公里]
+                area = route['area']
+                oil_type = route['grade']
+                consumption = route['consumption']
+                distance = route['distance'] or 100
+
                 # 先获取该地区的油价信息
-                oil_price = await self.get_oil_price_by_type(area, oil_type)
+                profile_mark('load')
+                oil_price, age = await self.get_oil_price_by_type(area, oil_type)
+                profile_mark('render')
                 if oil_price is None:
                     yield event.plain_result(f"❌ 无法获取{area}地区{oil_type}号油的价格信息")
                     return
-                
+
                 result = self.calculate_oil_cost(oil_type, oil_price, consumption, distance, area)
+                if age is not None:
+                    result += "\n" + self.format_stale_notice(age)
                 yield event.plain_result(result)
                 return
-            
-            # 尝试匹配地区查询格式（只匹配纯地区名，不包含数字）
-            area_match = re.search(r'油价\s+([^\s\d]+)$', message)
-            if area_match:
-                # 地区油价查询模式
-                area = area_match.group(1).strip()
-                
-                # 构建API请求URL
-                api_url = "https://www.iamwawa.cn/oilprice/api"
-                params = {"area": area}
-                
-                # 发送HTTP请求
-                response = requests.get(api_url, params=params, timeout=10)
-                response.raise_for_status()
-                
-                # 解析返回的JSON数据
-                data = response.json()
-                
-                if data.get("status") == 1 and "data" in data:
-                    oil_data = data["data"]
-                    
-                    # 构建油价信息文本
-                    oil_info = f"📊 {oil_data['name']}油价信息\n"
-                    oil_info += f"📅 更新时间：{oil_data['date']}\n"
-                    oil_info += f"⛽ 92号汽油：{oil_data['p92']}元/升\n"
-                    oil_info += f"⛽ 95号汽油：{oil_data['p95']}元/升\n"
-                    oil_info += f"⛽ 98号汽油：{oil_data['p98']}元/升\n"
-                    oil_info += f"⛽ 0号柴油：{oil_data['p0']}元/升\n"
-                    
-                    # 添加其他油品信息（如果存在且不为"-"）
-                    if oil_data.get('p10') and oil_data['p10'] != "-":
-                        oil_info += f"⛽ 10号柴油：{oil_data['p10']}元/升\n"
-                    if oil_data.get('p20') and oil_data['p20'] != "-":
-                        oil_info += f"⛽ 20号柴油：{oil_data['p20']}元/升\n"
-                    if oil_data.get('p35') and oil_data['p35'] != "-":
-                        oil_info += f"⛽ 35号柴油：{oil_data['p35']}元/升\n"
-                    
-                    oil_info += f"🔄 下次更新时间：{oil_data['next_update_time']}\n\n"
-                    # 不在查询结果中附带使用示例，使用单独指令 '油价帮助' 查看详细说明
-                    
-                    yield event.plain_result(oil_info)
-                else:
-                    yield event.plain_result(f"查询失败：{data.get('message', '未知错误')}")
-            else:
-                # 参数不正确，提示正确的使用方法
-                error_text = "❌ 参数格式不正确\n\n"
-                error_text += "📋 正确格式：\n"
-                error_text += "• 油价 地区名 - 查询地区油价\n"
-                error_text += "• 油价 地区名 油号 油耗 - 计算行驶成本\n"
-                error_text += "• 油价 地区名 油号 油耗 里程 - 计算指定里程成本\n"
-                
-                yield event.plain_result(error_text)
-                
-        except requests.exceptions.RequestException as e:
+
+            # 地区油价查询模式，经由缓存获取油价（下次调价前不会重复请求上游）
+            area = route['area']
+            try:
+                profile_mark('load')
+                oil_data, age = await self.get_oil_data_or_stale(area)
+            except OilPriceError as e:
+                yield event.plain_result(f"查询失败：{e}")
+                return
+            profile_mark('render')
+
+            # 构建油价信息文本
+            oil_info = f"📊 {oil_data['name']}油价信息\n"
+            oil_info += f"📅 更新时间：{oil_data['date']}\n"
+            oil_info += f"⛽ 92号汽油：{oil_data['p92']}元/升\n"
+            oil_info += f"⛽ 95号汽油：{oil_data['p95']}元/升\n"
+            oil_info += f"⛽ 98号汽油：{oil_data['p98']}元/升\n"
+            oil_info += f"⛽ 0号柴油：{oil_data['p0']}元/升\n"
+
+            # 添加其他油品信息（如果存在且不为"-"）
+            if oil_data.get('p10') and oil_data['p10'] != "-":
+                oil_info += f"⛽ 10号柴油：{oil_data['p10']}元/升\n"
+            if oil_data.get('p20') and oil_data['p20'] != "-":
+                oil_info += f"⛽ 20号柴油：{oil_data['p20']}元/升\n"
+            if oil_data.get('p35') and oil_data['p35'] != "-":
+                oil_info += f"⛽ 35号柴油：{oil_data['p35']}元/升\n"
+
+            oil_info += f"🔄 下次更新时间：{oil_data['next_update_time']}\n\n"
+            # 不在查询结果中附带使用示例，使用单独指令 '油价帮助' 查看详细说明
+            if age is not None:
+                oil_info += self.format_stale_notice(age) + "\n"
+
+            yield event.plain_result(oil_info)
+
+        except HttpError as e:
             logger.error(f"油价查询请求失败: {e}")
             yield event.plain_result("油价查询请求失败，请稍后重试")
         except json.JSONDecodeError as e:
@@ -603,172 +1109,37 @@ class DNF_Plugin(Star):
             yield event.plain_result("油价查询出现异常，请稍后重试")
 
     @filter.command("蛋价")
+    @profiled("egg_price")
     async def egg_price(self, event):
         """查询蛋价，示例：
         • 蛋价 河南        -> 查询河南地区（默认关键词：鸡蛋）
         • 蛋价 河南 20260129 -> 指定日期查询
         """
         try:
-            # 获取消息内容（与油价处理方式一致）
-            message = ""
-            if hasattr(event, 'message_str'):
-                message = event.message_str
-            elif hasattr(event, 'get_message_str'):
-                message = event.get_message_str()
-            elif hasattr(event, 'message_obj'):
-                message = str(event.message_obj)
-            else:
-                message = str(event)
-
-            # 解析参数：蛋价 [地区] [可选日期 YYYYMMDD]
-            # 支持：
-            #  - 蛋价 驻马店
-            #  - 蛋价 驻马店 20260129
-            #  - 蛋价 20260129
-            args = ""
-            if '蛋价' in message:
-                args = message.split('蛋价', 1)[1].strip()
-            else:
-                args = message.strip()
-
-            if not args:
-                area = ""
-                pDate = None
-            else:
-                parts = args.split()
-                # 若最后一项是 8 位数字视作日期
-                if parts and parts[-1].isdigit() and len(parts[-1]) == 8:
-                    pDate = parts[-1]
-                    area = " ".join(parts[:-1]).strip()
-                else:
-                    pDate = None
-                    area = " ".join(parts).strip()
+            profile_mark('extract')
+            message = message_text(event)
+            # 解析参数：蛋价 [地区] [可选日期 YYYYMMDD 或时间范围（如 30d），二者择一]
+            profile_mark('args')
+            try:
+                route = EGG_COMMAND.parse(message)
+            except UsageError as e:
+                yield event.plain_result(str(e))
+                return
+            area = route['area'] or ""
+            pDate = route['date']
+            period = route['period']
 
-            # 清理地区：优先提取首个中文连续块，去掉后缀
-            if area:
-                m_cn = re.search(r"[\u4e00-\u9fff]+", area)
-                area = m_cn.group(0) if m_cn else area
-
-            base = "http://www.quotn.cn/e/search"
-            # 查询并比较今日/昨日价格
-            def query_egg_prices(area_name: str, date_str: str):
-                """返回列表，每项 {'title':..., 'price': float or None}。"""
-                params = {
-                    "k": area_name or "",
-                    "areaName": area_name or "",
-                    "pDate": date_str,
-                    "_": str(int(time.time() * 1000)),
-                }
-                resp = requests.get(base, params=params, timeout=10)
-                resp.raise_for_status()
-                results = []
+            if period:
                 try:
-                    j = resp.json()
-                except Exception:
-                    j = None
-
-                def collect(obj):
-                    if isinstance(obj, dict):
-                        for k in ("price", "priceText", "金额"):
-                            if k in obj:
-                                title = obj.get("title") or obj.get("name") or obj.get("标题") or ""
-                                raw = obj.get(k)
-                                try:
-                                    price = float(str(raw))
-                                except Exception:
-                                    m = re.search(r"([0-9]+(?:\.[0-9]+)?)", str(raw or ""))
-                                    price = float(m.group(1)) if m else None
-                                # 尝试提取时间字段（可能的字段名）
-                                utime_raw = None
-                                for tkey in ("uTime", "utime", "u_time", "time", "date", "pubTime", "pubtime", "报价时间"):
-                                    if tkey in obj and obj.get(tkey):
-                                        utime_raw = obj.get(tkey)
-                                        break
-                                utime_fmt = None
-                                if utime_raw is not None:
-                                    try:
-                                        # 若为纯数字字符串或数字，尝试解析为时间戳（秒或毫秒）
-                                        if isinstance(utime_raw, (int, float)) or (isinstance(utime_raw, str) and utime_raw.isdigit()):
-                                            n = int(utime_raw)
-                                            # 若为毫秒级时间戳（> 1e12），则转换为秒
-                                            if n > 10**12:
-                                                n = n // 1000
-                                            utime_fmt = datetime.datetime.fromtimestamp(n).strftime('%Y-%m-%d %H:%M')
-                                        else:
-                                            # 否则直接使用字符串形式（裁剪过长）
-                                            utime_fmt = str(utime_raw)[:19]
-                                    except Exception:
-                                        utime_fmt = str(utime_raw)
-                                results.append({"title": title.strip(), "price": price, "utime": utime_fmt})
-                                return True
-                        for v in obj.values():
-                            collect(v)
-                    elif isinstance(obj, list):
-                        for it in obj:
-                            collect(it)
-
-                # 优先解析常见的 'body.dataList' 或顶级 'dataList' 列表结构
-                parsed_from_list = False
-                if isinstance(j, dict):
-                    body = j.get('body') if isinstance(j.get('body'), dict) else None
-                    data_list = None
-                    if body and isinstance(body.get('dataList'), list):
-                        data_list = body.get('dataList')
-                    elif isinstance(j.get('dataList'), list):
-                        data_list = j.get('dataList')
-
-                    if isinstance(data_list, list) and data_list:
-                        for item in data_list:
-                            if not isinstance(item, dict):
-                                continue
-                            # 地址使用 cName + aName
-                            cName = item.get('cName') or ''
-                            aName = item.get('aName') or ''
-                            title = f"{cName}{aName}" if (cName or aName) else (item.get('aName') or item.get('name') or '')
-                            # 尝试获取价格字段（使用 tPrice）
-                            price = None
-                            if 'tPrice' in item and item.get('tPrice') not in (None, ''):
-                                try:
-                                    price = float(str(item.get('tPrice')))
-                                except Exception:
-                                    m = re.search(r"([0-9]+(?:\.[0-9]+)?)", str(item.get('tPrice') or ""))
-                                    price = float(m.group(1)) if m else None
-                            else:
-                                for pk in ("price", "priceText", "金额", "yPrice"):
-                                    if pk in item and item.get(pk) not in (None, ""):
-                                        try:
-                                            price = float(str(item.get(pk)))
-                                        except Exception:
-                                            m = re.search(r"([0-9]+(?:\.[0-9]+)?)", str(item.get(pk) or ""))
-                                            price = float(m.group(1)) if m else None
-                                        break
-                            # upTime 字段直接使用（不加标签）
-                            up_time = item.get('upTime') or None
-                            # yPrice 可作为昨日价格参考
-                            yprice = None
-                            if 'yPrice' in item and item.get('yPrice') not in (None, ''):
-                                try:
-                                    yprice = float(str(item.get('yPrice')))
-                                except Exception:
-                                    m = re.search(r"([0-9]+(?:\.[0-9]+)?)", str(item.get('yPrice') or ""))
-                                    yprice = float(m.group(1)) if m else None
-                            results.append({"title": title.strip(), "price": price, "upTime": up_time, "cName": cName, "aName": aName, "yPrice": yprice})
-                        parsed_from_list = True
-                if not parsed_from_list:
-                    collect(j)
-
-                if not results:
-                    text = resp.text
-                    pattern = re.compile(r"([\u4e00-\u9fff\w\-\s\/（）()]{2,60}?)\s*[：:\-\s]{0,3}\s*([0-9]+(?:\.[0-9]+)?)\s*(?:元|元/斤|元/公斤)")
-                    found = pattern.findall(text)
-                    for title, price_s in found:
-                        try:
-                            price = float(price_s)
-                        except Exception:
-                            price = None
-                        results.append({"title": title.strip(), "price": price})
-
-                return results
+                    profile_mark('load')
+                    summary = await self.history.summarize(f"egg.{area or '全部'}", period)
+                except Exception as e:
+                    logger.error(f"读取蛋价历史数据失败: {e}")
+                    yield event.plain_result("历史数据读取失败，请稍后重试")
+                    return
+                profile_mark('render')
+                yield event.plain_result(self.format_history_summary(f"{area}蛋价", "元", summary, period))
+                return
 
             # 计算日期字符串
             today_str = pDate or datetime.date.today().strftime("%Y%m%d")
@@ -779,8 +1150,12 @@ class DNF_Plugin(Star):
             yesterday = dt - datetime.timedelta(days=1)
             yesterday_str = yesterday.strftime("%Y%m%d")
 
-            today_items = query_egg_prices(area, today_str)
-            yesterday_items = query_egg_prices(area, yesterday_str)
+            # 今日与昨日并发查询；已结束日期直接命中本地缓存
+            profile_mark('load')
+            (today_items, today_age), (yesterday_items, _) = await asyncio.gather(
+                self.get_egg_prices_or_stale(area, today_str),
+                self.get_egg_prices_or_stale(area, yesterday_str),
+            )
 
             def average_price(items):
                 vals = [it.get("price") for it in items if isinstance(it.get("price"), (int, float))]
@@ -788,6 +1163,7 @@ class DNF_Plugin(Star):
                     return None
                 return sum(vals) / len(vals)
 
+            profile_mark('render')
             avg_today = average_price(today_items)
             avg_yesterday = average_price(yesterday_items)
 
@@ -857,9 +1233,11 @@ class DNF_Plugin(Star):
                         lines.append(f"{cnt} .{title} {up_time} {price_text}({change_mark_short})")
                     else:
                         lines.append(f"{cnt} .{title} {price_text}({change_mark_short})")
+            if today_age is not None:
+                lines.append(self.format_stale_notice(today_age))
             yield event.plain_result("\n".join(lines))
 
-        except requests.exceptions.RequestException as e:
+        except HttpError as e:
             logger.error(f"蛋价查询请求失败: {e}")
             yield event.plain_result("蛋价查询请求失败，请稍后重试")
         except Exception as e:
@@ -869,36 +1247,25 @@ class DNF_Plugin(Star):
     # 已移除 '油价帮助' 指令，应答中不再引用独立帮助命令
 
     async def get_oil_price_by_type(self, area, oil_type):
-        """根据地区和油号获取油价"""
+        """根据地区和油号获取油价，返回 (价格或 None, 旧数据秒数或 None)"""
         try:
-            # 构建API请求URL
-            api_url = "https://www.iamwawa.cn/oilprice/api"
-            params = {"area": area}
+            # 经由缓存获取该地区油价（上游不可用时使用旧数据）
+            oil_data, age = await self.get_oil_data_or_stale(area)
             
-            # 发送HTTP请求
-            response = requests.get(api_url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            # 解析返回的JSON数据
-            data = response.json()
-            
-            if data.get("status") == 1 and "data" in data:
-                oil_data = data["data"]
-                
-                # 根据油号获取对应价格
-                price_key = f"p{oil_type}"
-                if price_key in oil_data and oil_data[price_key] != "-":
-                    return float(oil_data[price_key])
-                else:
-                    logger.warning(f"地区{area}的{oil_type}号油价格不存在或为-")
-                    return None
+            # 根据油号获取对应价格
+            price_key = f"p{oil_type}"
+            if price_key in oil_data and oil_data[price_key] != "-":
+                return float(oil_data[price_key]), age
             else:
-                logger.error(f"获取{area}地区油价失败：{data.get('message', '未知错误')}")
-                return None
+                logger.warning(f"地区{area}的{oil_type}号油价格不存在或为-")
+                return None, None
                 
+        except OilPriceError as e:
+            logger.error(f"获取{area}地区油价失败：{e}")
+            return None, None
         except Exception as e:
             logger.error(f"获取{area}地区{oil_type}号油价异常: {e}")
-            return None
+            return None, None
 
     def calculate_oil_cost(self, oil_type, oil_price, consumption, distance, area=""):
         """计算油价成本"""
@@ -915,36 +1282,40 @@ class DNF_Plugin(Star):
             # 计算每公里成本
             cost_per_km = total_cost / distance
             
-            # 构建结果文本
-            result = f"🛢️ 油价成本计算器\n\n"
+            # 构建结果文本（逐行收集后一次拼接）
+            lines = ["🛢️ 油价成本计算器", ""]
             if area:
-                result += f"📍 地区：{area}\n"
-            result += f"📊 计算参数：\n"
-            result += f"• 油品类型：{oil_type}号\n"
-            result += f"• 油价：{oil_price}元/升\n"
-            result += f"• 百公里油耗：{consumption}升\n"
-            result += f"• 行驶里程：{distance}公里\n\n"
-            result += f"💰 计算结果：\n"
-            result += f"• 每公里油耗：{consumption_per_km:.3f}升\n"
-            result += f"• 总油耗：{total_consumption:.2f}升\n"
-            result += f"• 每公里成本：{cost_per_km:.2f}元\n"
-            result += f"• 总成本：{total_cost:.2f}元\n\n"
+                lines.append(f"📍 地区：{area}")
+            lines += [
+                "📊 计算参数：",
+                f"• 油品类型：{oil_type}号",
+                f"• 油价：{oil_price}元/升",
+                f"• 百公里油耗：{consumption}升",
+                f"• 行驶里程：{distance}公里",
+                "",
+                "💰 计算结果：",
+                f"• 每公里油耗：{consumption_per_km:.3f}升",
+                f"• 总油耗：{total_consumption:.2f}升",
+                f"• 每公里成本：{cost_per_km:.2f}元",
+                f"• 总成本：{total_cost:.2f}元",
+                "",
+            ]
             
             # 添加一些实用的参考信息
             if distance == 100:
-                result += f"💡 百公里成本：{total_cost:.2f}元\n"
+                lines.append(f"💡 百公里成本：{total_cost:.2f}元")
             
             # 根据油耗给出建议
             if consumption <= 6:
-                result += "✅ 油耗表现优秀！"
+                lines.append("✅ 油耗表现优秀！")
             elif consumption <= 8:
-                result += "👍 油耗表现良好"
+                lines.append("👍 油耗表现良好")
             elif consumption <= 10:
-                result += "⚠️ 油耗表现一般"
+                lines.append("⚠️ 油耗表现一般")
             else:
-                result += "🔴 油耗偏高，建议检查车况"
+                lines.append("🔴 油耗偏高，建议检查车况")
             
-            return result
+            return "\n".join(lines)
             
         except Exception as e:
             logger.error(f"油价计算异常: {e}")
@@ -952,3 +1323,14 @@ class DNF_Plugin(Star):
 
     async def terminate(self):
         """可选择实现异步的插件销毁方法，当插件被卸载/停用时会调用。"""
+        await self.scheduler.shutdown()
+        if self._owns_tasks:
+            DNF_Plugin._tasks_started = False
+        # 尽量发完已入队的推送
+        await self.send_queue.close(timeout=5.0)
+        await self.http.close()
+        await self.history.close()
+        if self.metrics_server is not None:
+            await self.metrics_server.close()
+            self.metrics_server = None
+        await self.state.close()
@@ -0,0 +1,109 @@
+import array
+import math
+import time
+
+from .oil_utils import OIL_AREAS, OIL_PRICE_KEYS, parse_next_update_time
+
+_NAN = float("nan")
+
+
+def _to_price(raw):
+    try:
+        value = float(raw)
+    except (TypeError, ValueError):
+        return _NAN
+    return value if value > 0 else _NAN
+
+
+def resolve_area(name, areas=OIL_AREAS):
+    """把用户输入的地区名（如 "河南省"、"内蒙古自治区"）对应到表中的地区，找不到时返回 None。"""
+    name = (name or "").strip()
+    if name in areas:
+        return name
+    return next((area for area in areas if name.startswith(area)), None)
+
+
+class OilPriceTable:
+    """全国各地区、各油品的油价表（列式存储）。
+
+    areas 为地区元组；columns[油品] 为与 areas 对齐的 array('d')，无报价（"-"）为 NaN；
+    ranks[油品] 为有报价地区的下标、按价格从低到高排列，构建时一次排好，排行查询
+    只需按下标取值。carried 为本次刷新失败、沿用上一张表数据的地区。
+    """
+
+    __slots__ = ("areas", "index", "columns", "ranks", "dates", "next_update", "refreshed_at", "carried")
+
+    def __init__(self, areas, columns, dates, next_update=None, refreshed_at=None, carried=()):
+        self.areas = tuple(areas)
+        self.index = {area: i for i, area in enumerate(self.areas)}
+        self.columns = {k: array.array('d', columns[k]) for k in OIL_PRICE_KEYS}
+        self.ranks = {}
+        for k, col in self.columns.items():
+            order = sorted((i for i, v in enumerate(col) if not math.isnan(v)), key=col.__getitem__)
+            self.ranks[k] = array.array('H', order)
+        self.dates = tuple(dates)
+        # 各地区下次调价时间中最早的一个（时间戳），到期后整表刷新
+        self.next_update = next_update
+        self.refreshed_at = refreshed_at if refreshed_at is not None else time.time()
+        self.carried = tuple(carried)
+
+    @classmethod
+    def from_area_data(cls, data_by_area, refreshed_at=None, carried=()):
+        """由 {地区: 油价接口 data 字典} 构建，地区按 OIL_AREAS 的顺序排列。"""
+        areas = [a for a in OIL_AREAS if a in data_by_area] + [a for a in data_by_area if a not in OIL_AREAS]
+        columns = {k: [_to_price(data_by_area[a].get(k)) for a in areas] for k in OIL_PRICE_KEYS}
+        dates = [str(data_by_area[a].get('date') or '') for a in areas]
+        updates = [parse_next_update_time(data_by_area[a].get('next_update_time')) for a in areas]
+        updates = [t for t in updates if t is not None]
+        return cls(areas, columns, dates, min(updates) if updates else None, refreshed_at, carried)
+
+    def row_data(self, area):
+        """某地区的一行，格式与油价接口的 data 字典相同（无报价为 "-"）；不在表中时返回 None。"""
+        i = self.index.get(area)
+        if i is None:
+            return None
+        row = {'name': area, 'date': self.dates[i]}
+        for k, col in self.columns.items():
+            row[k] = "-" if math.isnan(col[i]) else f"{col[i]:g}"
+        return row
+
+    def price(self, area, grade):
+        i = self.index.get(area)
+        if i is None or grade not in self.columns:
+            return None
+        value = self.columns[grade][i]
+        return None if math.isnan(value) else value
+
+    def ranking(self, grade):
+        """[(地区, 价格), ...]，按价格从低到高。"""
+        col = self.columns[grade]
+        return [(self.areas[i], col[i]) for i in self.ranks[grade]]
+
+    def ttl(self, now=None, fallback=3600.0, retry=600.0):
+        """缓存有效期：到最早的下次调价时间为止；有地区刷新失败时 retry 秒后重试。"""
+        if self.carried:
+            return retry
+        if self.next_update is None:
+            return fallback
+        remaining = self.next_update - (now if now is not None else time.time())
+        return remaining if remaining > 0 else fallback
+
+    def to_state(self):
+        return {
+            'areas': list(self.areas),
+            'prices': {k: [None if math.isnan(v) else v for v in col] for k, col in self.columns.items()},
+            'dates': list(self.dates),
+            'next_update': self.next_update,
+            'refreshed_at': self.refreshed_at,
+            'carried': list(self.carried),
+        }
+
+    @classmethod
+    def from_state(cls, data):
+        """由 to_state 的结果恢复，数据不完整时返回 None。"""
+        try:
+            columns = {k: [_NAN if v is None else v for v in data['prices'][k]] for k in OIL_PRICE_KEYS}
+            return cls(data['areas'], columns, data['dates'], data.get('next_update'), data.get('refreshed_at'),
+                       data.get('carried') or ())
+        except (KeyError, TypeError):
+            return None
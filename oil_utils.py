@@ -0,0 +1,83 @@
+import asyncio
+import datetime
+import time
+
+from .profiler import profile_phase
+
+OIL_API_URL = "https://www.iamwawa.cn/oilprice/api"
+# 参与变动比较和展示的油品字段
+OIL_PRICE_KEYS = ('p92', 'p95', 'p98', 'p0', 'p10', 'p20', 'p35')
+OIL_GRADE_NAMES = {
+    'p92': '92号汽油', 'p95': '95号汽油', 'p98': '98号汽油',
+    'p0': '0号柴油', 'p10': '10号柴油', 'p20': '20号柴油', 'p35': '35号柴油',
+}
+# 接口支持的 31 个省级地区
+OIL_AREAS = (
+    "北京", "天津", "河北", "山西", "内蒙古", "辽宁", "吉林", "黑龙江",
+    "上海", "江苏", "浙江", "安徽", "福建", "江西", "山东", "河南",
+    "湖北", "湖南", "广东", "广西", "海南", "重庆", "四川", "贵州",
+    "云南", "西藏", "陕西", "甘肃", "青海", "宁夏", "新疆",
+)
+
+
+class OilPriceError(Exception):
+    """油价接口返回了失败状态。"""
+
+
+async def fetch_oil_data(http, area, url=OIL_API_URL):
+    """查询单个地区的油价，返回接口的 data 字典；接口返回失败状态时抛出 OilPriceError。"""
+    with profile_phase("fetch"):
+        data = await http.get_json(url, params={"area": area})
+    if data.get("status") == 1 and "data" in data:
+        return data["data"]
+    raise OilPriceError(data.get("message", "未知错误"))
+
+
+def parse_next_update_time(text):
+    """解析接口的 next_update_time（如 ``2025-08-26 24:00``），返回时间戳；无法解析时返回 None。"""
+    if not text:
+        return None
+    text = str(text).strip()
+    try:
+        # 接口使用 24:00 表示当天结束，换算为次日 00:00
+        if text.endswith("24:00"):
+            day = datetime.datetime.strptime(text[:10], "%Y-%m-%d")
+            return (day + datetime.timedelta(days=1)).timestamp()
+        return datetime.datetime.strptime(text[:16], "%Y-%m-%d %H:%M").timestamp()
+    except ValueError:
+        return None
+
+
+def oil_cache_ttl(oil_data, fallback=3600.0, now=None):
+    """缓存有效期：到下次调价时间为止；时间缺失或已过（上游尚未更新）时使用 fallback。"""
+    expires_at = parse_next_update_time(oil_data.get('next_update_time') if isinstance(oil_data, dict) else None)
+    if expires_at is None:
+        return fallback
+    remaining = expires_at - (now if now is not None else time.time())
+    return remaining if remaining > 0 else fallback
+
+
+async def fetch_oil_areas(fetch, areas, concurrency=8):
+    """以有限并发批量抓取多个地区的油价。
+
+    ``fetch`` 为 ``async fetch(area) -> data``。单个地区失败不影响其他地区，
+    返回 ``(results, errors)``，两者均以地区为键并保持 areas 的顺序。
+    """
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(area):
+        async with sem:
+            return await fetch(area)
+
+    areas = list(dict.fromkeys(areas))
+    outcomes = await asyncio.gather(*(one(area) for area in areas), return_exceptions=True)
+    results = {}
+    errors = {}
+    for area, outcome in zip(areas, outcomes):
+        if isinstance(outcome, BaseException):
+            if isinstance(outcome, asyncio.CancelledError):
+                raise outcome
+            errors[area] = outcome
+        elif outcome:
+            results[area] = outcome
+    return results, errors
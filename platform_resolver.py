@@ -0,0 +1,107 @@
+from .subscriptions import parse_target
+
+
+class PlatformUnavailable(RuntimeError):
+    """找不到可用于推送的平台实例。"""
+
+
+def platform_id_of(platform):
+    """平台实例的 id（旧版 AstrBot 的元数据没有 id，退回适配器名称）。"""
+    meta = platform.meta()
+    return getattr(meta, "id", None) or meta.name
+
+
+class _OneBotSender:
+    """aiocqhttp：直接调用 OneBot 客户端发送纯文本。"""
+
+    def __init__(self, client):
+        self.client = client
+
+    async def send(self, kind, target_id, message):
+        if kind == "group":
+            await self.client.send_group_msg(group_id=int(target_id), message=message)
+        else:
+            await self.client.send_private_msg(user_id=int(target_id), message=message)
+
+
+class _ChainSender:
+    """其他适配器：拼出会话标识后经 context.send_message 发送消息链。"""
+
+    MESSAGE_TYPES = {"group": "GroupMessage", "private": "FriendMessage"}
+
+    def __init__(self, context, platform_id, message_chain):
+        self.context = context
+        self.platform_id = platform_id
+        self.message_chain = message_chain
+
+    async def send(self, kind, target_id, message):
+        session = f"{self.platform_id}:{self.MESSAGE_TYPES[kind]}:{target_id}"
+        if not await self.context.send_message(session, self.message_chain().message(message)):
+            raise PlatformUnavailable(f"平台 {self.platform_id} 未能发送到 {session}")
+
+
+class PlatformResolver:
+    """推送目标到发送端的解析与缓存。
+
+    目标未指定平台时（``group:群号``）使用默认平台：优先 ``preferred`` 适配器，
+    否则取第一个平台实例；指定平台时（``平台id/group:群号``）按平台 id 查找。
+    解析结果按平台缓存，之后的发送不再遍历平台列表。平台重连或重载后旧的发送端
+    会发送失败，此时清除该平台的缓存并抛出异常，由发送队列重试时重新解析。
+    """
+
+    def __init__(self, context, message_chain, preferred="aiocqhttp", logger=None):
+        self.context = context
+        self.message_chain = message_chain
+        self.preferred = preferred
+        self.logger = logger
+        # 平台 id（None 为默认平台）-> 发送端
+        self._senders = {}
+        self.resolve_count = 0
+        self.invalidate_count = 0
+
+    def _resolve(self, platform_id):
+        self.resolve_count += 1
+        insts = list(self.context.platform_manager.get_insts())
+        if platform_id is None:
+            platform = next((p for p in insts if p.meta().name == self.preferred), None)
+            if platform is None and insts:
+                platform = insts[0]
+        else:
+            platform = next((p for p in insts if platform_id_of(p) == platform_id), None)
+        if platform is None:
+            raise PlatformUnavailable(f"未找到平台 {platform_id or self.preferred}")
+        if platform.meta().name == "aiocqhttp":
+            sender = _OneBotSender(platform.get_client())
+        else:
+            sender = _ChainSender(self.context, platform_id_of(platform), self.message_chain)
+        if self.logger is not None:
+            self.logger.info(f"推送平台已解析: {platform_id or '默认'} -> {platform_id_of(platform)}")
+        return sender
+
+    def get(self, platform_id=None):
+        sender = self._senders.get(platform_id)
+        if sender is None:
+            sender = self._senders[platform_id] = self._resolve(platform_id)
+        return sender
+
+    def invalidate(self, platform_id=None):
+        """清除某个平台（默认平台为 None）的缓存。"""
+        if self._senders.pop(platform_id, None) is not None:
+            self.invalidate_count += 1
+
+    async def send(self, target, message):
+        """发送到 ``[平台id/]group:群号`` 或 ``[平台id/]private:用户id``，失败时清除缓存后抛出。"""
+        kind, target_id, platform_id = parse_target(target)
+        sender = self.get(platform_id)
+        try:
+            await sender.send(kind, target_id, message)
+        except Exception:
+            self.invalidate(platform_id)
+            raise
+
+    def stats(self):
+        return {
+            "cached": len(self._senders),
+            "resolved": self.resolve_count,
+            "invalidated": self.invalidate_count,
+        }
@@ -0,0 +1,198 @@
+"""指令处理耗时分析（默认关闭）。
+
+开启后每次处理记录各阶段耗时，按 ``alloc_every`` 抽样用 tracemalloc 统计
+各阶段的净内存分配，结果写入固定长度的环形缓冲区。
+
+- 指令处理函数用 ``profile_mark(name)`` 按顺序切分阶段：extract（取消息）、
+  args（解析参数）、load（取数据，含缓存）、render（渲染回复）；
+- 取数据的底层函数用 ``with profile_phase(name)`` 单独统计 fetch（上游请求）
+  与 parse（解析响应），它们是 load 的细分。
+
+未开启或不在处理流程内时两者均为空操作。并发执行的同名阶段（如同时查询
+今日与昨日蛋价）耗时累加计入同一阶段。
+"""
+import collections
+import contextlib
+import contextvars
+import functools
+import time
+import tracemalloc
+
+_current_run = contextvars.ContextVar("dnf_profile_run", default=None)
+_NULL_CONTEXT = contextlib.nullcontext()
+
+
+class ProfileRun:
+    """一次指令处理的记录：phases 为 {阶段: [耗时秒数, 净分配字节数或 None]}。"""
+
+    __slots__ = ("handler", "started_at", "total", "phases", "trace_alloc", "peak_alloc", "error", "_t0",
+                 "_mark", "_mark_t0", "_mark_mem0")
+
+    def __init__(self, handler, trace_alloc):
+        self.handler = handler
+        self.started_at = time.time()
+        self.total = None
+        self.phases = {}
+        self.trace_alloc = trace_alloc
+        self.peak_alloc = None
+        self.error = None
+        self._t0 = time.perf_counter()
+        self._mark = None
+        self._mark_t0 = None
+        self._mark_mem0 = None
+
+    def _memory(self):
+        return tracemalloc.get_traced_memory()[0] if self.trace_alloc else None
+
+    def _add(self, name, elapsed, mem0):
+        entry = self.phases.setdefault(name, [0.0, None])
+        entry[0] += elapsed
+        if mem0 is not None:
+            entry[1] = (entry[1] or 0) + tracemalloc.get_traced_memory()[0] - mem0
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        mem0 = self._memory()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add(name, time.perf_counter() - t0, mem0)
+
+    def mark(self, name):
+        """结束上一个顺序阶段并开始 name；name 为 None 时只结束。"""
+        now = time.perf_counter()
+        if self._mark is not None:
+            self._add(self._mark, now - self._mark_t0, self._mark_mem0)
+        self._mark = name
+        self._mark_t0 = now
+        self._mark_mem0 = self._memory() if name is not None else None
+
+    def stop(self):
+        """结束计时；之后等待消息发送等耗时不再计入。"""
+        if self.total is None:
+            self.mark(None)
+            self.total = time.perf_counter() - self._t0
+
+
+def profile_phase(name):
+    """在当前指令的分析记录中标记一个阶段；未在分析中时不做任何事。"""
+    run = _current_run.get()
+    return run.phase(name) if run is not None else _NULL_CONTEXT
+
+
+def profile_mark(name):
+    """结束当前指令的上一个顺序阶段并开始 name；未在分析中时不做任何事。"""
+    run = _current_run.get()
+    if run is not None:
+        run.mark(name)
+
+
+def profiled(name):
+    """装饰异步生成器形式的指令处理方法，在插件的 ``self.profiler`` 中记录本次处理。"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            with self.profiler.run(name) as record:
+                async for result in func(self, *args, **kwargs):
+                    # 回复交给框架发送后才会继续迭代，发送耗时不计入处理时间
+                    if record is not None:
+                        record.stop()
+                    yield result
+        return wrapper
+    return decorator
+
+
+class HandlerProfiler:
+    """指令处理分析器，结果保存在最近 capacity 条的环形缓冲区中。"""
+
+    def __init__(self, capacity=200, alloc_every=10, enabled=False):
+        self.enabled = enabled
+        self.alloc_every = alloc_every
+        self.records = collections.deque(maxlen=capacity)
+        self._run_count = 0
+        # 正在进行内存抽样的处理数；降为 0 时关闭由本分析器开启的 tracemalloc
+        self._tracing = 0
+        self._owns_tracing = False
+
+    @contextlib.contextmanager
+    def run(self, handler):
+        if not self.enabled:
+            yield None
+            return
+        self._run_count += 1
+        trace_alloc = bool(self.alloc_every) and self._run_count % self.alloc_every == 0
+        if trace_alloc:
+            self._start_tracing()
+        record = ProfileRun(handler, trace_alloc)
+        token = _current_run.set(record)
+        try:
+            yield record
+        except Exception as e:
+            record.error = type(e).__name__
+            raise
+        finally:
+            record.stop()
+            try:
+                _current_run.reset(token)
+            except ValueError:
+                # 异步生成器可能在不同的上下文中结束
+                _current_run.set(None)
+            if trace_alloc:
+                record.peak_alloc = tracemalloc.get_traced_memory()[1]
+                self._stop_tracing()
+            self.records.append(record)
+
+    def _start_tracing(self):
+        if self._tracing == 0:
+            # 其他代码已开启 tracemalloc 时沿用，结束后也不由本分析器关闭
+            self._owns_tracing = not tracemalloc.is_tracing()
+            if self._owns_tracing:
+                tracemalloc.start()
+        self._tracing += 1
+        tracemalloc.reset_peak()
+
+    def _stop_tracing(self):
+        self._tracing -= 1
+        if self._tracing == 0 and self._owns_tracing:
+            tracemalloc.stop()
+
+    def clear(self):
+        self.records.clear()
+
+    def summary(self):
+        """按指令与阶段汇总：{handler: {phase: (次数, 平均, p50, p95, 最大)}}，单位秒。"""
+        samples = collections.defaultdict(lambda: collections.defaultdict(list))
+        for record in self.records:
+            if record.total is not None:
+                samples[record.handler]["total"].append(record.total)
+            for name, (elapsed, _) in record.phases.items():
+                samples[record.handler][name].append(elapsed)
+        result = {}
+        for handler, phases in samples.items():
+            result[handler] = {}
+            for name, values in phases.items():
+                values.sort()
+                n = len(values)
+                result[handler][name] = (
+                    n,
+                    sum(values) / n,
+                    values[(n - 1) // 2],
+                    values[min(n - 1, int(n * 0.95))],
+                    values[-1],
+                )
+        return result
+
+    def alloc_summary(self):
+        """抽样记录中各阶段的平均净分配字节数：{handler: {phase: 字节数}}。"""
+        samples = collections.defaultdict(lambda: collections.defaultdict(list))
+        for record in self.records:
+            for name, (_, alloc) in record.phases.items():
+                if alloc is not None:
+                    samples[record.handler][name].append(alloc)
+            if record.peak_alloc is not None:
+                samples[record.handler]["peak"].append(record.peak_alloc)
+        return {
+            handler: {name: sum(values) / len(values) for name, values in phases.items()}
+            for handler, phases in samples.items()
+        }
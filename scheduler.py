@@ -0,0 +1,309 @@
+import asyncio
+import datetime
+import random
+import time
+
+
+class CronSpec:
+    """五段式 cron 表达式（分 时 日 月 周），支持 ``*``、``a-b``、``*/n``、``a-b/n`` 和逗号列表。
+
+    周字段 0 和 7 均表示周日；日与周同时受限时按 cron 惯例取“或”。
+    """
+
+    _RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expr):
+        fields = expr.split()
+        if len(fields) != 5:
+            raise ValueError(f"cron 表达式应为 5 段: {expr!r}")
+        self.expr = expr
+        parsed = [self._parse_field(f, lo, hi) for f, (lo, hi) in zip(fields, self._RANGES)]
+        self.minutes, self.hours, self.days, self.months, dows = parsed
+        self.weekdays = {d % 7 for d in dows}
+        self.dom_any = fields[2] == "*"
+        self.dow_any = fields[4] == "*"
+
+    @staticmethod
+    def _parse_field(field, lo, hi):
+        values = set()
+        for part in field.split(","):
+            step = 1
+            if "/" in part:
+                part, step_s = part.split("/", 1)
+                step = int(step_s)
+                if step <= 0:
+                    raise ValueError(f"cron 步长必须为正数: {field!r}")
+            if part == "*":
+                start, end = lo, hi
+            elif "-" in part:
+                start_s, end_s = part.split("-", 1)
+                start, end = int(start_s), int(end_s)
+            else:
+                start = int(part)
+                end = hi if step > 1 else start
+            if start < lo or end > hi or start > end:
+                raise ValueError(f"cron 字段超出范围: {field!r}")
+            values.update(range(start, end + 1, step))
+        return sorted(values)
+
+    def _day_matches(self, d):
+        dom_ok = d.day in self.days
+        dow_ok = (d.isoweekday() % 7) in self.weekdays
+        if self.dom_any and self.dow_any:
+            return True
+        if self.dom_any:
+            return dow_ok
+        if self.dow_any:
+            return dom_ok
+        return dom_ok or dow_ok
+
+    def next_after(self, ts):
+        """返回严格晚于 ts 的下一个触发时间（本地时间的时间戳）。"""
+        start = datetime.datetime.fromtimestamp(ts).replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        day = start.replace(hour=0, minute=0)
+        for _ in range(366 * 8):
+            if day.month in self.months and self._day_matches(day):
+                for h in self.hours:
+                    for m in self.minutes:
+                        candidate = day.replace(hour=h, minute=m)
+                        if candidate >= start:
+                            return candidate.timestamp()
+            day += datetime.timedelta(days=1)
+        raise ValueError(f"cron 表达式没有可触发的时间: {self.expr!r}")
+
+
+class Job:
+    """调度任务及其运行统计。"""
+
+    def __init__(self, name, func, interval=None, cron=None, jitter=0.0, start_delay=0.0,
+                 retry_delay=None, misfire_grace=60.0, persist=False, once=False, catch_up=True):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.cron = CronSpec(cron) if cron else None
+        self.jitter = jitter
+        self.start_delay = start_delay
+        self.retry_delay = retry_delay
+        self.misfire_grace = misfire_grace
+        self.persist = persist
+        self.once = once
+        # 持久化任务在停机期间错过触发时是否在启动后立即补跑
+        self.catch_up = catch_up
+        # 不含抖动的计划时间，interval 任务据此累加，避免抖动和执行耗时造成漂移
+        self.scheduled_at = None
+        self.next_run = None
+        self.last_run = None
+        self.last_duration = None
+        self.last_error = None
+        self.last_lag = None
+        self.run_count = 0
+        self.error_count = 0
+        self.skipped_count = 0
+        self.missed_count = 0
+        self._wake = None
+        self._loop_task = None
+        self._run_task = None
+
+    @property
+    def running(self):
+        return self._run_task is not None and not self._run_task.done()
+
+    @property
+    def trigger(self):
+        if self.once:
+            return "once"
+        if self.cron:
+            return f"cron {self.cron.expr}"
+        return f"every {self.interval:g}s"
+
+    def schedule(self, at):
+        self.scheduled_at = at
+        self.next_run = at + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if self._wake is not None:
+            self._wake.set()
+
+    def following(self, now):
+        """本次触发之后的下一个计划时间；落后超过一个周期时从当前时间重新起算。"""
+        if self.cron:
+            return self.cron.next_after(max(now, self.scheduled_at))
+        nxt = self.scheduled_at + self.interval
+        return nxt if nxt > now else now + self.interval
+
+
+class Scheduler:
+    """统一的后台任务调度器，替代各自手写的 sleep 循环。
+
+    - interval / cron / once 三种触发方式，可附加随机抖动（jitter）；
+    - 上一次执行未结束时跳过本次触发，避免同一任务重叠运行；
+    - 系统休眠或时钟跳变导致错过多次触发时只补跑一次；持久化任务在
+      重启后若错过了触发时间会立即补跑（catch_up=False 时不补跑，等待下次触发）；
+    - ``shutdown`` 取消全部任务；``stats`` 返回每个任务的耗时、下次运行时间等。
+    """
+
+    # 长时间等待时分段睡眠，便于及时发现休眠唤醒或时钟调整
+    MAX_SLEEP = 30.0
+
+    def __init__(self, state=None, logger=None, state_key='scheduler_last_run'):
+        self.state = state
+        self.logger = logger
+        self.state_key = state_key
+        self.jobs = {}
+        self._started = False
+
+    def add_interval(self, name, func, seconds, jitter=0.0, start_delay=0.0, retry_delay=None, persist=False,
+                     catch_up=True):
+        return self._add(Job(name, func, interval=seconds, jitter=jitter, start_delay=start_delay,
+                             retry_delay=retry_delay, persist=persist, catch_up=catch_up))
+
+    def add_cron(self, name, func, expr, jitter=0.0, misfire_grace=300.0, persist=True, catch_up=True):
+        return self._add(Job(name, func, cron=expr, jitter=jitter, misfire_grace=misfire_grace, persist=persist,
+                             catch_up=catch_up))
+
+    def add_once(self, name, func, delay=0.0):
+        return self._add(Job(name, func, start_delay=delay, once=True))
+
+    def _add(self, job):
+        if job.name in self.jobs:
+            raise ValueError(f"任务已存在: {job.name}")
+        self.jobs[job.name] = job
+        if self._started:
+            self._start_job(job)
+        return job
+
+    def set_interval(self, name, seconds):
+        """修改 interval 任务的间隔，并从上次运行时间起按新间隔重新计划。"""
+        job = self.jobs[name]
+        if job.interval == seconds:
+            return
+        job.interval = seconds
+        if job.scheduled_at is None:
+            return
+        base = job.last_run if job.last_run is not None else time.time()
+        job.schedule(max(time.time(), base + seconds))
+
+    def _persisted_last_runs(self):
+        if self.state is None:
+            return {}
+        return self.state.get(self.state_key) or {}
+
+    def _initial_run_at(self, job, now):
+        last = self._persisted_last_runs().get(job.name) if job.persist and not job.once else None
+        if last is None:
+            if job.cron and not job.start_delay:
+                return job.cron.next_after(now)
+            return now + job.start_delay
+        job.last_run = last
+        due = job.cron.next_after(last) if job.cron else last + job.interval
+        if due <= now:
+            job.missed_count += 1
+            if not job.catch_up:
+                # 错过的运行由其他任务代劳（如启动时的全量推送），等待下一次正常触发
+                self._log_info(f"任务 {job.name} 在停机期间错过了运行，不补跑")
+                return job.cron.next_after(now) if job.cron else now + job.interval
+            # 停机期间错过了触发时间：立即补跑一次
+            self._log_info(f"任务 {job.name} 在停机期间错过了运行，立即补跑")
+            return now + job.start_delay
+        return due
+
+    def start(self):
+        if self._started:
+            return
+        self._started = True
+        for job in self.jobs.values():
+            self._start_job(job)
+
+    def _start_job(self, job):
+        job._wake = asyncio.Event()
+        job.schedule(self._initial_run_at(job, time.time()))
+        job._loop_task = asyncio.get_event_loop().create_task(self._job_loop(job))
+
+    async def _job_loop(self, job):
+        # 不能只依赖取消：wait_for 等待的事件恰好在取消时被 set（如失败重试改期）时，Python 3.11 及以前
+        # 的 wait_for 会吞掉 CancelledError，循环须在 shutdown 后自行退出
+        while self._started:
+            now = time.time()
+            delay = job.next_run - now
+            if delay > 0:
+                job._wake.clear()
+                try:
+                    await asyncio.wait_for(job._wake.wait(), timeout=min(delay, self.MAX_SLEEP))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            lag = -delay
+            if job.running:
+                job.skipped_count += 1
+                self._log_info(f"任务 {job.name} 上次运行尚未结束，跳过本次")
+                job.schedule(job.following(now))
+                continue
+            if lag > job.misfire_grace and not job.once:
+                # 休眠唤醒或时钟跳变：错过的多次触发合并为这一次
+                job.missed_count += 1
+                self._log_info(f"任务 {job.name} 延迟 {lag:.0f}s 触发，错过的运行已合并")
+            job.last_lag = lag
+            job._run_task = asyncio.ensure_future(self._run(job, now))
+            if job.once:
+                await job._run_task
+                return
+            job.schedule(job.following(now))
+
+    async def _run(self, job, started_at):
+        job.last_run = started_at
+        started = time.perf_counter()
+        try:
+            await job.func()
+            job.last_error = None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            job.error_count += 1
+            job.last_error = str(e) or type(e).__name__
+            if self.logger is not None:
+                self.logger.error(f"任务 {job.name} 执行失败: {e}")
+            if job.retry_delay is not None and not job.once:
+                # 失败后按重试间隔提前（或推迟）下一次运行
+                job.schedule(time.time() + job.retry_delay)
+        finally:
+            job.last_duration = time.perf_counter() - started
+            job.run_count += 1
+            if job.persist and self.state is not None:
+                last_runs = dict(self._persisted_last_runs())
+                last_runs[job.name] = started_at
+                self.state.set(self.state_key, last_runs)
+
+    def _log_info(self, msg):
+        if self.logger is not None:
+            self.logger.info(msg)
+
+    async def shutdown(self):
+        """取消全部任务循环及正在执行的任务。"""
+        self._started = False
+        tasks = []
+        for job in self.jobs.values():
+            for task in (job._loop_task, job._run_task):
+                if task is not None and not task.done():
+                    task.cancel()
+                    tasks.append(task)
+            job._loop_task = job._run_task = None
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self):
+        """返回各任务运行统计（时间均为时间戳 / 秒）。"""
+        return [
+            {
+                "name": job.name,
+                "trigger": job.trigger,
+                "running": job.running,
+                "next_run": job.next_run,
+                "last_run": job.last_run,
+                "last_duration": job.last_duration,
+                "last_lag": job.last_lag,
+                "last_error": job.last_error,
+                "run_count": job.run_count,
+                "error_count": job.error_count,
+                "skipped_count": job.skipped_count,
+                "missed_count": job.missed_count,
+            }
+            for job in self.jobs.values()
+        ]
@@ -0,0 +1,157 @@
+import asyncio
+import collections
+import heapq
+import itertools
+import time
+
+
+class SendQueue:
+    """异步消息发送队列。
+
+    监控任务只负责入队，由若干个后台 worker 实际发送：
+
+    - 同一目标的消息按入队顺序逐条发送，两次发送至少间隔 ``min_interval`` 秒；
+    - 不同目标之间并发发送（最多 ``workers`` 个同时进行）；
+    - 发送失败按指数退避重试，超过 ``max_retries`` 次后丢弃并记录日志。
+
+    send_func(target, message) 为实际发送消息的协程函数。入队时可传入 on_done(target, ok)，
+    消息发送成功（ok 为 True）或重试耗尽被放弃（ok 为 False）时调用；停止队列时仍未发出的
+    消息不会调用。
+    """
+
+    def __init__(self, send_func, min_interval=1.0, workers=4, max_retries=3, retry_delay=5.0,
+                 max_retry_delay=120.0, logger=None):
+        self.send_func = send_func
+        self.min_interval = min_interval
+        self.workers = workers
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.logger = logger
+        # target -> deque[[message, 已失败次数, on_done]]
+        self._pending = {}
+        # (可发送时间, 序号, target)；每个有待发消息且不在发送中的目标恰好出现一次
+        self._ready = []
+        self._seq = itertools.count()
+        self._next_allowed = {}
+        self._wakeup = None
+        self._workers = []
+        self.sent_count = 0
+        self.retry_count = 0
+        self.dropped_count = 0
+
+    @property
+    def pending_count(self):
+        return sum(len(q) for q in self._pending.values())
+
+    def enqueue(self, target, message, on_done=None):
+        """加入发送队列并立即返回。"""
+        queue = self._pending.get(target)
+        if queue is None:
+            queue = self._pending[target] = collections.deque()
+            self._schedule(target, self._next_allowed.get(target, 0.0))
+        queue.append([message, 0, on_done])
+
+    def _schedule(self, target, at):
+        heapq.heappush(self._ready, (at, next(self._seq), target))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self):
+        if self._workers:
+            return
+        self._wakeup = asyncio.Event()
+        if self._ready:
+            self._wakeup.set()
+        self._workers = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+
+    async def _next_target(self):
+        while True:
+            if self._ready:
+                delay = self._ready[0][0] - time.time()
+                if delay <= 0:
+                    return heapq.heappop(self._ready)[2]
+            else:
+                delay = None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self):
+        while True:
+            target = await self._next_target()
+            queue = self._pending[target]
+            item = queue[0]
+            try:
+                await self.send_func(target, item[0])
+            except asyncio.CancelledError:
+                # 放回调度堆，重新 start 后继续发送
+                self._schedule(target, time.time())
+                raise
+            except Exception as e:
+                item[1] += 1
+                if item[1] > self.max_retries:
+                    queue.popleft()
+                    self.dropped_count += 1
+                    self._log("error", f"发送到 {target} 失败 {item[1]} 次，已放弃: {e}")
+                    self._done(item, target, False)
+                    next_at = time.time() + self.min_interval
+                else:
+                    self.retry_count += 1
+                    delay = min(self.retry_delay * 2 ** (item[1] - 1), self.max_retry_delay)
+                    self._log("warning", f"发送到 {target} 失败，{delay:.0f} 秒后重试: {e}")
+                    next_at = time.time() + delay
+            else:
+                queue.popleft()
+                self.sent_count += 1
+                self._done(item, target, True)
+                next_at = time.time() + self.min_interval
+            self._next_allowed[target] = next_at
+            if queue:
+                self._schedule(target, next_at)
+            else:
+                del self._pending[target]
+
+    def _done(self, item, target, ok):
+        if item[2] is None:
+            return
+        try:
+            item[2](target, ok)
+        except Exception as e:
+            self._log("error", f"发送结果回调失败: {e}")
+
+    def _log(self, level, msg):
+        if self.logger is not None:
+            getattr(self.logger, level)(msg)
+
+    async def join(self, timeout=None):
+        """等待队列发送完毕（含重试），超时返回 False。"""
+        deadline = time.time() + timeout if timeout is not None else None
+        while self._pending:
+            if deadline is not None and time.time() >= deadline:
+                return False
+            await asyncio.sleep(0.05)
+        return True
+
+    async def close(self, timeout=5.0):
+        """尽量在 timeout 秒内发完剩余消息，然后停止 worker。"""
+        if self._workers and self._pending:
+            await self.join(timeout)
+        for task in self._workers:
+            task.cancel()
+        if self._workers:
+            await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._pending:
+            self._log("warning", f"停止发送队列，{self.pending_count} 条消息未发送")
+
+    def stats(self):
+        return {
+            "pending": self.pending_count,
+            "targets": len(self._pending),
+            "sent": self.sent_count,
+            "retried": self.retry_count,
+            "dropped": self.dropped_count,
+        }
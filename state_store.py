@@ -0,0 +1,144 @@
+import asyncio
+import json
+import os
+import tempfile
+
+
+class StateStore:
+    """插件状态的内存副本，修改后防抖落盘。
+
+    ``set`` 只有值真正变化时才标记为脏；原地修改字典/列表后调用 ``mark_dirty``。
+    脏状态在 ``flush_delay`` 秒后统一写入一次：先写临时文件再原子替换，
+    进程中途崩溃也不会留下截断的文件。
+    """
+
+    def __init__(self, path, flush_delay=5.0, logger=None):
+        self.path = path
+        self.flush_delay = flush_delay
+        self.logger = logger
+        self._data = {}
+        self._dirty = False
+        self._flush_task = None
+        self._flush_now = None
+
+    def load(self, legacy_files=None):
+        """读取状态文件；文件不存在时从旧版单值文件迁移。
+
+        legacy_files: {key: (旧文件路径, 旧文件中的字段名或 None 表示整个文件)}
+        """
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if isinstance(data, dict):
+                    self._data = data
+                return
+            except Exception as e:
+                self._log_error(f"读取插件状态失败: {e}")
+        for key, (legacy_path, field) in (legacy_files or {}).items():
+            if not os.path.exists(legacy_path):
+                continue
+            try:
+                with open(legacy_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                value = data if field is None else data.get(field)
+                if value is not None:
+                    self._data[key] = value
+                    self._dirty = True
+            except Exception as e:
+                self._log_error(f"迁移旧状态文件 {os.path.basename(legacy_path)} 失败: {e}")
+
+    async def load_async(self, legacy_files=None):
+        """在线程池中执行 ``load``，读取与解析状态文件时不阻塞事件循环。"""
+        await asyncio.to_thread(self.load, legacy_files)
+
+    def _log_error(self, msg):
+        if self.logger is not None:
+            self.logger.error(msg)
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def setdefault(self, key, default):
+        if key not in self._data:
+            self._data[key] = default
+        return self._data[key]
+
+    def pop(self, key, default=None):
+        if key not in self._data:
+            return default
+        value = self._data.pop(key)
+        self.mark_dirty()
+        return value
+
+    def set(self, key, value):
+        if key in self._data and self._data[key] == value:
+            return
+        self._data[key] = value
+        self.mark_dirty()
+
+    def mark_dirty(self):
+        self._dirty = True
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._flush_task is not None and not self._flush_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # 没有运行中的事件循环（如初始化阶段），等待下一次修改或 close 时落盘
+            return
+        if self._flush_now is None:
+            self._flush_now = asyncio.Event()
+        self._flush_task = loop.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        # 写入期间产生的新修改在本轮结束后继续落盘，保证同一时刻只有一个写入
+        while self._dirty:
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), timeout=self.flush_delay)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    def _snapshot(self):
+        return json.dumps(self._data, ensure_ascii=False)
+
+    def _write_atomic(self, payload):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix='.state-', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    async def flush(self):
+        """若有未保存的修改则写入磁盘（序列化在事件循环线程，写文件在线程池）。"""
+        if not self._dirty:
+            return False
+        payload = self._snapshot()
+        self._dirty = False
+        try:
+            await asyncio.to_thread(self._write_atomic, payload)
+        except Exception as e:
+            self._dirty = True
+            self._log_error(f"保存插件状态失败: {e}")
+            return False
+        return True
+
+    async def close(self):
+        """跳过防抖等待，立即写入未保存的修改。"""
+        task = self._flush_task
+        if task is not None and not task.done():
+            self._flush_now.set()
+            await task
+        await self.flush()
@@ -0,0 +1,80 @@
+FEEDS = {"gold": "金币比例", "oil": "油价", "egg": "蛋价"}
+FEED_ALIASES = {
+    "金币": "gold", "金币比例": "gold", "gold": "gold",
+    "油价": "oil", "oil": "oil",
+    "蛋价": "egg", "egg": "egg",
+}
+
+
+def make_target(kind, target_id, platform=None):
+    """推送目标统一写成 ``group:群号`` 或 ``private:QQ号``；非默认平台前加 ``平台id/``。"""
+    target = f"{kind}:{target_id}"
+    return f"{platform}/{target}" if platform else target
+
+
+def parse_target(target):
+    """返回 (kind, target_id, platform)，未指定平台时 platform 为 None。"""
+    head, _, target_id = target.partition(":")
+    platform, _, kind = head.rpartition("/")
+    return kind, target_id, platform or None
+
+
+class SubscriptionRegistry:
+    """推送订阅表，持久化在 StateStore 的 ``subscriptions`` 中。
+
+    每条订阅为 {"feed", "target", "threshold", "last_sent", "stat"}：threshold 为该订阅者
+    自己的通知阈值（None 表示使用默认值），last_sent 为上次推送给它的数值，
+    用于按订阅者分别判断是否需要再次通知；stat 为 last_sent 所用的统计量名称
+    （旧版本写入的记录没有该字段）。
+    """
+
+    def __init__(self, state, key="subscriptions"):
+        self.state = state
+        self.key = key
+
+    @property
+    def _subs(self):
+        return self.state.setdefault(self.key, [])
+
+    def seed(self, defaults):
+        """首次运行时写入默认订阅：[(feed, target, threshold, last_sent), ...]。"""
+        if self.state.get(self.key) is not None:
+            return
+        self.state.set(self.key, [
+            {"feed": feed, "target": target, "threshold": threshold, "last_sent": last_sent}
+            for feed, target, threshold, last_sent in defaults
+        ])
+
+    def get(self, feed, target):
+        return next((s for s in self._subs if s["feed"] == feed and s["target"] == target), None)
+
+    def subscribe(self, feed, target, threshold=None):
+        """新增订阅或更新阈值，返回订阅记录。"""
+        sub = self.get(feed, target)
+        if sub is None:
+            sub = {"feed": feed, "target": target, "threshold": threshold, "last_sent": None}
+            self._subs.append(sub)
+        else:
+            sub["threshold"] = threshold
+        self.state.mark_dirty()
+        return sub
+
+    def unsubscribe(self, feed, target):
+        subs = self._subs
+        remaining = [s for s in subs if not (s["feed"] == feed and s["target"] == target)]
+        if len(remaining) == len(subs):
+            return False
+        self.state.set(self.key, remaining)
+        return True
+
+    def subscribers(self, feed):
+        return [s for s in self._subs if s["feed"] == feed]
+
+    def for_target(self, target):
+        return [s for s in self._subs if s["target"] == target]
+
+    def update_last_sent(self, sub, value, stat=None):
+        if sub.get("last_sent") != value or sub.get("stat") != stat:
+            sub["last_sent"] = value
+            sub["stat"] = stat
+            self.state.mark_dirty()
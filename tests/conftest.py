@@ -0,0 +1,11 @@
+"""插件目录本身就是包（模块间使用相对导入），测试通过 plugin_module 按包名导入其中的模块。"""
+import importlib
+import sys
+from pathlib import Path
+
+PLUGIN_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PLUGIN_DIR.parent))
+
+
+def plugin_module(name):
+    return importlib.import_module(f"{PLUGIN_DIR.name}.{name}")
@@ -0,0 +1,175 @@
+import pytest
+
+from conftest import plugin_module
+
+commands = plugin_module("commands")
+command_router = plugin_module("command_router")
+UsageError = command_router.UsageError
+
+
+def parse(router, text):
+    route = router.parse(text)
+    return route.name, route.args
+
+
+def rejects(router, text, match=None):
+    with pytest.raises(UsageError) as exc:
+        router.parse(text)
+    if match is not None:
+        assert match in str(exc.value)
+    return exc.value
+
+
+# 金币比例
+
+def test_gold_quote_and_history():
+    assert parse(commands.GOLD_COMMAND, "金币比例") == ("quote", {})
+    assert parse(commands.GOLD_COMMAND, "金币比例 7d") == ("history", {"period": 7 * 86400})
+    assert parse(commands.GOLD_COMMAND, "金币比例 24小时") == ("history", {"period": 24 * 3600})
+
+
+@pytest.mark.parametrize("text", ["金币比例 0d", "金币比例 0小时", "金币比例 1000d"])
+def test_gold_rejects_invalid_period(text):
+    # 与蛋价一致：形如时间范围但数值不合法时回复用法，而不是按普通查询处理
+    rejects(commands.GOLD_COMMAND, text, "用法")
+
+
+def test_gold_other_text_is_quote():
+    assert parse(commands.GOLD_COMMAND, "金币比例 多少")[0] == "quote"
+
+
+# dnf性能
+
+@pytest.mark.parametrize("action", ["开", "关", "清空"])
+def test_profile_actions(action):
+    assert parse(commands.PROFILE_COMMAND, f"dnf性能 {action}") == ("action", {"action": action})
+
+
+def test_profile_summary():
+    assert parse(commands.PROFILE_COMMAND, "dnf性能")[0] == "summary"
+    assert parse(commands.PROFILE_COMMAND, "dnf性能 其他")[0] == "summary"
+
+
+# 订阅 / 退订
+
+def test_subscribe():
+    assert parse(commands.SUBSCRIBE_COMMAND, "订阅") == ("list", {})
+    assert parse(commands.SUBSCRIBE_COMMAND, "订阅 金币 1.5") == ("subscribe", {"feed": "gold", "threshold": 1.5})
+    assert parse(commands.SUBSCRIBE_COMMAND, "订阅 油价") == ("subscribe", {"feed": "oil", "threshold": None})
+
+
+def test_subscribe_rejects_unknown_feed_and_bad_threshold():
+    rejects(commands.SUBSCRIBE_COMMAND, "订阅 火箭", "不支持的推送类型")
+    rejects(commands.SUBSCRIBE_COMMAND, "订阅 金币 -1", "阈值须不小于")
+    rejects(commands.SUBSCRIBE_COMMAND, "订阅 金币 abc", "用法")
+
+
+@pytest.mark.parametrize("text", ["订阅 金币 0.01", "订阅 金币 0.49", "订阅 金币 nan", "订阅 金币 inf"])
+def test_subscribe_rejects_threshold_below_minimum(text):
+    rejects(commands.SUBSCRIBE_COMMAND, text, f"阈值须不小于 {commands.MIN_GOLD_THRESHOLD:g}")
+
+
+def test_subscribe_accepts_minimum_threshold():
+    assert parse(commands.SUBSCRIBE_COMMAND, "订阅 金币 0.5")[1]["threshold"] == commands.MIN_GOLD_THRESHOLD
+
+
+def test_unsubscribe():
+    assert parse(commands.UNSUBSCRIBE_COMMAND, "退订 蛋价") == ("unsubscribe", {"feed": "egg"})
+    rejects(commands.UNSUBSCRIBE_COMMAND, "退订", "用法")
+
+
+# 提醒
+
+def test_alert_list_and_delete():
+    assert parse(commands.ALERT_COMMAND, "提醒") == ("list", {})
+    assert parse(commands.ALERT_COMMAND, "提醒 删除 #3") == ("delete", {"rule_id": "3"})
+
+
+def test_alert_add():
+    name, args = parse(commands.ALERT_COMMAND, "提醒 金币 > 55")
+    assert name == "add"
+    assert (args["feed"], args["area"], args["op"], args["number"], args["percent"]) == ("金币", "", ">", 55.0, "")
+    _, args = parse(commands.ALERT_COMMAND, "提醒 蛋价 平舆 跌 5%")
+    assert (args["feed"], args["area"], args["op"], args["number"], args["percent"]) == ("蛋价", "平舆", "跌", 5.0, "%")
+
+
+def test_alert_rejects_garbage():
+    rejects(commands.ALERT_COMMAND, "提醒 乱七八糟", "用法")
+    rejects(commands.ALERT_COMMAND, "提醒 金币 > -5")
+
+
+# 油价
+
+def test_oil_area():
+    assert parse(commands.OIL_COMMAND, "油价 河南") == ("area", {"area": "河南"})
+
+
+def test_oil_rank():
+    assert parse(commands.OIL_COMMAND, "油价 排行") == ("rank", {"grade": None})
+    assert parse(commands.OIL_COMMAND, "油价 排行 95") == ("rank", {"grade": "95"})
+    rejects(commands.OIL_COMMAND, "油价 排行 93", "不支持的油号")
+
+
+def test_oil_compare():
+    assert parse(commands.OIL_COMMAND, "油价 对比 河南省 山东") == ("compare", {"areas": ["河南", "山东"]})
+    rejects(commands.OIL_COMMAND, "油价 对比 河南 火星", "未知地区")
+
+
+def test_oil_calc():
+    assert parse(commands.OIL_COMMAND, "油价 河南 92 7.5") == (
+        "calc", {"area": "河南", "grade": "92", "consumption": 7.5, "distance": None})
+    assert parse(commands.OIL_COMMAND, "油价 河南 95 8 250")[1]["distance"] == 250
+
+
+def test_oil_calc_checks_grade_like_rank_and_batch():
+    rejects(commands.OIL_COMMAND, "油价 河南 93 7.5", "不支持的油号")
+
+
+@pytest.mark.parametrize("text", ["油价 河南 92 7.5 0", "油价 河南 92 0 100", "油价 河南 92 0.0"])
+def test_oil_calc_rejects_non_positive_values(text):
+    rejects(commands.OIL_COMMAND, text, "须为正数")
+
+
+def test_oil_calc_rejects_malformed_number():
+    rejects(commands.OIL_COMMAND, "油价 河南 92 7.5.1", "用法")
+
+
+def test_oil_batch():
+    name, args = parse(commands.OIL_COMMAND, "油价 批量 河南,山东 92、95 7,8.5 100/300")
+    assert name == "batch"
+    assert args == {"areas": ["河南", "山东"], "grades": ["92", "95"], "consumptions": [7.0, 8.5],
+                    "distances": [100.0, 300.0]}
+    assert parse(commands.OIL_COMMAND, "油价 批量 河南 92 7")[1]["distances"] is None
+
+
+@pytest.mark.parametrize("text", [
+    "油价 批量 河南 92 -5",
+    "油价 批量 河南 92 7 -100",
+    "油价 批量 河南 92 7,0",
+    "油价 批量 河南 92 nan",
+    "油价 批量 河南 92 7 inf",
+])
+def test_oil_batch_rejects_non_positive_values(text):
+    rejects(commands.OIL_COMMAND, text, "须为正数")
+
+
+def test_oil_batch_rejects_bad_lists():
+    rejects(commands.OIL_COMMAND, "油价 批量 河南 92 7,x", "用法")
+    rejects(commands.OIL_COMMAND, "油价 批量 河南 93 7", "不支持的油号")
+    rejects(commands.OIL_COMMAND, "油价 批量 火星 92 7", "未知地区")
+
+
+# 蛋价
+
+def test_egg_query():
+    assert parse(commands.EGG_COMMAND, "蛋价") == ("query", {"area": "", "date": None, "period": None})
+    assert parse(commands.EGG_COMMAND, "蛋价 平舆！") == ("query", {"area": "平舆", "date": None, "period": None})
+    assert parse(commands.EGG_COMMAND, "蛋价 平舆 20260101") == (
+        "query", {"area": "平舆", "date": "20260101", "period": None})
+    assert parse(commands.EGG_COMMAND, "蛋价 平舆 30d")[1]["period"] == 30 * 86400
+
+
+@pytest.mark.parametrize("text", ["蛋价 平舆 0d", "蛋价 平舆 2026", "蛋价 平舆 20261399", "蛋价 平舆 7x",
+                                  "蛋价 平舆 20260101 30d", "蛋价 20260101 7天"])
+def test_egg_rejects_malformed_date_or_period(text):
+    rejects(commands.EGG_COMMAND, text, "用法")
@@ -0,0 +1,187 @@
+import asyncio
+import datetime
+import time
+
+import pytest
+
+from conftest import plugin_module
+
+scheduler = plugin_module("scheduler")
+CronSpec = scheduler.CronSpec
+Scheduler = scheduler.Scheduler
+
+
+class DictState:
+    """StateStore 的最小替身：调度器只用到 get / set。"""
+
+    def __init__(self, data=None):
+        self.data = dict(data or {})
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def set(self, key, value):
+        self.data[key] = value
+
+
+def ts(*args):
+    return datetime.datetime(*args).timestamp()
+
+
+def at(t):
+    return datetime.datetime.fromtimestamp(t)
+
+
+# CronSpec
+
+def test_cron_daily():
+    spec = CronSpec("0 8 * * *")
+    assert at(spec.next_after(ts(2026, 3, 1, 7, 59, 30))) == datetime.datetime(2026, 3, 1, 8, 0)
+    # 严格晚于给定时间
+    assert at(spec.next_after(ts(2026, 3, 1, 8, 0))) == datetime.datetime(2026, 3, 2, 8, 0)
+
+
+def test_cron_steps_ranges_and_lists():
+    spec = CronSpec("*/20 9-10,14 * * *")
+    assert spec.minutes == [0, 20, 40]
+    assert spec.hours == [9, 10, 14]
+    assert at(spec.next_after(ts(2026, 3, 1, 10, 45))) == datetime.datetime(2026, 3, 1, 14, 0)
+    assert CronSpec("5-30/10 * * * *").minutes == [5, 15, 25]
+
+
+def test_cron_day_of_month_or_weekday():
+    # 日与周同时受限时取“或”：每月 15 日或每周一
+    spec = CronSpec("0 0 15 * 1")
+    assert at(spec.next_after(ts(2026, 3, 10, 12))) == datetime.datetime(2026, 3, 15, 0, 0)  # 周二 -> 15 日
+    assert at(spec.next_after(ts(2026, 3, 15, 12))) == datetime.datetime(2026, 3, 16, 0, 0)  # 周一
+
+
+def test_cron_sunday_is_0_or_7():
+    assert CronSpec("0 0 * * 7").weekdays == CronSpec("0 0 * * 0").weekdays == {0}
+
+
+@pytest.mark.parametrize("expr", ["0 8 * *", "60 * * * *", "*/0 * * * *", "0 8 31 2 *", "5-1 * * * *"])
+def test_cron_rejects_invalid(expr):
+    with pytest.raises(ValueError):
+        CronSpec(expr).next_after(time.time())
+
+
+# 停机期间错过的运行
+
+def _missed_cron_scheduler(catch_up):
+    last = time.time() - 3 * 86400
+    sched = Scheduler(state=DictState({"scheduler_last_run": {"daily": last}}))
+    job = sched.add_cron("daily", None, "0 8 * * *", catch_up=catch_up)
+    return sched, job
+
+
+def test_missed_persisted_run_catches_up_once():
+    sched, job = _missed_cron_scheduler(catch_up=True)
+    now = time.time()
+    # 错过了 3 次，只立即补跑一次
+    assert sched._initial_run_at(job, now) == now
+    assert job.missed_count == 1
+
+
+def test_missed_persisted_run_without_catch_up_waits_for_next_trigger():
+    sched, job = _missed_cron_scheduler(catch_up=False)
+    now = time.time()
+    assert sched._initial_run_at(job, now) == job.cron.next_after(now)
+    assert job.missed_count == 1
+
+
+def test_due_persisted_run_is_not_a_miss():
+    now = time.time()
+    sched = Scheduler(state=DictState({"scheduler_last_run": {"poll": now - 10}}))
+    job = sched.add_interval("poll", None, 60, persist=True)
+    assert sched._initial_run_at(job, now) == pytest.approx(now + 50)
+    assert job.missed_count == 0
+
+
+# 运行期间的合并与防重叠
+
+def test_misfires_are_coalesced_into_one_run():
+    async def scenario():
+        runs = []
+
+        async def func():
+            runs.append(time.time())
+
+        sched = Scheduler()
+        job = sched.add_interval("poll", func, 100, start_delay=100)
+        sched.start()
+        # 模拟休眠唤醒：计划时间已过去 5 个周期
+        job.schedule(time.time() - 500)
+        await asyncio.sleep(0.05)
+        await sched.shutdown()
+        return job, runs
+
+    job, runs = asyncio.run(scenario())
+    assert len(runs) == 1
+    assert job.missed_count == 1
+    # 从当前时间重新起算，而不是连续补跑落后的周期
+    assert job.next_run == pytest.approx(runs[0] + 100, abs=1)
+
+
+def test_overlapping_runs_are_skipped():
+    async def scenario():
+        active = 0
+        max_active = 0
+        release = asyncio.Event()
+
+        async def func():
+            nonlocal active, max_active
+            active += 1
+            max_active = max(max_active, active)
+            await release.wait()
+            active -= 1
+
+        sched = Scheduler()
+        job = sched.add_interval("slow", func, 0.02)
+        sched.start()
+        await asyncio.sleep(0.15)
+        release.set()
+        await asyncio.sleep(0.01)
+        await sched.shutdown()
+        return job, max_active
+
+    job, max_active = asyncio.run(scenario())
+    assert max_active == 1
+    assert job.skipped_count >= 2
+
+
+def test_failed_run_is_retried_after_retry_delay():
+    async def scenario():
+        calls = 0
+
+        async def func():
+            nonlocal calls
+            calls += 1
+            raise RuntimeError("boom")
+
+        sched = Scheduler()
+        job = sched.add_interval("flaky", func, 3600, retry_delay=0.02)
+        sched.start()
+        await asyncio.sleep(0.1)
+        await sched.shutdown()
+        return job, calls
+
+    job, calls = asyncio.run(scenario())
+    assert calls >= 2
+    assert job.error_count == calls
+    assert job.last_error == "boom"
+
+
+def test_shutdown_right_after_reschedule_does_not_hang():
+    async def scenario():
+        sched = Scheduler()
+        job = sched.add_interval("poll", lambda: None, 3600, start_delay=3600)
+        sched.start()
+        await asyncio.sleep(0)
+        # 失败重试等改期会唤醒任务循环，紧接着的取消不能被 wait_for 吞掉
+        job.schedule(time.time() + 30)
+        await asyncio.wait_for(sched.shutdown(), 1)
+        return job
+
+    job = asyncio.run(scenario())
+    assert job._loop_task is None
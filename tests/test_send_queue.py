@@ -0,0 +1,72 @@
+import asyncio
+
+from conftest import plugin_module
+
+SendQueue = plugin_module("send_queue").SendQueue
+
+
+def run_queue(send_func, messages, **kwargs):
+    """按 [(target, message)] 入队并等待发送完毕，返回 on_done 收到的 [(target, ok)]。"""
+    async def scenario():
+        results = []
+        queue = SendQueue(send_func, min_interval=0, retry_delay=0.01, **kwargs)
+        queue.start()
+        for target, message in messages:
+            queue.enqueue(target, message, on_done=lambda t, ok: results.append((t, ok)))
+        assert await queue.join(timeout=2)
+        await queue.close()
+        return queue, results
+
+    return asyncio.run(scenario())
+
+
+def test_on_done_reports_success():
+    sent = []
+
+    async def send(target, message):
+        sent.append((target, message))
+
+    queue, results = run_queue(send, [("group:1", "a"), ("group:2", "b")])
+    assert sorted(sent) == [("group:1", "a"), ("group:2", "b")]
+    assert sorted(results) == [("group:1", True), ("group:2", True)]
+    assert queue.sent_count == 2
+
+
+def test_on_done_after_retry_succeeds():
+    attempts = []
+
+    async def send(target, message):
+        attempts.append(target)
+        if len(attempts) < 3:
+            raise RuntimeError("busy")
+
+    queue, results = run_queue(send, [("group:1", "a")], max_retries=3)
+    assert results == [("group:1", True)]
+    assert queue.retry_count == 2
+
+
+def test_on_done_reports_dropped_message():
+    async def send(target, message):
+        raise RuntimeError("offline")
+
+    queue, results = run_queue(send, [("group:1", "a")], max_retries=1)
+    assert results == [("group:1", False)]
+    assert queue.dropped_count == 1
+
+
+def test_on_done_errors_do_not_stop_the_worker():
+    sent = []
+
+    async def send(target, message):
+        sent.append(message)
+
+    async def scenario():
+        queue = SendQueue(send, min_interval=0)
+        queue.start()
+        queue.enqueue("group:1", "a", on_done=lambda t, ok: 1 / 0)
+        queue.enqueue("group:1", "b")
+        assert await queue.join(timeout=2)
+        await queue.close()
+
+    asyncio.run(scenario())
+    assert sent == ["a", "b"]
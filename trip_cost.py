@@ -0,0 +1,65 @@
+import array
+import itertools
+
+
+class TripCostTable:
+    """批量行驶成本（列式）：每一行为 (地区, 油号, 油价, 百公里油耗, 里程) 的一种组合。
+
+    area / grade 为列表，其余列为 array('d')；fuel 为总油耗（升），cost 为总成本（元），
+    per_km 为每公里成本（元）。
+    """
+
+    __slots__ = ("area", "grade", "price", "consumption", "distance", "fuel", "cost", "per_km")
+
+    def __init__(self, area, grade, price, consumption, distance):
+        self.area = area
+        self.grade = grade
+        self.price = array.array('d', price)
+        self.consumption = array.array('d', consumption)
+        self.distance = array.array('d', distance)
+        # 整列一次计算：fuel = consumption / 100 * distance，cost = fuel * price
+        self.fuel = array.array('d', map(lambda c, d: c / 100 * d, self.consumption, self.distance))
+        self.cost = array.array('d', map(float.__mul__, self.fuel, self.price))
+        self.per_km = array.array('d', map(lambda c, p: c / 100 * p, self.consumption, self.price))
+
+    def __len__(self):
+        return len(self.price)
+
+    def cheapest(self):
+        """每公里成本最低的一行（不同里程的总成本不可比）。"""
+        return min(range(len(self)), key=self.per_km.__getitem__) if len(self) else None
+
+
+def plan_trips(prices, areas, grades, consumptions, distances):
+    """计算 地区 × 油号 × 油耗 × 里程 的全部组合。
+
+    prices 为 {(地区, 油号): 油价}，没有报价的组合跳过，返回 (TripCostTable, 跳过的 (地区, 油号))。
+    """
+    rows = []
+    missing = []
+    for area, grade in itertools.product(areas, grades):
+        price = prices.get((area, grade))
+        if price is None:
+            missing.append((area, grade))
+            continue
+        for consumption, distance in itertools.product(consumptions, distances):
+            rows.append((area, grade, price, consumption, distance))
+    columns = list(zip(*rows)) if rows else [(), (), (), (), ()]
+    return TripCostTable(list(columns[0]), list(columns[1]), *columns[2:]), missing
+
+
+def format_trip_table(table, missing=()):
+    """渲染为紧凑的表格文本。"""
+    lines = [f"🛢️ 批量行驶成本（共 {len(table)} 项）", "地区 油号 油耗 里程｜油价 总油耗 总成本 每公里"]
+    for i in range(len(table)):
+        lines.append(
+            f"{table.area[i]} {table.grade[i]} {table.consumption[i]:g} {table.distance[i]:g}｜"
+            f"{table.price[i]:.2f} {table.fuel[i]:.2f}升 {table.cost[i]:.2f}元 {table.per_km[i]:.2f}元"
+        )
+    best = table.cheapest()
+    if best is not None and len(table) > 1:
+        lines.append(f"💡 每公里最省：{table.area[best]} {table.grade[best]}号 油耗 {table.consumption[best]:g}，"
+                     f"{table.per_km[best]:.2f}元/公里")
+    if missing:
+        lines.append("⚠️ 无报价：" + "、".join(f"{area}{grade}号" for area, grade in missing))
+    return "\n".join(lines)